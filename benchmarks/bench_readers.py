@@ -0,0 +1,114 @@
+"""
+Benchmarks of the readers on synthetic multi-GB files, see :py:mod:`benchmarks.common`.
+
+Run with asv from the project root, for example::
+
+    $ asv run                      # benchmark the latest commit
+    $ asv continuous v0.1 master   # compare two commits, failing on regressions
+    $ asv dev                      # quick single run against the working tree
+"""
+import itertools
+
+import numpy as np
+
+import pypore
+from pypore.i_o import chimera_reader
+from pypore.i_o import metadata_cache
+from benchmarks.common import get_chimera_file, get_heka_file
+
+# number of points read by the benchmarks of full, in memory reads
+FULL_READ_POINTS = 2 ** 24
+
+# step of the strided reads, large enough that the result fits in memory for any file size
+READ_STEP = 1001
+
+
+class ReaderSuite(object):
+    """
+    Opening, reading, slicing, indexing, iterating, and statistics of each reader.
+    """
+    params = ['chimera', 'heka']
+    param_names = ['format']
+    timeout = 1800
+
+    def setup_cache(self):
+        return {'chimera': get_chimera_file(), 'heka': get_heka_file()}
+
+    def setup(self, files, file_format):
+        # measure the actual work, not reads of the metadata cache
+        self.cache_directory = metadata_cache.get_cache_directory()
+        metadata_cache.set_cache_directory(None)
+
+        self.filename = files[file_format]
+        self.reader = pypore.open_file(self.filename)
+        self.indices = np.random.RandomState(0).randint(0, len(self.reader), 1000)
+
+    def teardown(self, files, file_format):
+        self.reader.close()
+        metadata_cache.set_cache_directory(self.cache_directory)
+
+    def time_open(self, files, file_format):
+        pypore.open_file(self.filename).close()
+
+    def time_read_full(self, files, file_format):
+        np.array(self.reader[:FULL_READ_POINTS])
+
+    def time_read_chunks(self, files, file_format):
+        for _ in self.reader.iter_chunks():
+            pass
+
+    def time_read_strided(self, files, file_format):
+        np.array(self.reader[::READ_STEP])
+
+    def time_read_negative_strided(self, files, file_format):
+        np.array(self.reader[::-READ_STEP])
+
+    def time_single_points(self, files, file_format):
+        reader = self.reader
+        for i in self.indices:
+            reader[int(i)]
+
+    def time_iterate(self, files, file_format):
+        for _ in itertools.islice(iter(self.reader), 100000):
+            pass
+
+    def time_statistics(self, files, file_format):
+        self.reader._max = self.reader._mean = self.reader._min = self.reader._std = None
+        self.reader.mean()
+
+    def peakmem_statistics(self, files, file_format):
+        self.reader._max = self.reader._mean = self.reader._min = self.reader._std = None
+        self.reader.mean()
+
+
+class ChimeraScalingSuite(object):
+    """
+    Throughput of the Chimera raw-to-current scaling kernels.
+    """
+    params = (['numpy', 'compiled'], [1, 2, 4])
+    param_names = ['kernel', 'n_threads']
+
+    def setup(self, kernel, n_threads):
+        if kernel == 'compiled' and chimera_reader._scale_compiled is None:
+            # asv skips benchmarks whose setup raises NotImplementedError
+            raise NotImplementedError("The compiled kernel is not built.")
+        self.compiled = chimera_reader._scale_compiled
+        if kernel == 'numpy':
+            chimera_reader._scale_compiled = None
+
+        self.reader = pypore.open_file(get_chimera_file())[:FULL_READ_POINTS]
+        self.out = np.empty(len(self.reader), dtype=chimera_reader.CHIMERA_OUTPUT_DATA_TYPE)
+
+    def teardown(self, kernel, n_threads):
+        chimera_reader._scale_compiled = self.compiled
+
+    def time_read_into(self, kernel, n_threads):
+        self.reader.read_into(self.out, n_threads)
+
+    def track_points_per_second(self, kernel, n_threads):
+        import timeit
+
+        seconds = min(timeit.repeat(lambda: self.reader.read_into(self.out, n_threads), number=1, repeat=3))
+        return len(self.reader) / seconds
+
+    track_points_per_second.unit = 'points/s'
@@ -0,0 +1,50 @@
+"""
+Synthetic data files for the benchmarks, written with :py:mod:`pypore.sampledata.synthetic`.
+
+The files are generated once and reused by later runs. Their size and location are set with environment variables:
+
+    PYPORE_BENCHMARK_SIZE_MB - approximate size of each file, in MB. Default is 2048.
+    PYPORE_BENCHMARK_DIR - directory the files are written to. Default is pypore_benchmarks in the temp directory.
+
+The data is seeded, so files of the same size are identical on every machine.
+"""
+import os
+import tempfile
+
+from pypore.sampledata.synthetic import get_n_points, write_file
+
+BENCHMARK_DIRECTORY = os.environ.get('PYPORE_BENCHMARK_DIR', os.path.join(tempfile.gettempdir(), 'pypore_benchmarks'))
+BENCHMARK_SIZE_MB = int(os.environ.get('PYPORE_BENCHMARK_SIZE_MB', 2048))
+
+
+def _get_file(name, extension, file_format, **kwargs):
+    """
+    :return: Filename of a synthetic file of about BENCHMARK_SIZE_MB, writing it first if it does not exist.
+    """
+    if not os.path.isdir(BENCHMARK_DIRECTORY):
+        os.makedirs(BENCHMARK_DIRECTORY)
+    filename = os.path.join(BENCHMARK_DIRECTORY, '{0}_{1}MB{2}'.format(name, BENCHMARK_SIZE_MB, extension))
+    if not os.path.exists(filename):
+        # write to a temporary name first, so interrupted runs don't leave partial files
+        temp_filename = filename[:-len(extension)] + '_tmp' + extension
+        n_points = get_n_points(BENCHMARK_SIZE_MB * 2 ** 20, file_format, kwargs.get('n_channels', 1))
+        write_file(temp_filename, n_points, **kwargs)
+        if extension == '.log':
+            os.rename(temp_filename[:-len('log')] + 'mat', filename[:-len('log')] + 'mat')
+        os.rename(temp_filename, filename)
+    return filename
+
+
+def get_chimera_file():
+    """
+    :return: Filename of a synthetic Chimera .log file of about BENCHMARK_SIZE_MB, with its .mat file.
+    """
+    return _get_file('chimera', '.log', 'chimera')
+
+
+def get_heka_file(n_channels=1):
+    """
+    :param n_channels: (Optional) Number of channels. Default is 1.
+    :return: Filename of a synthetic Heka .hkd file of about BENCHMARK_SIZE_MB.
+    """
+    return _get_file('heka_{0}channel'.format(n_channels), '.hkd', 'heka', n_channels=n_channels)
@@ -0,0 +1,27 @@
+"""
+Test setup shared by all of the tests.
+"""
+import os
+import shutil
+import tempfile
+
+_temporary_cache_directory = None
+
+
+def pytest_configure(config):
+    """
+    Points the metadata cache, of the test process and of any worker processes it starts, at a temporary directory, so
+    testing does not fill the user's cache directory.
+    """
+    global _temporary_cache_directory
+    from pypore.i_o import metadata_cache
+
+    _temporary_cache_directory = tempfile.mkdtemp(prefix='pypore_cache_')
+    # worker processes read the environment variable when they import the cache
+    os.environ[metadata_cache.CACHE_DIRECTORY_ENVIRONMENT_VARIABLE] = _temporary_cache_directory
+    metadata_cache.set_cache_directory(_temporary_cache_directory)
+
+
+def pytest_unconfigure(config):
+    if _temporary_cache_directory is not None:
+        shutil.rmtree(_temporary_cache_directory, True)
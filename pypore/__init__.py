@@ -1,9 +1,10 @@
-def open_file(filename, reader_class=None):
+def open_file(filename, reader_class=None, **kwargs):
     """
     Opens a read only, raw current data file of one of the following formats:
 
         #. Chimera files. See implementations in :py:mod:`pypore.i_o.chimera_reader`
         #. Heka files. See implementations in :py:mod:`pypore.i_o.heka_reader`
+        #. pypore native files. See implementations in :py:mod:`pypore.i_o.native_reader`
 
     To implement your own reader, extend :py:class:`pypore.i_o.abstract_reader.AbstractReader`.
 
@@ -13,13 +14,15 @@ def open_file(filename, reader_class=None):
     :param filename: Filename to open.
     :param reader_class: (Optional) A reader class to be used to read the filename. If None, a reader class will be
     chosen based on the file extension.
+    :param kwargs: (Optional) Passed to the reader class. For example, raw=True opens the file for reading the raw
+                   integers stored in it, and dtype sets the floating point type of the data.
     :return: An open reader.
     """
     # make sure the filename is a string
     filename = str(filename)
 
     if reader_class is not None:
-        return reader_class(filename)
+        return reader_class(filename, **kwargs)
 
     if filename[-len('.log'):] == '.log':
         from pypore.i_o.chimera_reader import ChimeraReader
@@ -27,9 +30,12 @@ def open_file(filename, reader_class=None):
     elif filename[-len('.hkd'):] == '.hkd':
         from pypore.i_o.heka_reader import HekaReader
         reader_class = HekaReader
+    elif filename[-len('.ppd'):] == '.ppd':
+        from pypore.i_o.native_reader import NativeReader
+        reader_class = NativeReader
 
     if reader_class is None:
         import os
         raise ValueError("No reader was found for the file extension '{0}'.".format(os.path.splitext(filename)[1]))
 
-    return reader_class(filename)
+    return reader_class(filename, **kwargs)
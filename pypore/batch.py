@@ -0,0 +1,134 @@
+"""
+Batch analysis of many data files, spread across a pool of worker processes.
+
+Example usage:
+
+>>> from pypore.batch import batch_analyze
+>>> from pypore.extractors.threshold_detector import ThresholdDetector
+>>> import pypore.sampledata.testing_files as tf
+>>> for result in batch_analyze(tf.TEST_DATA_FOLDER_PATH, detector=ThresholdDetector(), n_workers=2):
+...     if result.error is None:
+...         print(result.filename, result.metadata.mean(), len(result.events))
+
+"""
+from collections import namedtuple
+import glob
+import multiprocessing
+import os
+
+import pypore
+from pypore.core import MetaSegment
+
+# Extensions of the files that :py:func:`pypore.open_file` can open.
+DEFAULT_EXTENSIONS = ('.log', '.hkd', '.ppd')
+
+# Result of analyzing a single file.
+#   filename - the analyzed file
+#   metadata - :py:class:`pypore.core.MetaSegment` with the file's statistics
+#   events - record array of events, or None if no detector was given or the data has more than one channel
+#   error - description of the error if the file could not be analyzed, otherwise None
+FileResult = namedtuple('FileResult', ['filename', 'metadata', 'events', 'error'])
+
+
+def find_files(paths, extensions=DEFAULT_EXTENSIONS):
+    """
+    Finds the data files to analyze.
+
+    :param paths: A directory, which is searched recursively, a glob pattern, a filename, or a list of any of these.
+    :param extensions: (Optional) Only files with these extensions are returned. Default is
+                       :py:data:`DEFAULT_EXTENSIONS`.
+    :return: Sorted list of filenames.
+    """
+    if isinstance(paths, str):
+        paths = [paths]
+
+    filenames = set()
+    for path in paths:
+        if os.path.isdir(path):
+            for dir_path, dir_names, file_names in os.walk(path):
+                filenames.update(os.path.join(dir_path, f) for f in file_names)
+        else:
+            filenames.update(glob.glob(path))
+
+    return sorted(f for f in filenames if os.path.splitext(f)[1] in extensions)
+
+
+def analyze_file(filename, detector=None, reader_class=None):
+    """
+    Opens a file with :py:func:`pypore.open_file` and computes its statistics and events.
+
+    :param filename: Filename to analyze.
+    :param detector: (Optional) Detector used to find events, for example a
+                     :py:class:`pypore.extractors.threshold_detector.ThresholdDetector`.
+    :param reader_class: (Optional) Reader class to open the file with.
+    :return: A :py:class:`FileResult`. Errors opening or reading the file are returned in its error field.
+    """
+    try:
+        reader = pypore.open_file(filename, reader_class)
+    except (IOError, ValueError) as e:
+        return FileResult(filename, None, None, str(e))
+
+    try:
+        metadata = MetaSegment.from_segment(reader)
+        events = None
+        if detector is not None and reader.ndim == 1:
+            events = detector.find_events(reader)
+    except (IOError, ValueError) as e:
+        return FileResult(filename, None, None, str(e))
+    finally:
+        reader.close()
+
+    return FileResult(filename, metadata, events, None)
+
+
+def batch_analyze(paths, detector=None, n_workers=None, max_open_files=None, reader_class=None, executor=None):
+    """
+    Analyzes many files in parallel with :py:func:`analyze_file`, yielding each result as soon as it is done.
+
+    Files are only submitted to the workers as earlier ones complete, so at most max_open_files readers (and their
+    file handles and memory maps) are open at once, no matter how many files there are.
+
+    :param paths: Files to analyze. See :py:func:`find_files`.
+    :param detector: (Optional) Detector used to find events. It must be picklable.
+    :param n_workers: (Optional) Number of worker processes. Default is the number of CPU cores.
+    :param max_open_files: (Optional) Maximum number of files being analyzed at once. Default is n_workers.
+    :param reader_class: (Optional) Reader class to open the files with.
+    :param executor: (Optional) A concurrent.futures Executor to run the analyses on. By default a ProcessPoolExecutor
+                     with n_workers processes is created and shut down.
+    :return: Generator of :py:class:`FileResult`, in order of completion.
+    """
+    from concurrent.futures import wait, FIRST_COMPLETED
+
+    if n_workers is None:
+        n_workers = multiprocessing.cpu_count()
+    if max_open_files is None:
+        max_open_files = n_workers
+    if max_open_files < 1:
+        raise ValueError("max_open_files must be positive, was {0}.".format(max_open_files))
+
+    filenames = iter(find_files(paths))
+
+    own_executor = executor is None
+    if own_executor:
+        from concurrent.futures import ProcessPoolExecutor
+
+        executor = ProcessPoolExecutor(max_workers=n_workers)
+    try:
+        pending = set()
+        for filename in filenames:
+            pending.add(executor.submit(analyze_file, filename, detector, reader_class))
+            if len(pending) >= max_open_files:
+                break
+
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                for filename in filenames:
+                    pending.add(executor.submit(analyze_file, filename, detector, reader_class))
+                    break
+                yield future.result()
+    finally:
+        for future in pending:
+            future.cancel()
+        if own_executor:
+            executor.shutdown()
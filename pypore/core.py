@@ -4,6 +4,8 @@ Core data types.
 
 import numpy as np
 
+from pypore.util import RunningStatistics, iter_segment_chunks, slice_combine
+
 
 class MetaSegment(object):
     """
@@ -136,6 +138,13 @@ class Segment(object):
 
     It contains the same attributes and methods as a :py:class:`MetaSegment`.
 
+    Transforms can be chained lazily with :py:meth:`scale`, :py:meth:`filter`, :py:meth:`decimate`, and
+    :py:meth:`detrend`. Nothing is computed until values or statistics are requested, and then the data is processed
+    one chunk at a time, so no full size intermediate arrays are made.
+
+    >>> pipeline = s.scale(1e-9).filter(100., sample_rate=1000.).decimate(2).detrend()
+    >>> mean = pipeline.mean()
+
     Attributes:
 
         * sample_rate - The sampling rate of the segment.
@@ -238,6 +247,54 @@ class Segment(object):
             self._std = np.std(self._data)
         return self._std
 
+    def scale(self, multiplier, offset=0.0):
+        """
+        Lazily scales the data to data * multiplier + offset.
+
+        :param multiplier: Number to multiply the data by.
+        :param offset: (Optional) Number to add after multiplying. Default is 0.
+        :return: A :py:class:`ScaledSegment`.
+        """
+        return ScaledSegment(self, multiplier, offset)
+
+    def filter(self, cutoff, kind='bessel', order=4, zero_phase=False, sample_rate=None):
+        """
+        Lazily low-pass filters the data. See :py:mod:`pypore.filters`.
+
+        :param cutoff: Cutoff frequency, in Hz.
+        :param kind: (Optional) 'bessel' (default) or 'butterworth'.
+        :param order: (Optional) Order of the filter. Default is 4.
+        :param zero_phase: (Optional) Whether to filter forward and backward, for no phase shift. Default is False.
+        :param sample_rate: (Optional) Sampling rate of the data. Default is the segment's sample_rate.
+        :return: A :py:class:`pypore.filters.FilteredSegment`.
+        """
+        from pypore.filters import FilteredSegment, design_filter
+
+        if sample_rate is None:
+            sample_rate = self.sample_rate
+        return FilteredSegment(self, design_filter(kind, order, cutoff, sample_rate), zero_phase,
+                               sample_rate=sample_rate)
+
+    def decimate(self, factor):
+        """
+        Lazily keeps every factor'th point of the data. Filter the data first to avoid aliasing.
+
+        :param factor: Positive integer decimation factor.
+        :return: A segment of the decimated data.
+        """
+        if factor < 1:
+            raise ValueError("Decimation factor must be positive, was {0}.".format(factor))
+        return self[::int(factor)]
+
+    def detrend(self, kind='linear'):
+        """
+        Lazily subtracts the least squares line (kind='linear') or the mean (kind='constant') from the data.
+
+        :param kind: (Optional) 'linear' (default) or 'constant'.
+        :return: A :py:class:`DetrendedSegment`.
+        """
+        return DetrendedSegment(self, kind)
+
     @property
     def ndim(self):
         """
@@ -275,3 +332,203 @@ class Segment(object):
             except AttributeError:
                 self._size = np.size(self._data)
         return self._size
+
+
+class LazySegment(Segment):
+    """
+    Base class of 1D segments computed from another segment one chunk at a time, only when their values or statistics
+    are requested.
+
+    Subclasses must implement :py:meth:`iter_chunks` and __getitem__.
+    """
+
+    def __init__(self, segment):
+        """
+        :param segment: 1D :py:class:`Segment`, reader, or array the data is computed from.
+        """
+        if np.ndim(segment) != 1:
+            raise ValueError("Lazy segments can only be made from 1D data.")
+        self.segment = segment
+        self.sample_rate = getattr(segment, 'sample_rate', 0.0)
+        self._data = None
+        self._shape = (len(segment),)
+
+    @property
+    def chunk_size(self):
+        return getattr(self.segment, 'chunk_size', 12500)
+
+    def __array__(self, dtype=None):
+        chunks = list(self.iter_chunks())
+        if not chunks:
+            return np.zeros(0, dtype=dtype or np.float64)
+        values = np.concatenate(chunks)
+        if dtype is not None:
+            values = values.astype(dtype, copy=False)
+        return values
+
+    def __iter__(self):
+        for chunk in self.iter_chunks():
+            for point in chunk:
+                yield point
+
+    def iter_chunks(self, size=None):
+        """
+        Iterates over the data in consecutive chunks.
+
+        :param size: (Optional) Maximum number of data points in each chunk. Default is :py:attr:`chunk_size`.
+        :return: Generator of numpy arrays of the data, in order.
+        """
+        raise NotImplementedError
+
+    def _compute_statistics(self):
+        """
+        Computes the max, mean, min, and standard deviation in a single pass over the data, and caches all of them.
+        """
+        stats = RunningStatistics()
+        for chunk in self.iter_chunks():
+            stats.update(chunk)
+        self._max = stats.max()
+        self._mean = stats.mean()
+        self._min = stats.min()
+        self._std = stats.std()
+
+    def max(self):
+        if self._max is None:
+            self._compute_statistics()
+        return self._max
+
+    def mean(self):
+        if self._mean is None:
+            self._compute_statistics()
+        return self._mean
+
+    def min(self):
+        if self._min is None:
+            self._compute_statistics()
+        return self._min
+
+    def std(self):
+        if self._std is None:
+            self._compute_statistics()
+        return self._std
+
+    @property
+    def ndim(self):
+        return 1
+
+    @property
+    def size(self):
+        return self._shape[0]
+
+
+class ScaledSegment(LazySegment):
+    """
+    A segment's data times a multiplier plus an offset, computed lazily.
+
+    Scaling a ScaledSegment again combines both scalings into one, and slicing it slices the underlying segment, so
+    chains of scales and slices are evaluated in a single step.
+    """
+
+    def __init__(self, segment, multiplier, offset=0.0):
+        """
+        :param segment: 1D :py:class:`Segment`, reader, or array to scale.
+        :param multiplier: Number to multiply the data by.
+        :param offset: Number to add after multiplying.
+        """
+        super(ScaledSegment, self).__init__(segment)
+        self.multiplier = multiplier
+        self.offset = offset
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            segment = self.segment[item]
+            if not isinstance(segment, Segment):
+                segment = Segment(segment, self.sample_rate)
+                if item.step is not None and item.step > 1:
+                    segment.sample_rate /= item.step
+            return ScaledSegment(segment, self.multiplier, self.offset)
+        return self.segment[item] * self.multiplier + self.offset
+
+    def scale(self, multiplier, offset=0.0):
+        return ScaledSegment(self.segment, self.multiplier * multiplier, self.offset * multiplier + offset)
+
+    def iter_chunks(self, size=None):
+        for chunk in iter_segment_chunks(self.segment, size or self.chunk_size):
+            chunk = np.multiply(chunk, self.multiplier)
+            chunk += self.offset
+            yield chunk
+
+
+class DetrendedSegment(LazySegment):
+    """
+    A segment's data minus its least squares line or its mean, computed lazily.
+
+    The trend is fit in one chunked pass over the data the first time it is needed. Slices keep using the trend of the
+    segment they were sliced from.
+    """
+
+    def __init__(self, segment, kind='linear', _base=None, _slice=None):
+        """
+        :param segment: 1D :py:class:`Segment`, reader, or array to detrend.
+        :param kind: (Optional) 'linear' (default) or 'constant'.
+        """
+        if kind not in ('linear', 'constant'):
+            raise ValueError("Unknown detrend kind {0}.".format(kind))
+        super(DetrendedSegment, self).__init__(segment)
+        self.kind = kind
+        # the DetrendedSegment the trend was fit on, and the slice of it this segment is
+        self._base = _base if _base is not None else self
+        self._slice = _slice if _slice is not None else slice(0, len(segment), 1)
+        self._trend = None
+
+    def get_trend(self):
+        """
+        :return: Tuple of the intercept and slope of the trend, in units of the data and of the data per point.
+        """
+        base = self._base
+        if base._trend is None:
+            # sums of the data and of the data times its index give the least squares line in a single pass
+            n = 0
+            data_sum = 0.0
+            weighted_sum = 0.0
+            for chunk in iter_segment_chunks(base.segment, base.chunk_size):
+                indices = np.arange(n, n + chunk.size, dtype=np.float64)
+                data_sum += chunk.sum(dtype=np.float64)
+                weighted_sum += np.dot(indices, chunk)
+                n += chunk.size
+            if n == 0 or base.kind == 'constant' or n == 1:
+                base._trend = (data_sum / n if n else 0.0, 0.0)
+            else:
+                index_mean = (n - 1) / 2.
+                data_mean = data_sum / n
+                index_variance = (n * n - 1) / 12.
+                slope = (weighted_sum / n - index_mean * data_mean) / index_variance
+                base._trend = (data_mean - slope * index_mean, slope)
+        return base._trend
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            if item.step is not None and item.step < 0:
+                raise ValueError("Detrended segments can only be sliced with positive steps.")
+            new_slice = slice_combine(len(self._base.segment), self._slice, item)
+            segment = self.segment[item]
+            if not isinstance(segment, Segment):
+                segment = Segment(segment, self.sample_rate)
+                if item.step is not None and item.step > 1:
+                    segment.sample_rate /= item.step
+            return DetrendedSegment(segment, self.kind, self._base, new_slice)
+        index = int(item)
+        if index < 0:
+            index += self.size
+        start, _, step = self._slice.indices(len(self._base.segment))
+        intercept, slope = self.get_trend()
+        return self.segment[item] - (intercept + slope * (start + index * step))
+
+    def iter_chunks(self, size=None):
+        intercept, slope = self.get_trend()
+        start, _, step = self._slice.indices(len(self._base.segment))
+        position = 0
+        for chunk in iter_segment_chunks(self.segment, size or self.chunk_size):
+            indices = start + step * np.arange(position, position + chunk.size, dtype=np.float64)
+            yield chunk - (intercept + slope * indices)
+            position += chunk.size
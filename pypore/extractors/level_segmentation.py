@@ -0,0 +1,260 @@
+"""
+Segmentation of events into current levels (sub-events).
+
+Levels are found by binary segmentation: each segment of an event is split at the point that most reduces the squared
+error of fitting a constant level on either side, as long as the reduction is larger than a penalty times the noise
+variance. The squared error of every possible split follows from cumulative sums of the data, so finding the best
+split of a segment is O(n), and splitting an event into levels is O(n log n) for balanced splits.
+
+All events are segmented at once: their samples are concatenated into one array, and every round of splitting
+evaluates every candidate split point of every segment of every event with a few numpy operations, with no python loop
+over events or segments.
+
+Example usage:
+
+>>> import pypore
+>>> from pypore.extractors.level_segmentation import LevelSegmenter
+>>> from pypore.extractors.threshold_detector import ThresholdDetector
+>>> import pypore.sampledata.testing_files as tf
+>>> reader = pypore.open_file(tf.get_abs_path('chimera_1event_2levels.log'))
+>>> events = ThresholdDetector().find_events(reader)
+>>> levels = LevelSegmenter().segment_events(reader, events)
+>>> len(levels[0])
+2
+"""
+import numpy as np
+
+# Record format of the current levels within an event.
+#   start - index of the first sample of the level
+#   stop - index of the first sample after the level
+#   mean_current - mean current of the level
+LEVEL_DTYPE = np.dtype([('start', np.int64), ('stop', np.int64), ('mean_current', np.float64)])
+
+# Number of events read and segmented at a time by :py:meth:`LevelSegmenter.segment_events`.
+DEFAULT_BATCH_SIZE = 1000
+
+
+def _group_first_max(values, groups, group_starts):
+    """
+    :param values: 1D array of values.
+    :param groups: Sorted 1D array of the group index of each value.
+    :param group_starts: 1D array of the index of the first value of each group. Every group must have a value.
+    :return: Tuple of the maximum value of each group, and the index of its first occurrence.
+    """
+    maximum = np.maximum.reduceat(values, group_starts)
+    is_max = np.flatnonzero(values == maximum[groups])
+    first = np.empty(group_starts.size, dtype=np.int64)
+    # is_max is in increasing order, so assigning in reverse leaves the first index of each group
+    first[groups[is_max[::-1]]] = is_max[::-1]
+    return maximum, first
+
+
+def estimate_noise(values, offsets):
+    """
+    Robustly estimates the noise standard deviation of each event from the median absolute difference of consecutive
+    samples, which steps between levels hardly change.
+
+    :param values: 1D array of the samples of all of the events, one after the other.
+    :param offsets: 1D array of the index of the first sample of each event in values, followed by values.size.
+    :return: 1D array of the noise standard deviation of each event. Events with fewer than 2 samples get 0.
+    """
+    n_events = offsets.size - 1
+    differences = np.abs(np.diff(values))
+    # drop the differences across event boundaries
+    keep = np.ones(differences.size, dtype=bool)
+    inner = offsets[1:-1]
+    keep[inner[(inner > 0) & (inner < values.size)] - 1] = False
+    event = np.repeat(np.arange(n_events), np.maximum(np.diff(offsets) - 1, 0))
+    differences = differences[keep]
+
+    order = np.lexsort((differences, event))
+    counts = np.bincount(event, minlength=n_events)
+    firsts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    noise = np.zeros(n_events)
+    has_data = counts > 0
+    medians = differences[order[firsts[has_data] + (counts[has_data] - 1) // 2]]
+    # the difference of two samples has sqrt(2) times the noise, and for normal noise the median absolute deviation
+    # is 0.6745 standard deviations
+    noise[has_data] = medians / 0.6745 / np.sqrt(2.)
+    return noise
+
+
+def binary_segmentation(values, offsets, thresholds, min_level_length=1, max_levels=None):
+    """
+    Splits every event into levels by binary segmentation.
+
+    :param values: 1D array of the samples of all of the events, one after the other.
+    :param offsets: 1D array of the index of the first sample of each event in values, followed by values.size.
+    :param thresholds: 1D array of the reduction of the squared error that a split of each event must exceed.
+    :param min_level_length: (Optional) Minimum number of samples in a level. Default is 1.
+    :param max_levels: (Optional) Maximum number of levels per event. Default is no limit.
+    :return: Tuple of 1D arrays of the start (in values), stop, mean, and event index of each level, in order.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    offsets = np.asarray(offsets, dtype=np.int64)
+    thresholds = np.asarray(thresholds, dtype=np.float64)
+    if min_level_length < 1:
+        raise ValueError("min_level_length must be positive, was {0}.".format(min_level_length))
+    n_events = offsets.size - 1
+    sums = np.concatenate(([0.], np.cumsum(values)))
+
+    n_levels = np.ones(n_events, dtype=np.int64)
+    change_points = []
+    non_empty = np.diff(offsets) > 0
+    starts = offsets[:-1][non_empty]
+    stops = offsets[1:][non_empty]
+    events = np.flatnonzero(non_empty)
+    while starts.size > 0:
+        # segments that can be split into two levels of at least min_level_length
+        lengths = stops - starts
+        splittable = lengths >= 2 * min_level_length
+        if max_levels is not None:
+            splittable &= n_levels[events] < max_levels
+        starts, stops, events, lengths = starts[splittable], stops[splittable], events[splittable], lengths[splittable]
+        if starts.size == 0:
+            break
+
+        # every candidate split point of every segment
+        n_candidates = lengths - 2 * min_level_length + 1
+        segment = np.repeat(np.arange(starts.size), n_candidates)
+        first_candidate = np.cumsum(n_candidates) - n_candidates
+        split = starts[segment] + min_level_length + np.arange(segment.size) - first_candidate[segment]
+
+        left_length = split - starts[segment]
+        right_length = stops[segment] - split
+        left_mean = (sums[split] - sums[starts[segment]]) / left_length
+        right_mean = (sums[stops[segment]] - sums[split]) / right_length
+        gain = left_length * right_length / lengths[segment].astype(np.float64) * (left_mean - right_mean) ** 2
+
+        best_gain, best = _group_first_max(gain, segment, first_candidate)
+        accepted = np.flatnonzero(best_gain > thresholds[events])
+        if max_levels is not None and accepted.size > 0:
+            # only the largest splits of each event, up to max_levels
+            order = accepted[np.lexsort((-best_gain[accepted], events[accepted]))]
+            order_events = events[order]
+            first_of_event = np.concatenate(([0], np.flatnonzero(np.diff(order_events)) + 1))
+            rank = np.arange(order.size) - np.repeat(first_of_event, np.diff(np.append(first_of_event, order.size)))
+            accepted = np.sort(order[rank < max_levels - n_levels[order_events]])
+        np.add.at(n_levels, events[accepted], 1)
+
+        best_split = split[best[accepted]]
+        change_points.append(best_split)
+        starts, stops, events = (np.concatenate((starts[accepted], best_split)),
+                                 np.concatenate((best_split, stops[accepted])),
+                                 np.concatenate((events[accepted], events[accepted])))
+
+    boundaries = np.unique(np.concatenate([offsets] + change_points))
+    level_starts = boundaries[:-1]
+    level_stops = boundaries[1:]
+    level_means = (sums[level_stops] - sums[level_starts]) / (level_stops - level_starts)
+    level_events = np.searchsorted(offsets, level_starts, side='right') - 1
+    return level_starts, level_stops, level_means, level_events
+
+
+class LevelSegmenter(object):
+    """
+    Splits events into current levels with :py:func:`binary_segmentation`.
+
+    A split is kept when it reduces the squared error of the level fit by more than penalty times the noise variance
+    of the event. The default penalty, 3 log(n) for an event of n samples, is the Bayesian information criterion of a
+    split, which adds a change point and a level mean to the fit.
+    """
+
+    def __init__(self, penalty=None, min_level_length=10, max_levels=None, noise=None, min_noise=0.0):
+        """
+        :param penalty: (Optional) Number of noise variances a split must reduce the squared error by. Default is
+                        3 log(n) for an event of n samples.
+        :param min_level_length: (Optional) Minimum number of samples in a level. Default is 10.
+        :param max_levels: (Optional) Maximum number of levels per event. Default is no limit.
+        :param noise: (Optional) Noise standard deviation, in the units of the data. Default is estimated for each
+                      event with :py:func:`estimate_noise`.
+        :param min_noise: (Optional) Lower limit of the noise standard deviation. Use this for data with little or no
+                          noise. Default is 0.
+        """
+        if penalty is not None and penalty <= 0:
+            raise ValueError("penalty must be positive, was {0}.".format(penalty))
+        if max_levels is not None and max_levels < 1:
+            raise ValueError("max_levels must be positive, was {0}.".format(max_levels))
+        self.penalty = penalty
+        self.min_level_length = min_level_length
+        self.max_levels = max_levels
+        self.noise = noise
+        self.min_noise = min_noise
+
+    def _get_thresholds(self, values, offsets):
+        """
+        :return: 1D array of the reduction of the squared error a split of each event must exceed.
+        """
+        lengths = np.diff(offsets)
+        if self.noise is None:
+            noise = estimate_noise(values, offsets)
+        else:
+            noise = np.empty(lengths.size)
+            noise.fill(self.noise)
+        # without noise, splits must still exceed the rounding error of the cumulative sums
+        rounding = np.sqrt(np.finfo(np.float64).eps) * (np.abs(values).max() if values.size > 0 else 0.)
+        noise = np.maximum(noise, max(self.min_noise, rounding))
+        if self.penalty is None:
+            penalty = 3 * np.log(np.maximum(lengths, 2))
+        else:
+            penalty = self.penalty
+        return penalty * noise ** 2
+
+    def segment_arrays(self, values, offsets):
+        """
+        Splits a batch of events, given as one array of their samples, into levels.
+
+        :param values: 1D array of the samples of all of the events, one after the other.
+        :param offsets: 1D array of the index of the first sample of each event in values, followed by values.size.
+        :return: List of record arrays of :py:data:`LEVEL_DTYPE`, one per event. Level indices are relative to the
+                 start of the event.
+        """
+        values = np.asarray(values, dtype=np.float64)
+        offsets = np.asarray(offsets, dtype=np.int64)
+        starts, stops, means, events = binary_segmentation(values, offsets, self._get_thresholds(values, offsets),
+                                                           self.min_level_length, self.max_levels)
+        levels = np.empty(starts.size, dtype=LEVEL_DTYPE)
+        levels['start'] = starts - offsets[events]
+        levels['stop'] = stops - offsets[events]
+        levels['mean_current'] = means
+        edges = np.searchsorted(events, np.arange(1, offsets.size - 1))
+        return [l.view(np.recarray) for l in np.split(levels, edges)]
+
+    def segment(self, data):
+        """
+        Splits a single event into levels.
+
+        :param data: 1D array, segment, or reader slice of the samples of the event.
+        :return: Record array of :py:data:`LEVEL_DTYPE`. Level indices are relative to the start of data.
+        """
+        data = np.asarray(data, dtype=np.float64)
+        return self.segment_arrays(data, [0, data.size])[0]
+
+    def segment_events(self, segment, events, batch_size=DEFAULT_BATCH_SIZE):
+        """
+        Splits the events found in a segment or reader into levels, batch_size events at a time.
+
+        :param segment: The :py:class:`pypore.core.Segment`, reader, or 1D array the events were found in.
+        :param events: Record array with the start and stop index of each event, for example of
+                       :py:data:`pypore.extractors.threshold_detector.EVENT_DTYPE`.
+        :param batch_size: (Optional) Number of events read and segmented at a time. Default is
+                           :py:data:`DEFAULT_BATCH_SIZE`.
+        :return: List of record arrays of :py:data:`LEVEL_DTYPE`, one per event. Level indices are indices of segment,
+                 so the levels can be stored with :py:meth:`pypore.i_o.event_database.EventDatabase.add_events`.
+        """
+        if batch_size < 1:
+            raise ValueError("batch_size must be positive, was {0}.".format(batch_size))
+        starts = np.asarray(events['start'], dtype=np.int64)
+        stops = np.asarray(events['stop'], dtype=np.int64)
+        result = []
+        for i in range(0, starts.size, batch_size):
+            batch_starts = starts[i:i + batch_size]
+            batch_stops = stops[i:i + batch_size]
+            values = [np.asarray(segment[start:stop], dtype=np.float64) for start, stop in zip(batch_starts,
+                                                                                            batch_stops)]
+            offsets = np.concatenate(([0], np.cumsum([v.size for v in values])))
+            for start, levels in zip(batch_starts, self.segment_arrays(np.concatenate(values), offsets)):
+                levels.start += start
+                levels.stop += start
+                result.append(levels)
+        return result
@@ -0,0 +1,156 @@
+"""
+Parallel event detection, splitting a file into shards that are searched in separate processes.
+
+Example usage:
+
+>>> from pypore.extractors.parallel import find_events_parallel
+>>> from pypore.extractors.threshold_detector import ThresholdDetector
+>>> import pypore.sampledata.testing_files as tf
+>>> events = find_events_parallel(tf.get_abs_path('chimera_1event.log'), ThresholdDetector(), n_workers=2)
+"""
+import multiprocessing
+
+import numpy as np
+
+import pypore
+from pypore.extractors.threshold_detector import DetectorState, EVENT_DTYPE
+from pypore.util import iter_segment_chunks
+
+# Stupid python 3, dropping xrange....
+try:
+    xrange
+except NameError:
+    xrange = range
+
+# Number of shards per worker, so workers that finish early can pick up more work.
+SHARDS_PER_WORKER = 4
+
+
+def get_shards(length, shard_size, overlap):
+    """
+    Splits a range of samples into shards.
+
+    :param length: Total number of samples.
+    :param shard_size: Number of samples in the core of each shard.
+    :param overlap: Number of extra samples read before and after the core of each shard.
+    :return: List of (start, core_start, core_stop, stop) tuples. The cores cover [0, length) without overlapping.
+    """
+    if shard_size < 1:
+        raise ValueError("shard_size must be positive, was {0}.".format(shard_size))
+    if overlap < 0:
+        raise ValueError("overlap cannot be negative, was {0}.".format(overlap))
+    shards = []
+    for core_start in xrange(0, length, shard_size):
+        core_stop = min(core_start + shard_size, length)
+        shards.append((max(core_start - overlap, 0), core_start, core_stop, min(core_stop + overlap, length)))
+    return shards
+
+
+def _find_shard_events(filename, reader_class, detector, shard, chunk_size, baseline, noise):
+    """
+    Finds the events that start in the core of a shard. Run in a worker process.
+
+    Every shard starts from the baseline and noise estimated at the start of the file, so a shard that starts inside an
+    event does not take the event for the baseline. The leading overlap lets the baseline settle before the core. An
+    event that starts in the core but has not ended by the end of the shard is followed past the end of the shard until
+    it ends.
+    """
+    start, core_start, core_stop, stop = shard
+    reader = pypore.open_file(filename, reader_class)
+    try:
+        if chunk_size is None:
+            chunk_size = reader.chunk_size
+        state = DetectorState(detector, reader.sample_rate, offset=start, baseline=baseline, noise=noise)
+        for chunk in iter_segment_chunks(reader[start:stop], chunk_size):
+            state.process_chunk(chunk)
+
+        if state.in_event and state.event_start < core_stop:
+            for chunk in iter_segment_chunks(reader[stop:], chunk_size):
+                state.process_chunk(chunk)
+                if not state.in_event:
+                    break
+    finally:
+        reader.close()
+
+    events = state.get_events()
+    return events[(events.start >= core_start) & (events.start < core_stop)]
+
+
+def stitch_events(event_arrays):
+    """
+    Joins the events of consecutive shards, dropping any event that overlaps the previously kept event.
+
+    :param event_arrays: List of record arrays of :py:data:`pypore.extractors.threshold_detector.EVENT_DTYPE`, in
+                         shard order.
+    :return: A single record array of the events, in order.
+    """
+    events = np.concatenate([np.asarray(e, dtype=EVENT_DTYPE) for e in event_arrays] or [np.zeros(0, EVENT_DTYPE)])
+    if events.size > 1:
+        # an event overlaps the previous one when it starts before the latest stop so far
+        previous_stops = np.maximum.accumulate(events['stop'])
+        keep = np.ones(events.size, dtype=bool)
+        keep[1:] = events['start'][1:] >= previous_stops[:-1]
+        events = events[keep]
+    return events.view(np.recarray)
+
+
+def find_events_parallel(filename, detector, n_workers=None, shard_size=None, overlap=None, chunk_size=None,
+                         reader_class=None, executor=None):
+    """
+    Finds events in a file by searching overlapping shards of the file in parallel.
+
+    Each worker process opens the file with :py:func:`pypore.open_file`, searches the samples of its shard, and keeps the
+    events that start in the shard's core. The results are stitched together without duplicates.
+
+    :param filename: Filename to search.
+    :param detector: Detector to use, for example a :py:class:`pypore.extractors.threshold_detector.ThresholdDetector`.
+                     It must be picklable.
+    :param n_workers: (Optional) Number of worker processes. Default is the number of CPU cores.
+    :param shard_size: (Optional) Number of samples in the core of each shard. By default the file is split into
+                       :py:data:`SHARDS_PER_WORKER` shards per worker.
+    :param overlap: (Optional) Number of samples read before and after each shard's core. It should be longer than
+                    the longest event, and long enough for the baseline to settle. Defaults to the detector's
+                    max_event_length, or 10 chunks, whichever is larger.
+    :param chunk_size: (Optional) Number of samples each worker processes at a time. Defaults to the reader's
+                       chunk_size.
+    :param reader_class: (Optional) Reader class to open the file with. See :py:func:`pypore.open_file`.
+    :param executor: (Optional) A concurrent.futures Executor to run the shards on. By default a ProcessPoolExecutor
+                     with n_workers processes is created and shut down.
+    :return: Record array of :py:data:`pypore.extractors.threshold_detector.EVENT_DTYPE` of all of the events, in order.
+    """
+    if n_workers is None:
+        n_workers = multiprocessing.cpu_count()
+
+    reader = pypore.open_file(filename, reader_class)
+    length = len(reader)
+    if chunk_size is None:
+        chunk_size = reader.chunk_size
+    # the same starting estimate as a single pass over the file
+    initial = DetectorState(detector)
+    for chunk in iter_segment_chunks(reader, chunk_size):
+        initial._initialize_baseline(np.asarray(chunk, dtype=np.float64))
+        break
+    reader.close()
+
+    if shard_size is None:
+        shard_size = max(-(-length // (n_workers * SHARDS_PER_WORKER)), chunk_size)
+    if overlap is None:
+        overlap = max(getattr(detector, 'max_event_length', None) or 0, 10 * chunk_size)
+
+    shards = get_shards(length, shard_size, overlap)
+
+    own_executor = executor is None
+    if own_executor:
+        from concurrent.futures import ProcessPoolExecutor
+
+        executor = ProcessPoolExecutor(max_workers=n_workers)
+    try:
+        futures = [executor.submit(_find_shard_events, filename, reader_class, detector, shard, chunk_size,
+                                   initial.baseline, initial.noise)
+                   for shard in shards]
+        event_arrays = [future.result() for future in futures]
+    finally:
+        if own_executor:
+            executor.shutdown()
+
+    return stitch_events(event_arrays)
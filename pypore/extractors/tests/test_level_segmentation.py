@@ -0,0 +1,78 @@
+import unittest
+
+import numpy as np
+
+import pypore
+from pypore.extractors.level_segmentation import LevelSegmenter, LEVEL_DTYPE, binary_segmentation, estimate_noise
+from pypore.extractors.threshold_detector import ThresholdDetector
+import pypore.sampledata.testing_files as tf
+
+
+def _make_levels(random, means, lengths, noise=1.):
+    return np.concatenate([random.normal(mean, noise, length) for mean, length in zip(means, lengths)])
+
+
+class TestLevelSegmentation(unittest.TestCase):
+    def test_two_level_files(self):
+        """
+        Tests that the events of the two level test files are split into their two levels.
+        """
+        for filename in ['chimera_1event_2levels.log', 'chimera_nonoise_1event_2levels.log']:
+            reader = pypore.open_file(tf.get_abs_path(filename))
+            events = ThresholdDetector(min_noise=1e-10).find_events(reader)
+            levels = LevelSegmenter().segment_events(reader, events)
+            self.assertEqual(len(levels), 1)
+            self.assertEqual(levels[0].dtype, LEVEL_DTYPE)
+            np.testing.assert_array_equal(levels[0].start, [2000, 2750])
+            np.testing.assert_array_equal(levels[0].stop, [2750, 3500])
+            data = np.array(reader)
+            self.assertAlmostEqual(levels[0].mean_current[1] / data[2750:3500].mean(), 1., places=5)
+            reader.close()
+
+    def test_one_level_files(self):
+        for filename in ['chimera_1event.log', 'chimera_nonoise_2events_1levels.log']:
+            reader = pypore.open_file(tf.get_abs_path(filename))
+            events = ThresholdDetector(min_noise=1e-10).find_events(reader)
+            levels = LevelSegmenter().segment_events(reader, events, batch_size=1)
+            self.assertEqual([len(l) for l in levels], [1] * len(events))
+            np.testing.assert_array_equal([l.start[0] for l in levels], events.start)
+            reader.close()
+
+    def test_batch_matches_single(self):
+        """
+        Tests that segmenting many events at once gives the same levels as segmenting each alone.
+        """
+        random = np.random.RandomState(0)
+        events = [_make_levels(random, [0., 5., 2.], [200, 300, 100]), _make_levels(random, [1.], [50]),
+                  np.zeros(0), _make_levels(random, [0., -4., 0., -8.], [100, 100, 100, 100]), np.ones(5)]
+        offsets = np.concatenate(([0], np.cumsum([e.size for e in events])))
+
+        segmenter = LevelSegmenter()
+        batch = segmenter.segment_arrays(np.concatenate(events), offsets)
+        self.assertEqual(len(batch), len(events))
+        for event, levels in zip(events, batch):
+            single = segmenter.segment(event)
+            np.testing.assert_array_equal(levels.start, single.start)
+            np.testing.assert_array_equal(levels.stop, single.stop)
+            np.testing.assert_allclose(levels.mean_current, single.mean_current, rtol=1e-10)
+        np.testing.assert_array_equal(batch[0].start, [0, 200, 500])
+        # the noise can move steps by a few samples
+        np.testing.assert_allclose(batch[3].stop, [100, 200, 300, 400], rtol=0, atol=3)
+        self.assertEqual(len(batch[2]), 0)
+
+    def test_max_levels_and_min_length(self):
+        random = np.random.RandomState(1)
+        data = _make_levels(random, [0., -10., 0., -4.], [100, 100, 100, 100], noise=0.1)
+        levels = LevelSegmenter(max_levels=2).segment(data)
+        self.assertEqual(len(levels), 2)
+        levels = LevelSegmenter(min_level_length=150).segment(data)
+        self.assertTrue(np.all(levels.stop - levels.start >= 150))
+        self.assertRaises(ValueError, LevelSegmenter, max_levels=0)
+        self.assertRaises(ValueError, binary_segmentation, data, [0, data.size], [1.], min_level_length=0)
+
+    def test_estimate_noise(self):
+        random = np.random.RandomState(2)
+        events = [_make_levels(random, [0., 50.], [5000, 5000], noise=2.), random.normal(0, 0.5, 10000), [1.]]
+        offsets = np.concatenate(([0], np.cumsum([len(e) for e in events])))
+        noise = estimate_noise(np.concatenate(events), offsets)
+        np.testing.assert_allclose(noise, [2., 0.5, 0.], rtol=0.05)
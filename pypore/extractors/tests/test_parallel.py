@@ -0,0 +1,77 @@
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import pypore
+from pypore.extractors.parallel import find_events_parallel, get_shards, stitch_events
+from pypore.extractors.threshold_detector import ThresholdDetector, EVENT_DTYPE
+import pypore.sampledata.testing_files as tf
+
+
+class TestParallel(unittest.TestCase):
+    def test_get_shards(self):
+        """
+        Tests that the shard cores cover the data exactly once, and the overlaps are clipped to the data.
+        """
+        shards = get_shards(1000, 300, 50)
+
+        self.assertEqual(shards, [(0, 0, 300, 350), (250, 300, 600, 650), (550, 600, 900, 950), (850, 900, 1000, 1000)])
+        self.assertEqual(get_shards(0, 300, 50), [])
+        self.assertRaises(ValueError, get_shards, 1000, 0, 50)
+        self.assertRaises(ValueError, get_shards, 1000, 10, -1)
+
+    def test_stitch_events_drops_overlapping(self):
+        """
+        Tests that stitching removes events that overlap an earlier event.
+        """
+        first = np.array([(10, 20, 0., 0., 0.), (30, 40, 0., 0., 0.)], dtype=EVENT_DTYPE)
+        second = np.array([(35, 45, 0., 0., 0.), (50, 60, 0., 0., 0.)], dtype=EVENT_DTYPE)
+
+        events = stitch_events([first, np.zeros(0, dtype=EVENT_DTYPE), second])
+
+        self.assertEqual([(10, 20), (30, 40), (50, 60)], events[['start', 'stop']].tolist())
+        self.assertEqual(len(stitch_events([])), 0)
+
+    def test_matches_serial(self):
+        """
+        Tests that the events found in parallel are the same as the events found in a single pass, including events
+        that cross shard seams.
+        """
+        filename = tf.get_abs_path('chimera_nonoise_2events_1levels.log')
+        detector = ThresholdDetector(min_noise=1.e-10)
+
+        reader = pypore.open_file(filename)
+        serial = detector.find_events(reader)
+        reader.close()
+
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            for shard_size, overlap in [(1000, 500), (700, 300), (50, 1500)]:
+                events = find_events_parallel(filename, detector, shard_size=shard_size, overlap=overlap,
+                                              chunk_size=128, executor=executor)
+                np.testing.assert_array_equal(serial.start, events.start)
+                np.testing.assert_array_equal(serial.stop, events.stop)
+                np.testing.assert_array_almost_equal(serial.mean_current, events.mean_current)
+
+    def test_shard_starting_in_event(self):
+        """
+        Tests that a shard starting inside an event starts from the file's baseline, instead of taking the event for
+        the baseline and missing the events after it.
+        """
+        filename = tf.get_abs_path('chimera_nonoise_2events_1levels.log')
+        detector = ThresholdDetector(min_noise=1.e-10)
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            events = find_events_parallel(filename, detector, shard_size=2500, overlap=0, chunk_size=128,
+                                          executor=executor)
+
+        self.assertEqual([(2000, 3000), (4500, 5500)], events[['start', 'stop']].tolist())
+
+    def test_process_pool(self):
+        """
+        Tests finding events with the default process pool.
+        """
+        events = find_events_parallel(tf.get_abs_path('chimera_1event.log'), ThresholdDetector(), n_workers=2,
+                                      shard_size=1500, overlap=1200)
+
+        self.assertEqual([(2000, 3000)], events[['start', 'stop']].tolist())
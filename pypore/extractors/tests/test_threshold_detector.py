@@ -0,0 +1,103 @@
+import unittest
+
+import numpy as np
+
+import pypore
+from pypore.core import Segment
+from pypore.extractors.threshold_detector import ThresholdDetector, EVENT_DTYPE, DIRECTION_UP, DIRECTION_BOTH
+import pypore.sampledata.testing_files as tf
+
+
+class TestThresholdDetector(unittest.TestCase):
+    def _find_events(self, filename, **kwargs):
+        reader = pypore.open_file(tf.get_abs_path(filename))
+        events = ThresholdDetector(**kwargs).find_events(reader)
+        reader.close()
+        return events
+
+    def test_one_event(self):
+        """
+        Tests that the single event in the test files is found, with the correct statistics.
+        """
+        for filename in ['chimera_1event.log', 'chimera_1event_2levels.log']:
+            events = self._find_events(filename)
+
+            self.assertEqual(events.dtype, EVENT_DTYPE)
+            self.assertEqual(len(events), 1)
+            self.assertEqual(events.start[0], 2000)
+
+        reader = pypore.open_file(tf.get_abs_path('chimera_1event.log'))
+        events = ThresholdDetector().find_events(reader)
+        data = np.array(reader)
+        self.assertEqual(events.stop[0], 3000)
+        self.assertAlmostEqual(events.mean_current[0] / data[2000:3000].mean(), 1.0, places=5)
+        self.assertAlmostEqual(events.dwell_time[0], 1000 / reader.sample_rate)
+        reader.close()
+
+    def test_no_noise(self):
+        """
+        Tests that events are found in data without noise when a minimum noise level is given.
+        """
+        events = self._find_events('chimera_nonoise_2events_1levels.log', min_noise=1.e-10)
+
+        np.testing.assert_array_equal(events.start, [2000, 4500])
+        np.testing.assert_array_equal(events.stop, [3000, 5500])
+
+    def test_chunk_size_independent(self):
+        """
+        Tests that the events found do not depend on how the data is split into chunks.
+        """
+        reader = pypore.open_file(tf.get_abs_path('chimera_nonoise_1event_2levels.log'))
+        detector = ThresholdDetector(min_noise=1.e-10)
+        for chunk_size in [1, 100, 999, 100000]:
+            events = detector.find_events(reader, chunk_size)
+            np.testing.assert_array_equal(events.start, [2000])
+            np.testing.assert_array_equal(events.stop, [3500])
+        reader.close()
+
+    def test_direction(self):
+        """
+        Tests that only events in the requested direction are found.
+        """
+        data = np.random.RandomState(0).normal(0, 1., 10000)
+        data[1000:1100] -= 20.
+        data[5000:5200] += 20.
+
+        down = ThresholdDetector().find_events(data)
+        up = ThresholdDetector(direction=DIRECTION_UP).find_events(Segment(data, 1.e6))
+        both = ThresholdDetector(direction=DIRECTION_BOTH).find_events(data)
+
+        self.assertEqual([(1000, 1100)], down[['start', 'stop']].tolist())
+        self.assertEqual([(5000, 5200)], up[['start', 'stop']].tolist())
+        self.assertEqual([(1000, 1100), (5000, 5200)], both[['start', 'stop']].tolist())
+        self.assertAlmostEqual(up.dwell_time[0], 200 / 1.e6)
+
+    def test_event_length_limits(self):
+        """
+        Tests that events outside of the length limits are discarded.
+        """
+        data = np.zeros(10000)
+        data[1000:1010] = -1.
+        data[5000:5200] = -1.
+        data[8000:8050] = -1.
+
+        events = ThresholdDetector(min_event_length=20, max_event_length=100, min_noise=0.01).find_events(data)
+
+        self.assertEqual([(8000, 8050)], events[['start', 'stop']].tolist())
+
+    def test_event_in_progress_discarded(self):
+        """
+        Tests that an event that has not ended when the data ends is not returned.
+        """
+        data = np.zeros(1000)
+        data[900:] = -1.
+
+        events = ThresholdDetector(min_noise=0.01).find_events(data)
+
+        self.assertEqual(len(events), 0)
+
+    def test_invalid_parameters_raise(self):
+        self.assertRaises(ValueError, ThresholdDetector, threshold=0)
+        self.assertRaises(ValueError, ThresholdDetector, threshold=2., end_threshold=3.)
+        self.assertRaises(ValueError, ThresholdDetector, direction=2)
+        self.assertRaises(ValueError, ThresholdDetector, baseline_alpha=0)
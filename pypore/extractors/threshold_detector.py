@@ -0,0 +1,214 @@
+"""
+Streaming threshold event detection.
+
+Example usage:
+
+>>> import pypore
+>>> from pypore.extractors.threshold_detector import ThresholdDetector
+>>> import pypore.sampledata.testing_files as tf
+>>> reader = pypore.open_file(tf.get_abs_path('chimera_1event.log'))
+>>> events = ThresholdDetector(threshold=5.).find_events(reader)
+>>> len(events)
+1
+"""
+import numpy as np
+
+from pypore.util import iter_segment_chunks
+
+# Record format of detected events.
+#   start - index of the first sample of the event
+#   stop - index of the first sample after the event
+#   mean_current - mean current during the event
+#   baseline - baseline current when the event started
+#   dwell_time - length of the event, in seconds
+EVENT_DTYPE = np.dtype([('start', np.int64), ('stop', np.int64), ('mean_current', np.float64),
+                        ('baseline', np.float64), ('dwell_time', np.float64)])
+
+DIRECTION_DOWN = -1
+DIRECTION_BOTH = 0
+DIRECTION_UP = 1
+
+
+class ThresholdDetector(object):
+    """
+    Finds events where the current deviates from a moving baseline by more than a threshold.
+
+    The data is processed one chunk at a time, so memory use does not depend on the length of the data. An event starts
+    when the current moves more than threshold noise standard deviations away from the baseline, and ends when it
+    returns to within end_threshold noise standard deviations. The baseline and noise are estimated robustly from the
+    first chunk, then updated after every chunk from the samples that are not part of an event.
+    """
+
+    def __init__(self, threshold=5.0, end_threshold=None, direction=DIRECTION_DOWN, min_event_length=1,
+                 max_event_length=None, baseline_alpha=0.1, min_noise=0.0):
+        """
+        :param threshold: Number of noise standard deviations from the baseline that starts an event. Default is 5.
+        :param end_threshold: (Optional) Number of noise standard deviations from the baseline the current must
+                              return within to end an event. Default is half of threshold.
+        :param direction: Direction of events. :py:data:`DIRECTION_DOWN` (default) for blockades,
+                          :py:data:`DIRECTION_UP` for current enhancements, :py:data:`DIRECTION_BOTH` for either.
+        :param min_event_length: Events with fewer samples than this are discarded. Default is 1.
+        :param max_event_length: (Optional) Events with more samples than this are discarded. Default is no limit.
+        :param baseline_alpha: Weight of each new chunk in the exponential moving average of the baseline and noise.
+                               Default is 0.1.
+        :param min_noise: Lower limit of the noise standard deviation estimate, in the units of the data. Use this for
+                          data with little or no noise. Default is 0.
+        """
+        if threshold <= 0:
+            raise ValueError("threshold must be positive, was {0}.".format(threshold))
+        if end_threshold is None:
+            end_threshold = threshold / 2.
+        if not 0 <= end_threshold <= threshold:
+            raise ValueError("end_threshold must be between 0 and threshold, was {0}.".format(end_threshold))
+        if direction not in (DIRECTION_DOWN, DIRECTION_BOTH, DIRECTION_UP):
+            raise ValueError("direction must be -1, 0, or 1, was {0}.".format(direction))
+        if not 0 < baseline_alpha <= 1:
+            raise ValueError("baseline_alpha must be in (0, 1], was {0}.".format(baseline_alpha))
+
+        self.threshold = threshold
+        self.end_threshold = end_threshold
+        self.direction = direction
+        self.min_event_length = min_event_length
+        self.max_event_length = max_event_length
+        self.baseline_alpha = baseline_alpha
+        self.min_noise = min_noise
+
+    def find_events(self, segment, chunk_size=None):
+        """
+        Finds all of the events in the segment.
+
+        :param segment: A :py:class:`pypore.core.Segment`, reader, or 1D array to search.
+        :param chunk_size: (Optional) Number of data points to process at a time. Defaults to the segment's chunk_size.
+        :return: Numpy record array of :py:data:`EVENT_DTYPE`, one record per event, in order.
+        """
+        sample_rate = getattr(segment, 'sample_rate', 0.0)
+        state = DetectorState(self, sample_rate)
+        for chunk in iter_segment_chunks(segment, chunk_size):
+            state.process_chunk(chunk)
+        return state.get_events()
+
+
+class DetectorState(object):
+    """
+    Holds the state of a :py:class:`ThresholdDetector` between chunks of a single stream of data.
+    """
+
+    def __init__(self, detector, sample_rate=0.0, offset=0, baseline=None, noise=None):
+        """
+        :param detector: The :py:class:`ThresholdDetector` holding the detection parameters.
+        :param sample_rate: Sampling rate of the data, in Hz, used to calculate dwell times.
+        :param offset: Index of the first sample of the stream. Event indices are relative to this.
+        :param baseline: (Optional) Starting baseline. By default it is estimated from the first chunk.
+        :param noise: (Optional) Starting noise level, used with baseline.
+        """
+        self.detector = detector
+        self.sample_rate = sample_rate
+        self.position = offset
+
+        self.baseline = baseline
+        self.noise = noise
+
+        self.in_event = False
+        self._event_start = 0
+        self._event_sum = 0.0
+        self._event_baseline = 0.0
+
+        self._events = []
+
+    @property
+    def event_start(self):
+        """
+        :return: Index of the first sample of the event in progress, or None if not in an event.
+        """
+        if self.in_event:
+            return self._event_start
+        return None
+
+    def _deviation(self, chunk):
+        """
+        :return: How far each point is from the baseline, in the direction of the events.
+        """
+        if self.detector.direction == DIRECTION_DOWN:
+            return self.baseline - chunk
+        elif self.detector.direction == DIRECTION_UP:
+            return chunk - self.baseline
+        return np.abs(chunk - self.baseline)
+
+    def _initialize_baseline(self, chunk):
+        """
+        Robustly estimates the baseline and noise from a chunk that might contain events.
+        """
+        self.baseline = np.median(chunk)
+        # For normally distributed noise, the median absolute deviation is 0.6745 standard deviations
+        self.noise = max(np.median(np.abs(chunk - self.baseline)) / 0.6745, self.detector.min_noise)
+
+    def _update_baseline(self, chunk, deviation, start_level):
+        """
+        Updates the moving baseline and noise with the points of the chunk that are not part of an event.
+        """
+        quiet = chunk[np.abs(deviation) <= start_level]
+        if quiet.size < 2:
+            return
+        alpha = self.detector.baseline_alpha
+        self.baseline += alpha * (quiet.mean() - self.baseline)
+        self.noise = max(self.noise + alpha * (quiet.std() - self.noise), self.detector.min_noise)
+
+    def process_chunk(self, chunk):
+        """
+        Searches the next chunk of the stream for events.
+
+        :param chunk: 1D numpy array following the previously processed chunk.
+        """
+        chunk = np.asarray(chunk, dtype=np.float64)
+        if chunk.size == 0:
+            return
+        if self.baseline is None:
+            self._initialize_baseline(chunk)
+
+        start_level = self.detector.threshold * self.noise
+        end_level = self.detector.end_threshold * self.noise
+
+        deviation = self._deviation(chunk)
+        starts = np.flatnonzero(deviation > start_level)
+        ends = np.flatnonzero(deviation <= end_level)
+
+        # Walk through the threshold crossings, alternating between looking for event starts and ends.
+        i = 0
+        while True:
+            if not self.in_event:
+                k = np.searchsorted(starts, i)
+                if k == starts.size:
+                    break
+                i = starts[k]
+                self.in_event = True
+                self._event_start = self.position + i
+                self._event_sum = 0.0
+                self._event_baseline = self.baseline
+            k = np.searchsorted(ends, i)
+            if k == ends.size:
+                self._event_sum += chunk[i:].sum()
+                break
+            stop = ends[k]
+            self._event_sum += chunk[i:stop].sum()
+            self._end_event(self.position + stop)
+            i = stop
+
+        self._update_baseline(chunk, deviation, start_level)
+        self.position += chunk.size
+
+    def _end_event(self, stop):
+        self.in_event = False
+        length = stop - self._event_start
+        if length < self.detector.min_event_length:
+            return
+        if self.detector.max_event_length is not None and length > self.detector.max_event_length:
+            return
+        dwell_time = length / self.sample_rate if self.sample_rate else 0.0
+        self._events.append((self._event_start, stop, self._event_sum / length, self._event_baseline, dwell_time))
+
+    def get_events(self):
+        """
+        :return: Numpy record array of :py:data:`EVENT_DTYPE` of the events that have ended so far. An event still in
+                 progress at the end of the processed data is not included.
+        """
+        return np.array(self._events, dtype=EVENT_DTYPE).view(np.recarray)
@@ -0,0 +1,227 @@
+"""
+Streaming digital filters over segments and readers.
+
+Filters are IIR filters in second-order sections (SOS) form, applied to the data one chunk at a time, so traces much
+longer than memory can be filtered. The result is a :py:class:`FilteredSegment`, which is itself a sliceable
+:py:class:`pypore.core.Segment` that filters lazily, only when its data is read.
+
+Example usage:
+
+>>> import pypore
+>>> from pypore.filters import bessel_filter
+>>> import pypore.sampledata.testing_files as tf
+>>> reader = pypore.open_file(tf.get_abs_path('spheres_20140114_154938_beginning.log'))
+>>> filtered = bessel_filter(reader, cutoff=100e3, zero_phase=True)
+>>> first_ms = filtered[:6250]  # nothing is filtered until the data is read
+>>> mean = first_ms.mean()
+"""
+import numpy as np
+
+from pypore.core import LazySegment
+from pypore.util import get_slice_length, slice_combine
+
+try:
+    xrange
+except NameError:
+    xrange = range
+
+FILTER_BESSEL = 'bessel'
+FILTER_BUTTERWORTH = 'butterworth'
+
+# Relative size the impulse response of a filter must decay to before it is considered settled.
+SETTLING_TOLERANCE = 1e-9
+
+
+def design_filter(kind, order, cutoff, sample_rate):
+    """
+    Designs a low-pass filter.
+
+    :param kind: :py:data:`FILTER_BESSEL` or :py:data:`FILTER_BUTTERWORTH`.
+    :param order: Order of the filter.
+    :param cutoff: Cutoff frequency, in Hz.
+    :param sample_rate: Sampling rate of the data, in Hz.
+    :return: Numpy array of the filter's second-order sections, as used by scipy.signal.sosfilt.
+    """
+    import scipy.signal
+
+    if not sample_rate > 0:
+        raise ValueError("The sample rate must be known to design a filter, was {0}.".format(sample_rate))
+    if not 0 < cutoff < sample_rate / 2.:
+        raise ValueError("cutoff must be between 0 and the Nyquist frequency {0}, was {1}.".format(sample_rate / 2.,
+                                                                                                  cutoff))
+    wn = cutoff / (sample_rate / 2.)
+    if kind == FILTER_BESSEL:
+        return scipy.signal.bessel(order, wn, output='sos')
+    elif kind == FILTER_BUTTERWORTH:
+        return scipy.signal.butter(order, wn, output='sos')
+    raise ValueError("Unknown filter kind {0}.".format(kind))
+
+
+def get_settling_length(sos, tolerance=SETTLING_TOLERANCE):
+    """
+    Estimates the number of samples it takes the impulse response of a filter to decay below tolerance, from the
+    radius of its largest pole.
+
+    :param sos: Second-order sections of the filter.
+    :param tolerance: (Optional) Relative size of the decayed impulse response. Default is
+                      :py:data:`SETTLING_TOLERANCE`.
+    :return: Number of samples.
+    """
+    sos = np.atleast_2d(sos)
+    radius = max(np.abs(np.roots(section[3:])).max() if np.any(section[4:]) else 0. for section in sos)
+    if radius == 0:
+        # FIR sections only depend on the last two inputs each
+        return 2 * len(sos)
+    if radius >= 1:
+        raise ValueError("Filter is unstable, its largest pole has radius {0}.".format(radius))
+    return int(np.ceil(np.log(tolerance) / np.log(radius))) + 2 * len(sos)
+
+
+class FilteredSegment(LazySegment):
+    """
+    A :py:class:`pypore.core.LazySegment` of 1D data passed through an IIR filter, computed lazily one chunk at a time.
+
+    Causal filtering carries the filter state from chunk to chunk. Zero-phase filtering (forward and backward, like
+    scipy.signal.sosfiltfilt) filters overlapping blocks, each padded on both sides with padding extra samples that are
+    thrown away. Slices and single points are filtered the same way, starting padding samples early, so they match the
+    filtered whole to within the filter's settling tolerance.
+    """
+
+    def __init__(self, segment, sos, zero_phase=False, padding=None, sample_rate=None, _slice=None):
+        """
+        :param segment: 1D :py:class:`pypore.core.Segment`, reader, or array to filter.
+        :param sos: Second-order sections of the filter, see :py:func:`design_filter`.
+        :param zero_phase: (Optional) Whether to filter forward and backward, for no phase shift. Default is False.
+        :param padding: (Optional) Number of extra samples read before (and after, for zero-phase) each block to let
+                        the filter settle. Default is from :py:func:`get_settling_length`.
+        :param sample_rate: (Optional) Sampling rate of the source data, in Hz. Default is the segment's sample_rate.
+        """
+        super(FilteredSegment, self).__init__(segment)
+        if sample_rate is not None:
+            self.sample_rate = sample_rate
+        # kept for slices, which are made from the source segment
+        self._source_sample_rate = self.sample_rate
+        self.sos = np.atleast_2d(sos)
+        self.zero_phase = zero_phase
+        if padding is None:
+            padding = get_settling_length(self.sos)
+        self.padding = padding
+
+        self._length = len(segment)
+        if _slice is None:
+            _slice = slice(0, self._length, 1)
+        self._slice = _slice
+        self._shape = (get_slice_length(self._length, _slice),)
+
+        step = self._get_range()[2]
+        if step > 1:
+            self.sample_rate /= step
+
+    def __getitem__(self, item):
+        if isinstance(item, tuple):
+            if len(item) != 1:
+                raise IndexError("Too many indices for shape {0}.".format(self.shape))
+            item = item[0]
+        if isinstance(item, slice):
+            if item.step is not None and item.step < 0:
+                raise ValueError("Filtered segments can only be sliced with positive steps.")
+            return FilteredSegment(self.segment, self.sos, self.zero_phase, self.padding, self._source_sample_rate,
+                                   slice_combine(self._length, self._slice, item))
+        try:
+            index = int(item)
+        except TypeError:
+            raise TypeError("Non-valid index or slice {0}".format(item))
+        if not -self.size <= index < self.size:
+            raise IndexError("Index out of range.")
+        if index < 0:
+            index += self.size
+        start, _, step = self._get_range()
+        point = start + index * step
+        return next(self._iter_filtered(point, point + 1, 1))[0]
+
+    def _get_range(self):
+        """
+        :return: Tuple of the first index, stopping index, and step of the selected points of the source segment.
+        """
+        start, stop, step = self._slice.indices(self._length)
+        stop = start + step * (self.size - 1) + 1 if self.size > 0 else start
+        return start, stop, step
+
+    def _read(self, start, stop):
+        return np.asarray(self.segment[start:stop]).astype(np.float64, copy=False)
+
+    def _iter_filtered(self, start, stop, block_size):
+        """
+        Filters the points [start, stop) of the source segment, one contiguous block at a time.
+
+        :return: Generator of numpy arrays of the filtered blocks, in order.
+        """
+        import scipy.signal
+
+        if self.zero_phase:
+            for i in xrange(start, stop, block_size):
+                j = min(i + block_size, stop)
+                pad_start = max(0, i - self.padding)
+                block = self._read(pad_start, min(self._length, j + self.padding))
+                pad_length = min(3 * (2 * len(self.sos) + 1), block.size - 1)
+                filtered = scipy.signal.sosfiltfilt(self.sos, block, padlen=pad_length)
+                yield filtered[i - pad_start:j - pad_start]
+            return
+
+        # Start the filter in steady state at the first point read, then run it over padding points before start, so
+        # the output matches that of filtering from the start of the data.
+        zi = None
+        warm_up_start = max(0, start - self.padding)
+        if warm_up_start < start:
+            warm_up = self._read(warm_up_start, start)
+            zi = scipy.signal.sosfilt_zi(self.sos) * warm_up[0]
+            _, zi = scipy.signal.sosfilt(self.sos, warm_up, zi=zi)
+        for i in xrange(start, stop, block_size):
+            block = self._read(i, min(i + block_size, stop))
+            if zi is None:
+                zi = scipy.signal.sosfilt_zi(self.sos) * block[0]
+            filtered, zi = scipy.signal.sosfilt(self.sos, block, zi=zi)
+            yield filtered
+
+    def iter_chunks(self, size=None):
+        """
+        Iterates over the filtered data in consecutive chunks.
+
+        :param size: (Optional) Maximum number of data points in each chunk. Default is :py:attr:`chunk_size`.
+        :return: Generator of numpy arrays of the filtered data, in order.
+        """
+        if size is None:
+            size = self.chunk_size
+        if size < 1:
+            raise ValueError("Chunk size must be positive, was {0}.".format(size))
+        start, stop, step = self._get_range()
+        for block in self._iter_filtered(start, stop, size * step):
+            yield block[::step]
+
+
+def bessel_filter(segment, cutoff, order=4, zero_phase=False):
+    """
+    Low-pass filters a segment with a Bessel filter, which keeps the shape of events with little overshoot.
+
+    :param segment: 1D :py:class:`pypore.core.Segment` or reader to filter. It must have a sample_rate.
+    :param cutoff: Cutoff frequency, in Hz.
+    :param order: (Optional) Order of the filter. Default is 4.
+    :param zero_phase: (Optional) Whether to filter forward and backward, for no phase shift. Default is False.
+    :return: A :py:class:`FilteredSegment`.
+    """
+    sos = design_filter(FILTER_BESSEL, order, cutoff, segment.sample_rate)
+    return FilteredSegment(segment, sos, zero_phase)
+
+
+def butterworth_filter(segment, cutoff, order=4, zero_phase=False):
+    """
+    Low-pass filters a segment with a Butterworth filter, which has the flattest pass band.
+
+    :param segment: 1D :py:class:`pypore.core.Segment` or reader to filter. It must have a sample_rate.
+    :param cutoff: Cutoff frequency, in Hz.
+    :param order: (Optional) Order of the filter. Default is 4.
+    :param zero_phase: (Optional) Whether to filter forward and backward, for no phase shift. Default is False.
+    :return: A :py:class:`FilteredSegment`.
+    """
+    sos = design_filter(FILTER_BUTTERWORTH, order, cutoff, segment.sample_rate)
+    return FilteredSegment(segment, sos, zero_phase)
@@ -0,0 +1,26 @@
+# cython: boundscheck=False, wraparound=False
+"""
+Compiled kernel that scales raw Chimera data to current, see :py:mod:`pypore.i_o.chimera_reader`.
+"""
+
+
+def scale_raw_chimera(const unsigned short[:] values, unsigned short bit_mask, float scale_multiplication,
+                      float scale_addition, float[:] out):
+    """
+    Masks and scales raw Chimera values into out in a single pass, without temporary arrays.
+
+    The GIL is released while scaling, so several threads can scale parts of the same array at once.
+
+    :param values: 1D array of raw Chimera values, of native byte order '<u2' data.
+    :param bit_mask: Mask of the valid ADC bits.
+    :param scale_multiplication: Number to multiply the masked values by.
+    :param scale_addition: Number to add after multiplying.
+    :param out: 1D float32 array the same length as values.
+    """
+    cdef Py_ssize_t i
+    cdef Py_ssize_t n = values.shape[0]
+    if out.shape[0] != n:
+        raise ValueError("Output array has length {0}, should be {1}.".format(out.shape[0], n))
+    with nogil:
+        for i in range(n):
+            out[i] = <float> (values[i] & bit_mask) * scale_multiplication + scale_addition
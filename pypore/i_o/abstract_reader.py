@@ -1,4 +1,14 @@
+import numpy as np
+
 from pypore.core import Segment
+from pypore.i_o.metadata_cache import read_cache, update_cache
+from pypore.util import RunningStatistics, slice_combine, get_slice_length, is_index
+
+# Stupid python 3, dropping xrange....
+try:
+    xrange
+except NameError:
+    xrange = range
 
 
 class AbstractReader(Segment):
@@ -20,6 +30,16 @@ class AbstractReader(Segment):
     # units are datapoints
     _chunk_size = 12500
 
+    # Filename whose cache entry holds this reader's statistics. None if the reader only reads part of a file, or if
+    # caching is turned off. See :py:mod:`pypore.i_o.metadata_cache`.
+    _cache_filename = None
+
+    # Whether the reader returns the raw integers stored in the file instead of scaled current, the type of the raw
+    # integers, and the type of the returned data. See :py:meth:`_set_output_dtype`.
+    raw = False
+    raw_dtype = None
+    dtype = None
+
     @property
     def chunk_size(self):
         return self._chunk_size
@@ -34,9 +54,295 @@ class AbstractReader(Segment):
         """
         raise NotImplementedError
 
+    def _set_output_dtype(self, raw, dtype, raw_dtype, default_dtype):
+        """
+        Sets the type of the data returned by the reader.
+
+        Readers of raw integers are not given statistics from the metadata cache, since those are of the scaled data.
+
+        :param raw: Whether to return the raw integers instead of scaled data.
+        :param dtype: Type of the scaled data, or None for default_dtype. Cannot be given for raw readers.
+        :param raw_dtype: Type of the raw integers.
+        :param default_dtype: Default type of the scaled data.
+        """
+        if raw and dtype is not None:
+            raise ValueError("Cannot set the dtype of raw data, which is always {0}.".format(np.dtype(raw_dtype)))
+        self.raw = bool(raw)
+        self.raw_dtype = np.dtype(raw_dtype)
+        if raw:
+            self.dtype = self.raw_dtype
+        elif dtype is None:
+            self.dtype = np.dtype(default_dtype)
+        else:
+            self.dtype = np.dtype(dtype)
+            if self.dtype.kind != 'f':
+                raise ValueError("Scaled data must have a floating point dtype, not {0}.".format(self.dtype))
+
     def close(self):
         """close()
 
         Closes the file and the reader.
         """
         raise NotImplementedError
+
+    def _reads_whole_file(self):
+        """
+        Subclasses should override this if they can tell.
+
+        :return: True if the reader reads every point of every channel of its file, in order. False if it reads only
+                 part of the file, or if it cannot tell.
+        """
+        return False
+
+    def iter_chunks(self, size=None):
+        """
+        Iterates over the data in consecutive chunks, so the whole file never has to be loaded at once.
+
+        Subclasses can override this with a faster implementation.
+
+        :param size: (Optional) Maximum number of data points in each chunk. Default is :py:attr:`chunk_size`.
+        :return: Generator of numpy arrays of the data, in order.
+        """
+        if size is None:
+            size = self._chunk_size
+        if size < 1:
+            raise ValueError("Chunk size must be positive, was {0}.".format(size))
+        length = len(self)
+        for i in range(0, length, size):
+            yield np.array(self[i:i + size])
+
+    def read_into(self, out):
+        """
+        Reads all of the data into a preallocated array one chunk at a time, so a buffer can be reused across reads
+        instead of allocating a new array each time.
+
+        Subclasses can override this with a faster implementation.
+
+        :param out: Numpy array with the same shape as the reader.
+        :return: out, filled with the data.
+        """
+        if out.shape != self.shape:
+            raise ValueError("Output array has shape {0}, should be {1}.".format(out.shape, self.shape))
+        position = 0
+        for chunk in self.iter_chunks():
+            out[..., position:position + chunk.shape[-1]] = chunk
+            position += chunk.shape[-1]
+        return out
+
+    def _compute_statistics(self):
+        """
+        Computes the max, mean, min, and standard deviation in a single pass over the data, and caches all of them.
+
+        For multichannel selections, each statistic is a numpy array with one value per channel.
+
+        If the reader reads a whole single channel file, the statistics are also stored in the file's on-disk cache
+        entry, and are read from there the next time the file is opened.
+        """
+        cache_filename = self._cache_filename if self.ndim == 1 else None
+        if cache_filename is not None:
+            cached = read_cache(cache_filename).get('statistics')
+            if cached is not None:
+                self._max, self._mean, self._min, self._std = cached
+                return
+
+        n_channels = self.shape[0] if self.ndim > 1 else 1
+        channel_stats = [RunningStatistics() for i in xrange(n_channels)]
+        for chunk in self.iter_chunks(self._chunk_size):
+            for stats, channel in zip(channel_stats, np.reshape(chunk, (n_channels, -1))):
+                stats.update(channel)
+        if self.ndim > 1:
+            self._max = np.array([stats.max() for stats in channel_stats])
+            self._mean = np.array([stats.mean() for stats in channel_stats])
+            self._min = np.array([stats.min() for stats in channel_stats])
+            self._std = np.array([stats.std() for stats in channel_stats])
+            return
+
+        stats = channel_stats[0]
+        self._max = stats.max()
+        self._mean = stats.mean()
+        self._min = stats.min()
+        self._std = stats.std()
+
+        if cache_filename is not None:
+            update_cache(cache_filename, statistics=[self._max, self._mean, self._min, self._std])
+
+    def max(self):
+        if self._max is None:
+            self._compute_statistics()
+        return self._max
+
+    def mean(self):
+        if self._mean is None:
+            self._compute_statistics()
+        return self._mean
+
+    def min(self):
+        if self._min is None:
+            self._compute_statistics()
+        return self._min
+
+    def std(self):
+        if self._std is None:
+            self._compute_statistics()
+        return self._std
+
+
+class MultichannelReader(AbstractReader):
+    """
+    Base class of readers of files of one or more channels, whose data is selected by (channel, sample).
+
+    Single channel data, or a single selected channel, is 1D. Otherwise the data has shape (channel, sample).
+
+    Subclasses must set :py:attr:`channel_list_number` and :py:attr:`points_per_channel_total`, and implement
+    :py:meth:`get_data_from_selection` and :py:meth:`_get_view`.
+    """
+    channel_list_number = 1
+    points_per_channel_total = 0
+
+    # Either the index of a single selected channel (1D data) or a slice of channels (2D data, shape is
+    # (channel, sample)). None selects all channels.
+    _channel_selected = None
+
+    # Slice of the samples of every channel that the reader selects.
+    _slice = slice(0, None, 1)
+
+    def __array__(self):
+        return self.get_data_from_selection(self._slice, self._channel_selected)
+
+    def _get_total_dimension_length(self):
+        return self.points_per_channel_total
+
+    def _get_channel_indices(self, channels):
+        """
+        :param channels: A single channel index, a slice of channels, or None for all channels.
+        :return: Numpy array of the indices of the selected channels.
+        """
+        if channels is None:
+            channels = slice(None)
+        if isinstance(channels, slice):
+            return np.arange(*channels.indices(self.channel_list_number))
+        return np.array([channels])
+
+    def get_data_from_selection(self, s, channels=0):
+        """
+        Returns the requested data.
+
+        :param s: Slice of the samples to return.
+        :param channels: (Optional) Index of a single channel, or a slice of channels, or None for all channels.
+                        Default is channel 0.
+        :return: Numpy array of the selected data. The array is 1D if a single channel index was passed, otherwise it
+                has shape (channel, sample).
+        """
+        raise NotImplementedError
+
+    def _get_view(self, s, sample_rate, channels):
+        """
+        :param s: Slice of the samples of the file to select.
+        :param sample_rate: Sampling rate of the selected samples.
+        :param channels: A single channel index, a slice of channels, or None for all channels.
+        :return: A reader of the selection, sharing this reader's file.
+        """
+        raise NotImplementedError
+
+    def __getitem__(self, item):
+        """
+        Examples
+        --------
+
+        ::
+
+            array1 = reader[0]                  # single channel reader, or a single point of single channel data
+            array2 = reader[4:1400:3]           # slice selection of the samples of single channel data
+            array3 = reader[:, 1000:2000]       # samples 1000 to 2000 of every channel of multichannel data
+            array4 = reader[1, 1000:2000]       # samples 1000 to 2000 of channel 1
+
+        :param item:
+        :return:
+        """
+        if not isinstance(item, tuple):
+            item = (item,)
+
+        channel_selected = self._channel_selected
+        if self.ndim > 1:
+            if len(item) > 2:
+                raise IndexError("Too many indices for shape {0}.".format(self.shape))
+            channel_item = item[0]
+            item = item[1:]
+
+            channel_indices = self._get_channel_indices(self._channel_selected)
+            if is_index(channel_item):
+                if not -len(channel_indices) <= channel_item < len(channel_indices):
+                    raise IndexError("Channel index {0} out of range.".format(channel_item))
+                channel_selected = int(channel_indices[channel_item])
+            elif isinstance(channel_item, slice):
+                channel_selected = slice_combine(self.channel_list_number,
+                                                 self._channel_selected or slice(None), channel_item)
+            else:
+                raise TypeError("Non-valid index or slice {0}".format(channel_item))
+        elif len(item) > 1:
+            raise IndexError("Too many indices for shape {0}.".format(self.shape))
+
+        sample_item = item[0] if len(item) > 0 else slice(None)
+        sample_rate = self.sample_rate
+
+        if is_index(sample_item):
+            n_samples = get_slice_length(self._get_total_dimension_length(), self._slice)
+            if not -n_samples <= sample_item < n_samples:
+                raise IndexError("Index out of range.")
+            if sample_item < 0:
+                sample_item += n_samples
+            s = slice_combine(self._get_total_dimension_length(), self._slice, slice(sample_item, sample_item + 1))
+            values = self.get_data_from_selection(s, channel_selected)
+            return values[..., 0]
+        elif isinstance(sample_item, slice):
+            if sample_item.step is not None and sample_item.step > 1:
+                sample_rate /= sample_item.step
+            new_slice = slice_combine(self._get_total_dimension_length(), self._slice, sample_item)
+        else:
+            raise TypeError("Non-valid index or slice {0}".format(sample_item))
+
+        return self._get_view(new_slice, sample_rate, channel_selected)
+
+    def __iter__(self):
+        """
+        Makes the reader iterable.
+
+        Single channel data is read one chunk at a time. Iterating over multichannel data yields a reader for each
+        channel.
+        """
+        if self.ndim > 1:
+            for i in xrange(self.shape[0]):
+                yield self[i]
+            return
+
+        for chunk in self.iter_chunks():
+            for point in chunk:
+                yield point
+
+    @property
+    def ndim(self):
+        if self._ndim is None:
+            self._ndim = len(self.shape)
+        return self._ndim
+
+    @property
+    def shape(self):
+        if self._shape is None:
+            x = get_slice_length(self._get_total_dimension_length(), self._slice)
+            if is_index(self._channel_selected):
+                self._shape = (x,)
+            else:
+                self._shape = (self._get_channel_indices(self._channel_selected).size, x)
+        return self._shape
+
+    @property
+    def size(self):
+        if self._size is None:
+            self._size = 1
+            for i in self.shape:
+                self._size *= i
+        return self._size
+
+    def _reads_whole_file(self):
+        total = self.points_per_channel_total
+        return self._slice.indices(total)[2] == 1 and self.size == total * self.channel_list_number
@@ -0,0 +1,228 @@
+"""
+asyncio interface to readers, so data can be read from coroutines without blocking the event loop.
+
+Reads run on a bounded pool of threads, each through its own slice of the reader. Requests for ranges of samples made
+while earlier reads are waiting or running are coalesced: a request inside a range already being read waits for that
+read, and overlapping requests made in the same iteration of the event loop are merged into a single read.
+
+Requires python 3.7 or newer.
+
+Example usage:
+
+>>> import asyncio
+>>> import pypore
+>>> from pypore.i_o.async_reader import AsyncReader
+>>> import pypore.sampledata.testing_files as tf
+>>> async def read_both_halves(reader):
+...     async with AsyncReader(reader) as async_reader:
+...         return await asyncio.gather(async_reader.read(slice(0, 2500)), async_reader.read(slice(2500, 5000)))
+>>> reader = pypore.open_file(tf.get_abs_path('chimera_1event.log'))
+>>> first, second = asyncio.run(read_both_halves(reader))
+"""
+import asyncio
+import functools
+
+import numpy as np
+
+# Default number of threads that read data.
+DEFAULT_MAX_WORKERS = 4
+
+
+def _read_selection(reader, item):
+    """
+    Reads the data of reader[item] into memory.
+    """
+    selection = reader[item]
+    data = np.asarray(selection)
+    if selection is not reader and hasattr(selection, 'close'):
+        selection.close()
+    return data
+
+
+class _PendingRange(object):
+    """
+    A range of samples that is waiting to be read or being read, and the futures of the requests it answers.
+    """
+
+    def __init__(self, start, stop):
+        self.start = start
+        self.stop = stop
+        # list of (start, stop, future) of the requests
+        self.requests = []
+        # future of the read, once it is submitted
+        self.read = None
+
+
+class AsyncReader(object):
+    """
+    Wraps a reader, or any :py:class:`pypore.core.Segment`, for use from asyncio coroutines.
+    """
+
+    def __init__(self, reader, max_workers=DEFAULT_MAX_WORKERS, executor=None):
+        """
+        :param reader: The reader to read from. It is not closed by :py:meth:`close`.
+        :param max_workers: (Optional) Maximum number of reads running at once. Default is
+                            :py:data:`DEFAULT_MAX_WORKERS`.
+        :param executor: (Optional) A concurrent.futures Executor to read on. By default a ThreadPoolExecutor with
+                         max_workers threads is created, and shut down by :py:meth:`close`.
+        """
+        self.reader = reader
+        self._own_executor = executor is None
+        if executor is None:
+            from concurrent.futures import ThreadPoolExecutor
+
+            executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.executor = executor
+
+        # number of read calls, and of reads actually submitted to the executor
+        self.n_requests = 0
+        self.n_reads = 0
+
+        # ranges requested in this iteration of the event loop, and ranges being read
+        self._queued = []
+        self._in_flight = []
+        self._flush_scheduled = False
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @property
+    def shape(self):
+        return self.reader.shape
+
+    @property
+    def sample_rate(self):
+        return self.reader.sample_rate
+
+    def _get_range(self, item):
+        """
+        :return: Tuple of the start and stop of a contiguous, forward slice of the samples, or None if item is
+                 anything else.
+        """
+        if not isinstance(item, slice) or item.step not in (None, 1):
+            return None
+        start, stop, _ = item.indices(self.reader.shape[-1])
+        return start, max(start, stop)
+
+    def _get_sample_item(self, start, stop):
+        """
+        :return: The item that selects samples [start, stop) of every channel of the reader.
+        """
+        if self.reader.ndim > 1:
+            return slice(None), slice(start, stop)
+        return slice(start, stop)
+
+    def _run(self, item):
+        self.n_reads += 1
+        loop = asyncio.get_running_loop()
+        return loop.run_in_executor(self.executor, functools.partial(_read_selection, self.reader, item))
+
+    async def read(self, item):
+        """
+        Reads reader[item].
+
+        :param item: Index or slice of the reader. For multichannel readers, slices select samples of every channel.
+        :return: Numpy array of the data.
+        """
+        self.n_requests += 1
+        requested = self._get_range(item)
+        if requested is None:
+            if isinstance(item, slice) and self.reader.ndim > 1:
+                item = (slice(None), item)
+            return await self._run(item)
+        start, stop = requested
+        if start == stop:
+            return _read_selection(self.reader, self._get_sample_item(start, stop))
+
+        future = asyncio.get_running_loop().create_future()
+        for pending in self._in_flight:
+            if pending.start <= start and stop <= pending.stop:
+                pending.requests.append((start, stop, future))
+                return await future
+
+        pending = _PendingRange(start, stop)
+        pending.requests.append((start, stop, future))
+        self._queued.append(pending)
+        if not self._flush_scheduled:
+            self._flush_scheduled = True
+            asyncio.get_running_loop().call_soon(self._flush)
+        return await future
+
+    def _flush(self):
+        """
+        Merges the overlapping ranges requested in this iteration of the event loop, and starts reading
+        them.
+        """
+        self._flush_scheduled = False
+        queued = sorted(self._queued, key=lambda p: p.start)
+        self._queued = []
+        merged = []
+        for pending in queued:
+            if merged and pending.start < merged[-1].stop:
+                merged[-1].stop = max(merged[-1].stop, pending.stop)
+                merged[-1].requests.extend(pending.requests)
+            else:
+                merged.append(pending)
+
+        for pending in merged:
+            pending.read = self._run(self._get_sample_item(pending.start, pending.stop))
+            pending.read.add_done_callback(functools.partial(self._read_done, pending))
+            self._in_flight.append(pending)
+
+    def _read_done(self, pending, read):
+        self._in_flight.remove(pending)
+        for start, stop, future in pending.requests:
+            if future.cancelled():
+                continue
+            if read.cancelled():
+                future.cancel()
+            elif read.exception() is not None:
+                future.set_exception(read.exception())
+            else:
+                future.set_result(read.result()[..., start - pending.start:stop - pending.start])
+
+    async def iter_chunks(self, size=None, prefetch=2):
+        """
+        Iterates over the data in consecutive chunks, reading up to prefetch chunks ahead of the one being used.
+
+        Use with ``async for chunk in async_reader.iter_chunks():``.
+
+        :param size: (Optional) Maximum number of samples in each chunk. Default is the reader's chunk_size.
+        :param prefetch: (Optional) Number of chunks read ahead. Default is 2.
+        :return: Asynchronous generator of numpy arrays of the data, in order.
+        """
+        if size is None:
+            size = getattr(self.reader, 'chunk_size', 12500)
+        if size < 1:
+            raise ValueError("Chunk size must be positive, was {0}.".format(size))
+        if prefetch < 0:
+            raise ValueError("prefetch cannot be negative, was {0}.".format(prefetch))
+        length = self.reader.shape[-1]
+        starts = iter(range(0, length, size))
+        reads = []
+        try:
+            for start in starts:
+                reads.append(asyncio.ensure_future(self.read(slice(start, start + size))))
+                if len(reads) > prefetch:
+                    yield await reads.pop(0)
+            while reads:
+                yield await reads.pop(0)
+        finally:
+            for read in reads:
+                read.cancel()
+
+    def close(self):
+        """
+        Shuts down the executor, if it was created by this AsyncReader.
+        """
+        if self._own_executor:
+            self.executor.shutdown(wait=False)
@@ -0,0 +1,91 @@
+"""
+Bounded least recently used cache of decoded blocks of data files.
+
+Readers of block structured files keep the blocks they have decoded in a :py:class:`BlockCache`, so repeated small
+selections of the same part of a file, like single points or a window scrolled back and forth, are served from memory.
+A reader and all of the readers sliced from it share one cache.
+
+>>> import numpy as np
+>>> from pypore.i_o.block_cache import BlockCache
+>>> cache = BlockCache(max_bytes=1000)
+>>> cache.put(0, np.zeros(100))
+>>> cache.get(0).size, cache.get(1)
+(100, None)
+>>> cache.hits, cache.misses
+(1, 1)
+"""
+from collections import OrderedDict
+import threading
+
+# Default memory limit of a reader's block cache, in bytes.
+DEFAULT_BLOCK_CACHE_BYTES = 64 * 2 ** 20
+
+
+class BlockCache(object):
+    """
+    Least recently used cache of numpy arrays, limited by their total size in bytes. It is safe to use from several
+    threads.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_BLOCK_CACHE_BYTES):
+        """
+        :param max_bytes: (Optional) Maximum total size of the cached arrays, in bytes. 0 disables the cache. Default
+                          is :py:data:`DEFAULT_BLOCK_CACHE_BYTES`.
+        """
+        if max_bytes < 0:
+            raise ValueError("max_bytes cannot be negative, was {0}.".format(max_bytes))
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._blocks = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._blocks)
+
+    def __contains__(self, key):
+        return key in self._blocks
+
+    def get(self, key):
+        """
+        :return: The cached array of key, or None if it is not cached.
+        """
+        with self._lock:
+            value = self._blocks.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            # mark as most recently used
+            del self._blocks[key]
+            self._blocks[key] = value
+            return value
+
+    def put(self, key, value):
+        """
+        Caches an array, evicting the least recently used arrays to stay within max_bytes. Arrays larger than
+        max_bytes are not cached.
+
+        The array must not be modified afterwards, since it is returned as is by :py:meth:`get`.
+        """
+        if value.nbytes > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._blocks:
+                self.nbytes -= self._blocks.pop(key).nbytes
+            self._blocks[key] = value
+            self.nbytes += value.nbytes
+            while self.nbytes > self.max_bytes:
+                _, evicted = self._blocks.popitem(last=False)
+                self.nbytes -= evicted.nbytes
+
+    def clear(self):
+        """
+        Removes all of the cached arrays, and resets the hit and miss counters.
+        """
+        with self._lock:
+            self._blocks.clear()
+            self.nbytes = 0
+            self.hits = 0
+            self.misses = 0
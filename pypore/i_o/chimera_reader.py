@@ -4,6 +4,7 @@ import scipy.io as sio
 import numpy as np
 
 from pypore.i_o.abstract_reader import AbstractReader
+from pypore.i_o.metadata_cache import read_cache, update_cache
 
 
 # ctypedef np.float_t DTYPE_t
@@ -12,6 +13,15 @@ CHIMERA_DATA_TYPE = np.dtype('<u2')
 # mantissa is 23 bits for np.float32, well above 16 bit from raw
 CHIMERA_OUTPUT_DATA_TYPE = np.float32
 
+# Slices are only split between threads if each thread gets at least this many points.
+THREADED_MIN_POINTS = 2 ** 18
+
+try:
+    from pypore.i_o._chimera_scale import scale_raw_chimera as _scale_compiled
+except ImportError:
+    # the extension is not built, fall back to numpy
+    _scale_compiled = None
+
 # Stupid python 3, dropping xrange....
 try:
     xrange
@@ -19,10 +29,45 @@ except NameError:
     xrange = range
 
 
+def get_bit_mask(adc_bits):
+    """
+    :param adc_bits: Number of bits of the ADC.
+    :return: Mask of the valid high bits of raw Chimera values.
+    """
+    return np.array((2 ** 16) - 1 - (2 ** (16 - int(adc_bits)) - 1), dtype=CHIMERA_DATA_TYPE)
+
+
+def get_scaling(adc_v_ref, current_offset, tia_gain, pre_adc_gain):
+    """
+    Calculates the scaling from masked raw Chimera values to current, current = raw * multiplication + addition.
+
+    :return: Tuple of the scale multiplication and scale addition.
+    """
+    scale_multiplication = np.array((2 * adc_v_ref / 2 ** 16) / (pre_adc_gain * tia_gain),
+                                    dtype=CHIMERA_OUTPUT_DATA_TYPE)
+    scale_addition = np.array(current_offset - adc_v_ref / (pre_adc_gain * tia_gain), dtype=CHIMERA_OUTPUT_DATA_TYPE)
+    return scale_multiplication, scale_addition
+
+
+def _scale_numpy(values, bit_mask, scale_multiplication, scale_addition, out):
+    """
+    Numpy version of :py:func:`pypore.i_o._chimera_scale.scale_raw_chimera`. The cast to float is done as part of the
+    multiplication, so the only temporary array is the masked raw data.
+    """
+    masked = np.bitwise_and(values, bit_mask)
+    # the multiplication is done in the type of out
+    np.multiply(masked, scale_multiplication, out=out, dtype=out.dtype, casting='unsafe')
+    out += scale_addition
+    return out
+
+
 class ChimeraReader(AbstractReader):
     """
     Reader class that reads .log files (with corresponding .mat files) produced by the Chimera acquisition software
     at UPenn.
+
+    Raw readers return the masked uint16 values from the ADC, with current = raw * :py:attr:`scale_multiplication` +
+    :py:attr:`scale_addition`.
     """
     specs_file = None
 
@@ -36,8 +81,11 @@ class ChimeraReader(AbstractReader):
     pre_adc_gain = None
     bit_mask = None
 
-    def __array__(self):
-        return self._scale_raw_chimera(np.array(self._data[:]))
+    def __array__(self, dtype=None):
+        values = self.read_into(np.empty(self._data.shape, dtype=self.dtype))
+        if dtype is not None:
+            values = values.astype(dtype, copy=False)
+        return values
 
     def __getitem__(self, item):
         """
@@ -54,7 +102,7 @@ class ChimeraReader(AbstractReader):
         :return:
         """
         if isinstance(item, int):
-            return self._scale_raw_chimera(self._data[item])
+            return self._get_values(self._data[item])
         else:
             # reduce sample rate if the slice has steps
             sample_rate = self.sample_rate
@@ -62,33 +110,112 @@ class ChimeraReader(AbstractReader):
                 sample_rate /= item.step
 
             return ChimeraReader(self._data[item], self.filename, sample_rate, self.bit_mask,
-                                 self.scale_multiplication, self.scale_addition)
+                                 self.scale_multiplication, self.scale_addition, raw=self.raw,
+                                 dtype=None if self.raw else self.dtype)
 
     def __iter__(self):
         for point in self._data:
-            yield self._scale_raw_chimera(point)
+            yield self._get_values(point)
 
-    def _scale_raw_chimera(self, values):
+    def iter_chunks(self, size=None):
+        """
+        Iterates over the data in consecutive chunks.
+
+        :param size: (Optional) Maximum number of data points in each chunk. Default is :py:attr:`chunk_size`.
+        :return: Generator of numpy arrays of the data, in order.
+        """
+        if size is None:
+            size = self._chunk_size
+        if size < 1:
+            raise ValueError("Chunk size must be positive, was {0}.".format(size))
+        for i in xrange(0, self._data.size, size):
+            yield self._get_values(self._data[i:i + size])
+
+    def read_into(self, out, n_threads=1):
+        """
+        Scales the data straight from the memory map into a preallocated array, one chunk at a time. Only a chunk of
+        raw data is ever copied, so slices of huge files can be read into a reused buffer.
+
+        :param out: Numpy array of floats with the same shape as the reader, or of integers if the reader is raw.
+        :param n_threads: (Optional) Number of threads to scale with. Slices shorter than
+                          :py:data:`THREADED_MIN_POINTS` per thread use fewer threads. Default is 1.
+        :return: out, filled with the data.
+        """
+        if out.shape != self._data.shape:
+            raise ValueError("Output array has shape {0}, should be {1}.".format(out.shape, self._data.shape))
+        if self.raw:
+            np.bitwise_and(self._data, self.bit_mask, out=out, casting='unsafe')
+            return out
+        n_threads = max(1, min(n_threads, self._data.size // THREADED_MIN_POINTS))
+        if n_threads == 1:
+            self._scale_range_into(out, 0, self._data.size)
+            return out
+
+        # both the compiled kernel and numpy release the GIL, so threads scale their parts at the same time
+        from concurrent.futures import ThreadPoolExecutor
+
+        edges = np.linspace(0, self._data.size, n_threads + 1).astype(int)
+        with ThreadPoolExecutor(max_workers=n_threads) as executor:
+            futures = [executor.submit(self._scale_range_into, out, edges[i], edges[i + 1]) for i in xrange(n_threads)]
+            for future in futures:
+                future.result()
+        return out
+
+    def _scale_range_into(self, out, start, stop):
+        """
+        Scales the points [start, stop) into the same points of out, one chunk at a time.
+        """
+        size = self._chunk_size
+        for i in xrange(start, stop, size):
+            j = min(i + size, stop)
+            self._scale_raw_chimera(self._data[i:j], out[i:j])
+
+    def _get_values(self, values):
+        """
+        :param values: Raw Chimera value or numpy array of values.
+        :return: The masked raw values if the reader is raw, otherwise the scaled values.
+        """
+        if self.raw:
+            return np.bitwise_and(values, self.bit_mask).astype(self.dtype)
+        return self._scale_raw_chimera(values)
+
+    def _scale_raw_chimera(self, values, out=None):
         """
         Scales the raw chimera data to correct scaling.
 
+        Arrays are masked and scaled in a single pass by the compiled kernel in :py:mod:`pypore.i_o._chimera_scale`
+        when it is built, otherwise with numpy.
+
         :param values: numpy array of Chimera values. (raw <u2 datatype)
-        :returns: Array of scaled Chimera values (np.float datatype)
+        :param out: (Optional) Array to write the scaled values to, with the same shape as values.
+        :returns: Array of scaled Chimera values, of the reader's dtype
         """
-        values = values & self.bit_mask
-        if hasattr(values, '__iter__'):
-            values = values.astype(CHIMERA_OUTPUT_DATA_TYPE, copy=False)
+        if not hasattr(values, '__iter__'):
+            values = (values & self.bit_mask).astype(self.dtype)
+            values *= self.scale_multiplication
+            values += self.scale_addition
+            return values
+
+        if out is None:
+            out = np.empty(values.shape, dtype=self.dtype)
+        if (_scale_compiled is not None and values.ndim == 1 and values.dtype.isnative
+                and out.dtype == CHIMERA_OUTPUT_DATA_TYPE):
+            _scale_compiled(values, self.bit_mask, self.scale_multiplication, self.scale_addition, out)
         else:
-            values = values.astype(CHIMERA_OUTPUT_DATA_TYPE)
-        values *= self.scale_multiplication
-        values += self.scale_addition
-
-        return values
+            _scale_numpy(values, self.bit_mask, self.scale_multiplication, self.scale_addition, out)
+        return out
 
-    def __init__(self, data, *args):
+    def __init__(self, data, *args, **kwargs):
         """
         Implementation of :py:func:`prepare_data_file` for Chimera ".log" files with the associated ".mat" file.
+
+        :param cache: (Optional) Whether to use the on-disk metadata cache, see :py:mod:`pypore.i_o.metadata_cache`.
+                      Default is True.
+        :param raw: (Optional) Whether to return the masked raw uint16 values instead of current. Default is False.
+        :param dtype: (Optional) Floating point type of the current. Default is
+                      :py:data:`CHIMERA_OUTPUT_DATA_TYPE`.
         """
+        self._set_output_dtype(kwargs.get('raw', False), kwargs.get('dtype'), np.uint16, CHIMERA_OUTPUT_DATA_TYPE)
 
         if not isinstance(data, str):
             # Then we must copy the data to the new object
@@ -100,59 +227,67 @@ class ChimeraReader(AbstractReader):
             self.scale_addition = args[4]
             return
 
+        self.filename = data
+        use_cache = kwargs.get('cache', True)
+
         # remove 'log' append 'mat'
         specs_filename = data[:-len('log')] + 'mat'
-        # load the matlab file with parameters for the runs
-        try:
-            self.specs_file = sio.loadmat(specs_filename)
-        except IOError:
-            raise IOError(
-                "Error opening " + data + ", Chimera .mat specs file of same name must be located in same folder.")
 
         # Calculate number of points per channel
         file_size = os.path.getsize(data)
-        points_per_channel_total = file_size / CHIMERA_DATA_TYPE.itemsize
+        points_per_channel_total = file_size // CHIMERA_DATA_TYPE.itemsize
         shape = (points_per_channel_total,)
 
-        self.adc_bits = self.specs_file['SETUP_ADCBITS'][0][0]
-        self.adc_v_ref = self.specs_file['SETUP_ADCVREF'][0][0]
-        self.current_offset = self.specs_file['SETUP_pAoffset'][0][0]
-        self.tia_gain = self.specs_file['SETUP_TIAgain'][0][0]
-        self.pre_adc_gain = self.specs_file['SETUP_preADCgain'][0][0]
-
-        self.bit_mask = np.array((2 ** 16) - 1 - (2 ** (16 - self.adc_bits) - 1), dtype=CHIMERA_DATA_TYPE)
-
-        self.sample_rate = 1.0 * self.specs_file['SETUP_ADCSAMPLERATE'][0][0]
+        specs = None
+        if use_cache:
+            # only current of the default type keeps its statistics in the cache
+            if self.dtype == CHIMERA_OUTPUT_DATA_TYPE:
+                self._cache_filename = data
+            specs = read_cache(data).get('chimera_specs')
+            # the specs are only valid if the .mat file hasn't changed either
+            if specs is not None and (not os.path.exists(specs_filename) or specs['specs_file'] != [
+                    os.path.getsize(specs_filename), os.path.getmtime(specs_filename)]):
+                specs = None
+
+        if specs is None:
+            # load the matlab file with parameters for the runs
+            try:
+                self.specs_file = sio.loadmat(specs_filename)
+            except IOError:
+                raise IOError(
+                    "Error opening " + data + ", Chimera .mat specs file of same name must be located in same folder.")
+            specs = {'adc_bits': self.specs_file['SETUP_ADCBITS'][0][0],
+                     'adc_v_ref': self.specs_file['SETUP_ADCVREF'][0][0],
+                     'current_offset': self.specs_file['SETUP_pAoffset'][0][0],
+                     'tia_gain': self.specs_file['SETUP_TIAgain'][0][0],
+                     'pre_adc_gain': self.specs_file['SETUP_preADCgain'][0][0],
+                     'sample_rate': 1.0 * self.specs_file['SETUP_ADCSAMPLERATE'][0][0],
+                     'specs_file': [os.path.getsize(specs_filename), os.path.getmtime(specs_filename)]}
+            if use_cache:
+                # statistics cached with other specs are of differently scaled data
+                update_cache(data, chimera_specs=specs, statistics=None)
+
+        self.adc_bits = specs['adc_bits']
+        self.adc_v_ref = specs['adc_v_ref']
+        self.current_offset = specs['current_offset']
+        self.tia_gain = specs['tia_gain']
+        self.pre_adc_gain = specs['pre_adc_gain']
+
+        self.bit_mask = get_bit_mask(self.adc_bits)
+
+        self.sample_rate = specs['sample_rate']
 
         # calculate the scaling factor from raw data
-        self.scale_multiplication = np.array(
-            (2 * self.adc_v_ref / 2 ** 16) / (self.pre_adc_gain * self.tia_gain), dtype=CHIMERA_OUTPUT_DATA_TYPE)
-        self.scale_addition = np.array(self.current_offset - self.adc_v_ref / (self.pre_adc_gain * self.tia_gain),
-                                       dtype=CHIMERA_OUTPUT_DATA_TYPE)
+        self.scale_multiplication, self.scale_addition = get_scaling(self.adc_v_ref, self.current_offset,
+                                                                     self.tia_gain, self.pre_adc_gain)
 
         # Use numpy _data. Note this will fail for files > 4GB on 32 bit systems.
         # If you run into this, a more extreme lazy loading solution will be needed.
         self._data = np.memmap(data, dtype=CHIMERA_DATA_TYPE, mode='r', shape=shape)
 
-    def max(self):
-        if self._max is None:
-            self._max = np.array(self, copy=False).max()
-        return self._max
-
-    def mean(self):
-        if self._mean is None:
-            self._mean = np.array(self, copy=False).mean()
-        return self._mean
-
-    def min(self):
-        if self._min is None:
-            self._min = np.array(self, copy=False).min()
-        return self._min
-
-    def std(self):
-        if self._std is None:
-            self._std = np.array(self, copy=False).std()
-        return self._std
+    def _reads_whole_file(self):
+        itemsize = CHIMERA_DATA_TYPE.itemsize
+        return self._data.shape == (os.path.getsize(self.filename) // itemsize,) and self._data.strides == (itemsize,)
 
     def close(self):
         del self._data
@@ -0,0 +1,312 @@
+"""
+Conversion of data files to pypore's native format (.ppd files, see :py:mod:`pypore.i_o.native_reader`).
+
+Files are streamed one chunk at a time, so memory use does not depend on the file size. The raw integers of Chimera
+files, of every sample of any channels of Heka files, and of whole native files are copied as they are, with their
+scaling, so the conversion is lossless. Other data, such as a Heka slice of part of the samples or data of other
+readers, is quantized to 32 bit integers. The statistics of single channel files are stored in the native file, and
+their min/max overview (see :py:mod:`pypore.i_o.overview`) is saved next to it, in the same pass over the data.
+
+Example usage:
+
+>>> import os, tempfile
+>>> from pypore.i_o.convert import convert_file
+>>> import pypore.sampledata.testing_files as tf
+>>> output_filename = os.path.join(tempfile.mkdtemp(), 'converted.ppd')
+>>> output_filename = convert_file(tf.get_abs_path('heka_1.5s_mean5.32p_std2.76p.hkd'), output_filename)
+
+From the command line, every Chimera and Heka file in a directory can be converted with::
+
+    python -m pypore.i_o.convert path/to/data --output-directory path/to/converted --workers 4
+
+"""
+from collections import namedtuple
+import multiprocessing
+import os
+
+import numpy as np
+
+import pypore
+from pypore.i_o.native_reader import NATIVE_EXTENSION
+from pypore.i_o.native_writer import DEFAULT_CHUNK_LENGTH, NativeWriter, quantize
+from pypore.i_o.overview import PyramidBuilder, get_pyramid_filename
+from pypore.util import RunningStatistics
+
+try:
+    xrange
+except NameError:
+    xrange = range
+
+# Extensions of the files that are converted when converting directories.
+CONVERTIBLE_EXTENSIONS = ('.log', '.hkd')
+
+# Integer type that data without raw integers is quantized to.
+QUANTIZED_DTYPE = np.int32
+
+# Result of converting a single file.
+#   filename - the converted file
+#   output_filename - the native file written, or None if the conversion failed
+#   error - description of the error if the file could not be converted, otherwise None
+ConversionResult = namedtuple('ConversionResult', ['filename', 'output_filename', 'error'])
+
+
+def get_output_filename(filename, output_directory=None):
+    """
+    :param filename: Filename of a data file.
+    :param output_directory: (Optional) Directory of the native file. Default is the data file's directory.
+    :return: Filename of the native file the data file is converted to.
+    """
+    output_filename = os.path.splitext(filename)[0] + NATIVE_EXTENSION
+    if output_directory is not None:
+        output_filename = os.path.join(output_directory, os.path.basename(output_filename))
+    return output_filename
+
+
+def _reads_all_heka_samples(reader):
+    """
+    :return: True if a Heka reader reads every sample of its selected channels, in order.
+    """
+    total = reader.points_per_channel_total
+    return reader._slice.indices(total)[2] == 1 and reader.shape[-1] == total
+
+
+def _iter_heka_chunks(reader, chunk_length):
+    """
+    Groups runs of consecutive Heka blocks with the same scales into chunks, of the reader's selected channels.
+    Without a memory map, the blocks are read straight from the file, bypassing the block cache.
+    """
+    channels = reader._get_channel_indices(reader._channel_selected)
+    points_per_block = reader.per_file_params['Points per block']
+    blocks_per_chunk = max(1, chunk_length // points_per_block)
+    for i in xrange(0, reader.num_blocks_in_file, blocks_per_chunk):
+        stop_block = min(i + blocks_per_chunk, reader.num_blocks_in_file)
+        if reader._blocks is not None:
+            chunk = reader._blocks[i:stop_block]
+        else:
+            chunk = reader._read_block_range(i, stop_block)
+        scales = chunk['channel_params']['Scale'][:, channels].astype(np.float64)
+        edges = np.concatenate(([0], np.flatnonzero(np.any(scales[1:] != scales[:-1], axis=1)) + 1, [len(chunk)]))
+        for start, stop in zip(edges[:-1], edges[1:]):
+            raw = chunk['data'][start:stop][:, channels].transpose(1, 0, 2).reshape(channels.size, -1)
+            yield raw, scales[start], 0.
+
+
+def _iter_native_chunks(reader):
+    for i in xrange(len(reader._chunk_starts) - 1):
+        raw = np.array([reader._read_chunk(i, channel) for channel in xrange(reader.channel_list_number)])
+        yield raw, reader._scales[i], reader._offsets[i]
+
+
+def _iter_chimera_chunks(reader, chunk_length):
+    for i in xrange(0, reader._data.size, chunk_length):
+        raw = reader._data[i:i + chunk_length] & reader.bit_mask
+        yield raw[np.newaxis, :], float(reader.scale_multiplication), float(reader.scale_addition)
+
+
+def _iter_quantized_chunks(reader, chunk_length):
+    for chunk in reader.iter_chunks(chunk_length):
+        chunk = np.asarray(chunk, dtype=np.float64)
+        yield quantize(chunk.reshape(-1, chunk.shape[-1]), QUANTIZED_DTYPE)
+
+
+def _get_raw_source(reader, chunk_length):
+    """
+    :return: Tuple of the raw integer type, the type of the values, and a generator of tuples of each chunk's raw
+             integers, of shape (channel, sample), and the scale and offset of each channel.
+    """
+    from pypore.i_o.chimera_reader import ChimeraReader, CHIMERA_DATA_TYPE, CHIMERA_OUTPUT_DATA_TYPE
+    from pypore.i_o.heka_reader import HekaReader
+    from pypore.i_o.native_reader import NativeReader
+
+    if isinstance(reader, ChimeraReader):
+        return CHIMERA_DATA_TYPE, CHIMERA_OUTPUT_DATA_TYPE, _iter_chimera_chunks(reader, chunk_length)
+    if isinstance(reader, HekaReader) and _reads_all_heka_samples(reader):
+        return np.int16, np.float64, _iter_heka_chunks(reader, chunk_length)
+    if isinstance(reader, NativeReader) and reader._reads_whole_file():
+        return reader.raw_dtype, reader.file_dtype, _iter_native_chunks(reader)
+    return QUANTIZED_DTYPE, np.float64, _iter_quantized_chunks(reader, chunk_length)
+
+
+def convert_reader(reader, output_filename, chunk_length=DEFAULT_CHUNK_LENGTH, compression_level=6, pyramid=True,
+                   n_threads=None, metadata=None):
+    """
+    Writes the data of a reader to a native file.
+
+    :param reader: Reader, or slice of a reader, to convert.
+    :param output_filename: Filename of the native file to write.
+    :param chunk_length: (Optional) Approximate number of samples per chunk. Heka files keep whole blocks in each
+                         chunk. Default is :py:data:`pypore.i_o.native_writer.DEFAULT_CHUNK_LENGTH`.
+    :param compression_level: (Optional) zlib compression level, from 0 (no compression) to 9. Default is 6.
+    :param pyramid: (Optional) Whether to save the min/max overview of single channel data next to the native file.
+                    Default is True.
+    :param n_threads: (Optional) Number of threads that compress the channels of multichannel data. Default is the
+                      number of channels, up to the number of CPU cores.
+    :param metadata: (Optional) Dictionary of extra metadata to store. It must be JSON serializable.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    raw_dtype, dtype, chunks = _get_raw_source(reader, chunk_length)
+    n_channels = reader.shape[0] if reader.ndim > 1 else 1
+    channel_names = None
+    if getattr(reader, 'channel_list', None) is not None and n_channels == reader.channel_list_number:
+        channel_names = [str(name) for name, _ in reader.channel_list]
+    if n_threads is None:
+        n_threads = min(n_channels, multiprocessing.cpu_count())
+
+    statistics = None
+    builder = None
+    if n_channels == 1:
+        statistics = RunningStatistics()
+        if pyramid:
+            builder = PyramidBuilder(256)
+
+    executor = ThreadPoolExecutor(max_workers=n_threads) if n_threads > 1 else None
+    try:
+        with NativeWriter(output_filename, reader.sample_rate, n_channels, raw_dtype, dtype, compression_level,
+                          channel_names=channel_names, metadata=metadata, executor=executor) as writer:
+            for raw, scale, offset in chunks:
+                writer.write_chunk(raw, scale, offset)
+                if statistics is not None:
+                    # the same values the native reader returns
+                    values = (raw[0] * np.asarray(scale, dtype=np.float64).ravel()[0] +
+                              np.asarray(offset, dtype=np.float64).ravel()[0]).astype(dtype)
+                    statistics.update(values)
+                    if builder is not None:
+                        builder.update(values)
+            if statistics is not None and statistics.count > 0:
+                writer.statistics = [float(statistics.max()), float(statistics.mean()), float(statistics.min()),
+                                     float(statistics.std())]
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    if builder is not None:
+        builder.finish(4, reader.sample_rate).save(get_pyramid_filename(output_filename), output_filename, dtype)
+
+
+def convert_file(filename, output_filename=None, reader_class=None, **kwargs):
+    """
+    Converts a data file to a native file.
+
+    :param filename: Filename of the data file, opened with :py:func:`pypore.open_file`.
+    :param output_filename: (Optional) Filename of the native file. Default is from :py:func:`get_output_filename`.
+    :param reader_class: (Optional) Reader class to open the file with.
+    :param kwargs: Passed to :py:func:`convert_reader`.
+    :return: The filename of the native file.
+    """
+    if output_filename is None:
+        output_filename = get_output_filename(filename)
+    if os.path.abspath(output_filename) == os.path.abspath(filename):
+        raise ValueError("Cannot convert {0} onto itself.".format(filename))
+
+    reader = pypore.open_file(filename, reader_class)
+    try:
+        metadata = {'source_filename': os.path.basename(filename), 'source_reader': type(reader).__name__}
+        convert_reader(reader, output_filename, metadata=metadata, **kwargs)
+    finally:
+        reader.close()
+    return output_filename
+
+
+def _convert_file_result(filename, output_directory, kwargs):
+    """
+    :return: A :py:class:`ConversionResult`. Errors are returned in its error field.
+    """
+    try:
+        output_filename = convert_file(filename, get_output_filename(filename, output_directory), **kwargs)
+    except (IOError, ValueError) as e:
+        return ConversionResult(filename, None, str(e))
+    return ConversionResult(filename, output_filename, None)
+
+
+def convert_files(paths, output_directory=None, n_workers=None, max_open_files=None, executor=None, **kwargs):
+    """
+    Converts many files in parallel, yielding each result as soon as it is done.
+
+    Files are only submitted to the workers as earlier ones complete, so at most max_open_files conversions are queued
+    or running at once, no matter how many files there are.
+
+    :param paths: Files to convert. See :py:func:`pypore.batch.find_files`. Only files with
+                  :py:data:`CONVERTIBLE_EXTENSIONS` are converted.
+    :param output_directory: (Optional) Directory to write the native files to. Default is next to each file.
+    :param n_workers: (Optional) Number of worker processes. Default is the number of CPU cores.
+    :param max_open_files: (Optional) Maximum number of files being converted at once. Default is n_workers.
+    :param executor: (Optional) A concurrent.futures Executor to run the conversions on. By default a
+                     ProcessPoolExecutor with n_workers processes is created and shut down.
+    :param kwargs: Passed to :py:func:`convert_file`.
+    :return: Generator of :py:class:`ConversionResult`, in order of completion.
+    """
+    from concurrent.futures import wait, FIRST_COMPLETED
+    from pypore.batch import find_files
+
+    if n_workers is None:
+        n_workers = multiprocessing.cpu_count()
+    if max_open_files is None:
+        max_open_files = n_workers
+    if max_open_files < 1:
+        raise ValueError("max_open_files must be positive, was {0}.".format(max_open_files))
+    if output_directory is not None and not os.path.isdir(output_directory):
+        os.makedirs(output_directory)
+
+    filenames = iter(find_files(paths, CONVERTIBLE_EXTENSIONS))
+
+    own_executor = executor is None
+    if own_executor:
+        from concurrent.futures import ProcessPoolExecutor
+
+        executor = ProcessPoolExecutor(max_workers=n_workers)
+    try:
+        pending = set()
+        for filename in filenames:
+            pending.add(executor.submit(_convert_file_result, filename, output_directory, kwargs))
+            if len(pending) >= max_open_files:
+                break
+
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                for filename in filenames:
+                    pending.add(executor.submit(_convert_file_result, filename, output_directory, kwargs))
+                    break
+                yield future.result()
+    finally:
+        for future in pending:
+            future.cancel()
+        if own_executor:
+            executor.shutdown()
+
+
+def main(args=None):
+    """
+    Command line interface of :py:func:`convert_files`.
+
+    :param args: (Optional) List of command line arguments. Default is sys.argv[1:].
+    :return: Exit status, 1 if any file could not be converted.
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Convert Chimera and Heka files to the pypore native format.')
+    parser.add_argument('paths', nargs='+', help='Files, directories, or glob patterns to convert.')
+    parser.add_argument('-o', '--output-directory', help='Directory to write the native files to.')
+    parser.add_argument('-j', '--workers', type=int, help='Number of files converted at once.')
+    parser.add_argument('--chunk-length', type=int, default=DEFAULT_CHUNK_LENGTH, help='Samples per chunk.')
+    parser.add_argument('--compression-level', type=int, default=6, help='zlib compression level, 0 to 9.')
+    parser.add_argument('--no-pyramid', action='store_true', help='Do not save min/max overviews.')
+    options = parser.parse_args(args)
+
+    status = 0
+    for result in convert_files(options.paths, options.output_directory, options.workers,
+                                chunk_length=options.chunk_length, compression_level=options.compression_level,
+                                pyramid=not options.no_pyramid):
+        if result.error is None:
+            print("{0} -> {1}".format(result.filename, result.output_filename))
+        else:
+            print("{0}: {1}".format(result.filename, result.error))
+            status = 1
+    return status
+
+
+if __name__ == '__main__':
+    import sys
+
+    sys.exit(main())
@@ -0,0 +1,310 @@
+"""
+Persistent database of detected events, stored in a SQLite file.
+
+Each event is stored with the data file it was found in, its sample offsets in that file, its current levels, and its
+dwell time. The dwell time, blockade depth, and file of the events are indexed, so filtering millions of events does
+not scan the whole table. The raw samples around any event are read through a slice of the event's data file's reader.
+
+Example usage:
+
+>>> import pypore
+>>> from pypore.extractors.threshold_detector import ThresholdDetector
+>>> from pypore.i_o.event_database import EventDatabase
+>>> import pypore.sampledata.testing_files as tf
+>>> filename = tf.get_abs_path('chimera_1event.log')
+>>> reader = pypore.open_file(filename)
+>>> database = EventDatabase(':memory:')
+>>> ids = database.add_events(filename, ThresholdDetector(threshold=5.).find_events(reader), reader.sample_rate)
+>>> long_events = database.query(min_dwell_time=1e-4)
+>>> samples = database.get_event_data(long_events.id[0], padding=100)
+>>> database.close()
+"""
+import os
+import sqlite3
+
+import numpy as np
+
+import pypore
+from pypore.extractors.level_segmentation import LEVEL_DTYPE
+
+# Record format of events returned from the database.
+#   id - id of the event in the database
+#   file_id - id of the data file of the event
+#   start - index of the first sample of the event in the data file
+#   stop - index of the first sample after the event
+#   mean_current - mean current during the event
+#   baseline - baseline current when the event started
+#   dwell_time - length of the event, in seconds
+#   blockade_depth - baseline - mean_current, positive for blockades
+#   n_levels - number of current levels stored for the event
+DATABASE_EVENT_DTYPE = np.dtype([('id', np.int64), ('file_id', np.int64), ('start', np.int64), ('stop', np.int64),
+                                 ('mean_current', np.float64), ('baseline', np.float64), ('dwell_time', np.float64),
+                                 ('blockade_depth', np.float64), ('n_levels', np.int64)])
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    filename TEXT UNIQUE NOT NULL,
+    sample_rate REAL NOT NULL,
+    reader_class TEXT
+);
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    file_id INTEGER NOT NULL REFERENCES files (id),
+    start INTEGER NOT NULL,
+    stop INTEGER NOT NULL,
+    mean_current REAL NOT NULL,
+    baseline REAL NOT NULL,
+    dwell_time REAL NOT NULL,
+    blockade_depth REAL NOT NULL,
+    n_levels INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS levels (
+    event_id INTEGER NOT NULL REFERENCES events (id),
+    level INTEGER NOT NULL,
+    start INTEGER NOT NULL,
+    stop INTEGER NOT NULL,
+    mean_current REAL NOT NULL,
+    PRIMARY KEY (event_id, level)
+);
+CREATE INDEX IF NOT EXISTS events_file ON events (file_id, start);
+CREATE INDEX IF NOT EXISTS events_dwell_time ON events (dwell_time);
+CREATE INDEX IF NOT EXISTS events_blockade_depth ON events (blockade_depth);
+"""
+
+_EVENT_COLUMNS = ', '.join(DATABASE_EVENT_DTYPE.names)
+
+
+class EventDatabase(object):
+    """
+    SQLite database of events, and of the data files they were found in.
+
+    Data files are identified by their absolute path. Readers opened to fetch event data are kept open until
+    :py:meth:`close`.
+    """
+
+    def __init__(self, filename):
+        """
+        :param filename: Filename of the database. It is created if it does not exist. Use ':memory:' for a temporary
+                         database.
+        """
+        self.filename = filename
+        self._connection = sqlite3.connect(filename)
+        self._connection.executescript(_SCHEMA)
+        self._connection.commit()
+        # open readers, by file id
+        self._readers = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        return self._connection.execute('SELECT COUNT(*) FROM events').fetchone()[0]
+
+    def add_file(self, filename, sample_rate=0.0, reader_class=None):
+        """
+        Adds a data file, if it is not already in the database.
+
+        :param filename: Filename of the data file.
+        :param sample_rate: (Optional) Sampling rate of the data file.
+        :param reader_class: (Optional) Reader class to open the file with. Only its name is stored, so it must be
+                             one of pypore's readers. By default the reader is chosen by :py:func:`pypore.open_file`.
+        :return: The id of the file.
+        """
+        filename = os.path.abspath(filename)
+        reader_class_name = reader_class.__name__ if reader_class is not None else None
+        row = self._connection.execute('SELECT id FROM files WHERE filename = ?', (filename,)).fetchone()
+        if row is not None:
+            return row[0]
+        cursor = self._connection.execute('INSERT INTO files (filename, sample_rate, reader_class) VALUES (?, ?, ?)',
+                                          (filename, float(sample_rate), reader_class_name))
+        self._connection.commit()
+        return cursor.lastrowid
+
+    def get_filename(self, file_id):
+        """
+        :return: The absolute filename of the data file with id file_id.
+        """
+        row = self._connection.execute('SELECT filename FROM files WHERE id = ?', (int(file_id),)).fetchone()
+        if row is None:
+            raise KeyError("No file with id {0}.".format(file_id))
+        return row[0]
+
+    def get_files(self):
+        """
+        :return: List of (id, filename) tuples of every data file, in order of id.
+        """
+        return self._connection.execute('SELECT id, filename FROM files ORDER BY id').fetchall()
+
+    def add_events(self, filename, events, sample_rate=0.0, levels=None, reader_class=None):
+        """
+        Adds the events found in a data file, in a single transaction.
+
+        :param filename: Filename of the data file the events were found in.
+        :param events: Record array of :py:data:`pypore.extractors.threshold_detector.EVENT_DTYPE`.
+        :param sample_rate: (Optional) Sampling rate of the data file.
+        :param levels: (Optional) List of the levels of each event, each a record array of
+                       :py:data:`pypore.extractors.level_segmentation.LEVEL_DTYPE`, with indices in the data file.
+        :param reader_class: (Optional) Reader class to open the file with.
+        :return: Numpy array of the ids of the added events.
+        """
+        file_id = self.add_file(filename, sample_rate, reader_class)
+        events = np.asarray(events)
+        if levels is not None and len(levels) != len(events):
+            raise ValueError("Got levels of {0} events for {1} events.".format(len(levels), len(events)))
+        n_levels = [len(l) for l in levels] if levels is not None else [0] * len(events)
+
+        rows = zip([file_id] * len(events), events['start'].tolist(), events['stop'].tolist(),
+                   events['mean_current'].tolist(), events['baseline'].tolist(), events['dwell_time'].tolist(),
+                   (events['baseline'] - events['mean_current']).tolist(), n_levels)
+        with self._connection:
+            first_id = self._connection.execute('SELECT COALESCE(MAX(id), 0) FROM events').fetchone()[0] + 1
+            ids = np.arange(first_id, first_id + len(events), dtype=np.int64)
+            self._connection.executemany('INSERT INTO events (id, file_id, start, stop, mean_current, baseline, '
+                                         'dwell_time, blockade_depth, n_levels) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                                         ((int(i),) + row for i, row in zip(ids, rows)))
+            if levels is not None:
+                self._connection.executemany('INSERT INTO levels (event_id, level, start, stop, mean_current) '
+                                             'VALUES (?, ?, ?, ?, ?)',
+                                             ((int(event_id), i) + tuple(level.tolist())
+                                              for event_id, event_levels in zip(ids, levels)
+                                              for i, level in enumerate(np.asarray(event_levels, dtype=LEVEL_DTYPE))))
+        return ids
+
+    def add_results(self, results):
+        """
+        Adds the events of batch analysis results, as they arrive.
+
+        :param results: Iterable of :py:class:`pypore.batch.FileResult`, for example from
+                        :py:func:`pypore.batch.batch_analyze`. Results without events are skipped.
+        :return: The number of events added.
+        """
+        n_events = 0
+        for result in results:
+            if result.error is None and result.events is not None:
+                n_events += len(self.add_events(result.filename, result.events, result.metadata.sample_rate))
+        return n_events
+
+    def _get_where(self, filename, min_dwell_time, max_dwell_time, min_blockade_depth, max_blockade_depth):
+        """
+        :return: Tuple of the WHERE clause, possibly empty, and its parameters.
+        """
+        conditions = []
+        parameters = []
+        if filename is not None:
+            conditions.append('file_id = (SELECT id FROM files WHERE filename = ?)')
+            parameters.append(os.path.abspath(filename))
+        for column, operator, value in [('dwell_time', '>=', min_dwell_time), ('dwell_time', '<=', max_dwell_time),
+                                        ('blockade_depth', '>=', min_blockade_depth),
+                                        ('blockade_depth', '<=', max_blockade_depth)]:
+            if value is not None:
+                conditions.append('{0} {1} ?'.format(column, operator))
+                parameters.append(float(value))
+        if not conditions:
+            return '', parameters
+        return ' WHERE ' + ' AND '.join(conditions), parameters
+
+    def query(self, filename=None, min_dwell_time=None, max_dwell_time=None, min_blockade_depth=None,
+              max_blockade_depth=None, limit=None):
+        """
+        Finds the events that match all of the given conditions.
+
+        :param filename: (Optional) Only return events of this data file.
+        :param min_dwell_time: (Optional) Minimum dwell time, in seconds.
+        :param max_dwell_time: (Optional) Maximum dwell time, in seconds.
+        :param min_blockade_depth: (Optional) Minimum blockade depth, baseline - mean current.
+        :param max_blockade_depth: (Optional) Maximum blockade depth.
+        :param limit: (Optional) Maximum number of events to return.
+        :return: Numpy record array of :py:data:`DATABASE_EVENT_DTYPE`, in order of id.
+        """
+        where, parameters = self._get_where(filename, min_dwell_time, max_dwell_time, min_blockade_depth,
+                                            max_blockade_depth)
+        sql = 'SELECT {0} FROM events{1} ORDER BY id'.format(_EVENT_COLUMNS, where)
+        if limit is not None:
+            sql += ' LIMIT ?'
+            parameters.append(int(limit))
+        rows = self._connection.execute(sql, parameters).fetchall()
+        return np.array(rows, dtype=DATABASE_EVENT_DTYPE).view(np.recarray)
+
+    def count(self, filename=None, min_dwell_time=None, max_dwell_time=None, min_blockade_depth=None,
+              max_blockade_depth=None):
+        """
+        :return: The number of events that match all of the given conditions. See :py:meth:`query`.
+        """
+        where, parameters = self._get_where(filename, min_dwell_time, max_dwell_time, min_blockade_depth,
+                                            max_blockade_depth)
+        return self._connection.execute('SELECT COUNT(*) FROM events' + where, parameters).fetchone()[0]
+
+    def get_event(self, event_id):
+        """
+        :return: The event with id event_id, as a record of :py:data:`DATABASE_EVENT_DTYPE`.
+        """
+        row = self._connection.execute('SELECT {0} FROM events WHERE id = ?'.format(_EVENT_COLUMNS),
+                                       (int(event_id),)).fetchone()
+        if row is None:
+            raise KeyError("No event with id {0}.".format(event_id))
+        return np.array([row], dtype=DATABASE_EVENT_DTYPE).view(np.recarray)[0]
+
+    def get_levels(self, event_id):
+        """
+        :return: Numpy record array of :py:data:`pypore.extractors.level_segmentation.LEVEL_DTYPE` of the levels of
+                 the event, in order.
+        """
+        rows = self._connection.execute('SELECT start, stop, mean_current FROM levels WHERE event_id = ? '
+                                        'ORDER BY level', (int(event_id),)).fetchall()
+        return np.array(rows, dtype=LEVEL_DTYPE).view(np.recarray)
+
+    def get_reader(self, file_id):
+        """
+        :return: An open reader of the data file with id file_id. Readers are opened once, and kept open until
+                 :py:meth:`close`.
+        """
+        file_id = int(file_id)
+        if file_id not in self._readers:
+            row = self._connection.execute('SELECT filename, reader_class FROM files WHERE id = ?',
+                                           (file_id,)).fetchone()
+            if row is None:
+                raise KeyError("No file with id {0}.".format(file_id))
+            reader_class = _find_reader_class(row[1]) if row[1] is not None else None
+            self._readers[file_id] = pypore.open_file(row[0], reader_class)
+        return self._readers[file_id]
+
+    def get_event_data(self, event_id, padding=0):
+        """
+        Gets the samples of an event, and optionally of the baseline around it, without reading the rest of the file.
+
+        :param event_id: Id of the event.
+        :param padding: (Optional) Number of extra samples before and after the event. Default is 0.
+        :return: A slice of the reader of the event's data file. Its data is read when it is used.
+        """
+        event = self.get_event(event_id)
+        reader = self.get_reader(event.file_id)
+        return reader[max(0, int(event.start) - padding):int(event.stop) + padding]
+
+    def close(self):
+        """
+        Closes the database, and the readers opened by :py:meth:`get_reader`.
+        """
+        for reader in self._readers.values():
+            reader.close()
+        self._readers = {}
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+
+def _find_reader_class(name):
+    """
+    :return: The pypore reader class with the name.
+    """
+    from pypore.i_o.chimera_reader import ChimeraReader
+    from pypore.i_o.heka_reader import HekaReader
+    from pypore.i_o.native_reader import NativeReader
+
+    for reader_class in (ChimeraReader, HekaReader, NativeReader):
+        if reader_class.__name__ == name:
+            return reader_class
+    raise ValueError("Unknown reader class {0}.".format(name))
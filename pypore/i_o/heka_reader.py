@@ -1,9 +1,12 @@
 import os
+import threading
 
 import numpy as np
 
-from pypore.i_o.abstract_reader import AbstractReader
-from pypore.util import slice_combine, get_slice_length
+from pypore.i_o.abstract_reader import MultichannelReader
+from pypore.i_o.block_cache import BlockCache, DEFAULT_BLOCK_CACHE_BYTES
+from pypore.i_o.metadata_cache import read_cache, update_cache
+from pypore.util import get_slice_length, is_index
 
 # Data types list, in order specified by the HEKA file header v2.0.
 # Using big-endian.
@@ -17,6 +20,9 @@ HEKA_ENCODINGS = [np.dtype('>u1'), np.dtype('>u2'), np.dtype('>u4'),
 
 HEKA_DATATYPE = dt = np.dtype('>i2')  # int16
 
+# Number of bytes read at a time when reading the headers of every block without a memory map.
+HEADER_READ_BYTES = 16 * 2 ** 20
+
 # Stupid python 3, dropping xrange....
 try:
     xrange
@@ -35,128 +41,442 @@ def _get_param_list_byte_length(param_list):
     return size
 
 
-class HekaReader(AbstractReader):
-    _channel_selected = None
+def _get_param_list_dtype(param_list):
+    """
+    Returns a structured numpy dtype with one field per parameter in the list.
+    Here, list[i][0] = param, list[i][1] = np.dtype
+    """
+    return np.dtype([(str(name), datatype) for name, datatype in param_list])
+
 
-    def __array__(self):
-        return self.get_data_from_selection(self._slice)
+def _get_block_dtype(per_block_param_list, per_channel_param_list, channel_list_number, points_per_block):
+    """
+    Returns a structured numpy dtype describing one complete block of a Heka file.
 
-    def _get_total_dimension_length(self):
-        if self._channel_selected is None:
-            return self.channel_list_number
-        return self.points_per_channel_total
+    Each block consists of the per block header, followed by the per channel header of every channel, followed by
+    the data points of every channel. The returned dtype has the fields:
 
-    def __getitem__(self, item):
-        sample_rate = self.sample_rate
+        #. 'block_params' - the per block header.
+        #. 'channel_params' - the per channel headers, shape (channel_list_number,).
+        #. 'data' - the raw channel data, shape (channel_list_number, points_per_block).
 
-        if isinstance(item, int):
-            if self._channel_selected is not None:
-                if item == -1:
-                    stop = None
-                else:
-                    stop = item + 1
-                return self.get_data_from_selection(slice(item, stop, 1))
-            else:
-                new_slice = slice(0, 0, 1)
-                channel_selected = item
-        else:
-            channel_selected = self._channel_selected
+    :param per_block_param_list: List of per block parameters, as read from the file header.
+    :param per_channel_param_list: List of per channel parameters, as read from the file header.
+    :param channel_list_number: Number of channels in the file.
+    :param points_per_block: Number of data points per channel in each block.
+    """
+    return np.dtype([('block_params', _get_param_list_dtype(per_block_param_list)),
+                     ('channel_params', _get_param_list_dtype(per_channel_param_list), (channel_list_number,)),
+                     ('data', HEKA_DATATYPE, (channel_list_number, points_per_block))])
+
+
+def _get_block_header_dtype(per_block_param_list, per_channel_param_list, channel_list_number):
+    """
+    Returns a structured numpy dtype of the headers of one block of a Heka file, the 'block_params' and
+    'channel_params' fields of :py:func:`_get_block_dtype`.
+    """
+    return np.dtype([('block_params', _get_param_list_dtype(per_block_param_list)),
+                     ('channel_params', _get_param_list_dtype(per_channel_param_list), (channel_list_number,))])
+
+
+def _encode_param_list(param_list):
+    """
+    Converts a parameter list to a JSON serializable list for the metadata cache.
+    """
+    return [[name, datatype.str] for name, datatype in param_list]
+
+
+def _decode_param_list(encoded):
+    """
+    Converts a parameter list from the metadata cache back to a parameter list.
+    """
+    return [[name, np.dtype(datatype)] for name, datatype in encoded]
+
+
+def _normalize_params(params):
+    """
+    Converts the values of a dictionary of parameters read from a header to python ints, floats, and strings, the same
+    types they have when read back from the metadata cache.
+    """
+    normalized = {}
+    for name, value in params.items():
+        if isinstance(value, np.generic):
+            value = value.item()
+        if isinstance(value, bytes):
+            value = value.decode('utf-8', 'replace')
+        normalized[name] = value
+    return normalized
+
+
+class HekaLayout(object):
+    """
+    The layout of a Heka file, parsed from its header. A reader and every reader sliced from it share one layout.
+    """
+
+    def __init__(self, per_file_param_list, per_block_param_list, per_channel_param_list, channel_list,
+                 per_file_params, per_file_header_length, file_size):
+        """
+        :param per_file_param_list: List of per file parameters, as read from the file header.
+        :param per_block_param_list: List of per block parameters.
+        :param per_channel_param_list: List of per channel parameters.
+        :param channel_list: List of the channels.
+        :param per_file_params: Dictionary of the per file parameters.
+        :param per_file_header_length: Length of the file header, in bytes.
+        :param file_size: Size of the file, in bytes.
+        :raises: IOError if the file ends with an incomplete block.
+        """
+        self.per_file_param_list = per_file_param_list
+        self.per_block_param_list = per_block_param_list
+        self.per_channel_param_list = per_channel_param_list
+        self.channel_list = channel_list
+        self.per_file_params = _normalize_params(per_file_params)
+        # python ints, so the byte offsets of late blocks in large files can't overflow
+        self.per_file_header_length = int(per_file_header_length)
+        self.file_size = file_size
+
+        # Calculate the block lengths
+        self.per_channel_per_block_length = _get_param_list_byte_length(per_channel_param_list)
+        self.per_block_length = _get_param_list_byte_length(per_block_param_list)
+
+        self.channel_list_number = len(channel_list)
+        self.points_per_block = int(self.per_file_params['Points per block'])
+
+        self.header_bytes_per_block = self.per_channel_per_block_length * self.channel_list_number
+        self.data_bytes_per_block = self.points_per_block * 2 * self.channel_list_number
+        self.total_bytes_per_block = self.header_bytes_per_block + self.data_bytes_per_block + self.per_block_length
 
-            if isinstance(item, slice) and item.step is not None and item.step > 1:
-                sample_rate /= item.step
-            new_slice = slice_combine(self._get_total_dimension_length(), self._slice, item)
+        # Calculate number of points per channel
+        self.num_blocks_in_file = (file_size - self.per_file_header_length) // self.total_bytes_per_block
+        remainder = (file_size - self.per_file_header_length) % self.total_bytes_per_block
+        if not remainder == 0:
+            raise IOError('Heka file ends with incomplete block')
+        self.points_per_channel_total = self.points_per_block * self.num_blocks_in_file
+
+        self.block_dtype = _get_block_dtype(per_block_param_list, per_channel_param_list, self.channel_list_number,
+                                            self.points_per_block)
+
+        # array of the scale of every block and channel, read when first needed
+        self.scales = None
+
+
+class HekaReader(MultichannelReader):
+    """
+    Reader class that reads .hkd files produced by the Heka acquisition software.
+
+    By default the data following the file header is memory mapped as an array of blocks (see
+    :py:func:`_get_block_dtype`), so any selection is read with a vectorized gather. Pass memmap=False to read the
+    file block by block instead, for example on 32 bit systems where large files cannot be mapped.
+
+    The scale of every block and channel is read once into :py:attr:`scales`, and kept in the metadata cache, so the
+    memory mapped data of any selection is scaled with one broadcast multiply.
 
-        return HekaReader(self.filename, _slice=new_slice, _sample_rate=sample_rate, _channel_selected=channel_selected)
+    Without the memory map, decoded blocks are kept in a :py:class:`pypore.i_o.block_cache.BlockCache` shared by the
+    reader and every reader sliced from it, so repeated small selections of the same blocks do not read them again.
+    """
+    # memory mapped array of blocks, None if not using memmap
+    _blocks = None
+
+    def _get_view(self, s, sample_rate, channels):
+        return HekaReader(self.filename, _slice=s, _sample_rate=sample_rate, _channel_selected=channels, _parent=self)
 
-    def get_data_from_selection(self, s):
+    def get_data_from_selection(self, s, channels=0):
         """
-        Returns the requested data.
-        :param starts:
-        :param stops:
-        :param steps:
-        :param shape:
-        :return:
+        Returns the requested data, reading all of the selected channels in a single pass over the blocks.
+
+        :param s: Slice of the samples to return.
+        :param channels: (Optional) Index of a single channel, or a slice of channels, or None for all channels.
+                        Default is channel 0.
+        :return: Numpy array of :py:attr:`dtype` of the selected data. The array is 1D if a single channel index was
+                passed, otherwise it has shape (channel, sample).
         """
+        channel_indices = self._get_channel_indices(channels)
+        single_channel = is_index(channels)
+
         indices = s.indices(self._get_total_dimension_length())
 
         n_points = get_slice_length(self._get_total_dimension_length(), s)
         # if no points are requested, return an empty array
-        if n_points == 0:
-            return np.zeros(0, dtype=HEKA_DATATYPE)
+        if n_points == 0 or channel_indices.size == 0:
+            values = np.zeros((channel_indices.size, n_points), dtype=self.dtype)
+            return values[0] if single_channel else values
 
         start = indices[0]
-        stop = indices[1]
         step = indices[2]
         # if the step size is < 0, we need to figure out what the first point actually is
         if step > 0:
             negative_step = False
         else:
-            start = xrange(start, stop, step)[-1]
+            start += (n_points - 1) * step
             negative_step = True
         step_size = abs(step)
+        stop = start + (n_points - 1) * step_size + 1
+
+        if self._blocks is not None and step_size > 1:
+            # gather only the requested points from the memory map
+            block_numbers, offsets = np.divmod(np.arange(start, stop, step_size), self._chunk_size)
+            block_numbers = block_numbers[np.newaxis, :]
+            channel_numbers = channel_indices[:, np.newaxis]
+            data = self._blocks['data'][block_numbers, channel_numbers, offsets[np.newaxis, :]]
+            values = self._scale(data, None if self.raw else self.scales[block_numbers, channel_numbers])
+        else:
+            start_block_number = start // self._chunk_size
+            stop_block_number = (stop - 1) // self._chunk_size + 1
+            if self._blocks is not None:
+                blocks = self._blocks[start_block_number:stop_block_number]
+                scales = None if self.raw else self.scales[start_block_number:stop_block_number]
+            else:
+                # read every block that contains part of the selection
+                blocks = self._read_blocks(start_block_number, stop_block_number)
+                scales = blocks['channel_params']['Scale']
+
+            # scale the raw data of every block at once
+            data = blocks['data']
+            first = channel_indices[0]
+            if np.array_equal(channel_indices, np.arange(first, first + channel_indices.size)):
+                data = data[:, first:first + channel_indices.size]
+            else:
+                data = data[:, channel_indices]
+            values = self._scale(data, None if scales is None else scales[:, channel_indices, np.newaxis])
+            # (block, channel, sample) -> (channel, block * sample)
+            values = values.transpose(1, 0, 2).reshape(channel_indices.size, -1)
 
-        # find the block number that contains the start of the selection
-        start_block_number = start // self._chunk_size
+            # how far into the first block is the first data point
+            remainder = start - start_block_number * self._chunk_size
+            values = values[:, remainder:remainder + stop - start:step_size]
 
-        # skip to that block, from the start of the binary data
-        self.datafile.seek(self.per_file_header_length + start_block_number * self.total_bytes_per_block)
+        if negative_step:
+            values = values[:, ::-1]
 
-        # how far into the block is the first data point
-        remainder = start % self._chunk_size
+        if single_channel:
+            return values[0]
+        return values
 
-        # if we are dealing with a single integer, just return it
-        if n_points == 1:
-            chunk = self._read_heka_next_block()[0]
-            values = chunk[remainder]
-        else:
-            count = 0
-            # only read channel 1 for now
-            # TODO fix for multichannel
-            values = np.empty(shape=(n_points,))
-            while count < n_points:
-                # only read channel 1 for now
-                # TODO fix for multichannel
-                chunk = self._read_heka_next_block()[0]
-
-                chunk = chunk[remainder::step_size]
-                chunk_size = chunk.size
-                if (n_points - count) < chunk_size:
-                    chunk = chunk[:n_points - count]
-                    chunk_size = chunk.size
-                values[count:count + chunk_size] = chunk[:]
-                remainder = (remainder + step_size - self._chunk_size) % step_size
-                count += chunk_size
+    def _scale(self, data, scales):
+        """
+        :param data: Numpy array of raw data.
+        :param scales: Numpy array of the scale of each point of data, or broadcastable to data. Not used if the reader
+                       is raw.
+        :return: The raw data itself if the reader is raw, otherwise the scaled data as :py:attr:`dtype`.
+        """
+        if self.raw:
+            return data
+        return np.multiply(data, scales, dtype=self.dtype)
 
-        if negative_step:
-            values = values[::-1]
+    def _read_blocks(self, start_block_number, stop_block_number):
+        """
+        Reads a range of blocks from the file, as records of :py:attr:`HekaLayout.block_dtype`.
 
-        return values
+        Blocks are taken from the block cache when possible. Reads of more blocks than fit in the cache bypass it, so
+        scanning through a file does not evict the blocks of the window being looked at. The cache holds the blocks as
+        they are stored in the file, so readers of raw data and of scaled data of any dtype can share it.
 
-    def __iter__(self):
+        :param start_block_number: First block to read.
+        :param stop_block_number: Block to stop reading at, exclusive.
+        :return: Numpy structured array of the blocks.
         """
-        Makes the HekaReader iterable.
+        n_blocks = stop_block_number - start_block_number
+        if n_blocks * self.total_bytes_per_block > self.block_cache.max_bytes:
+            return self._read_block_range(start_block_number, stop_block_number)
+
+        blocks = np.empty(n_blocks, dtype=self._layout.block_dtype)
+        missing = []
+        for i in xrange(n_blocks):
+            block = self.block_cache.get(start_block_number + i)
+            if block is None:
+                missing.append(i)
+            else:
+                blocks[i:i + 1] = block
+
+        # read each run of consecutive blocks that are not cached at once
+        runs = []
+        for i in missing:
+            if runs and runs[-1][1] == i:
+                runs[-1][1] = i + 1
+            else:
+                runs.append([i, i + 1])
+        for run_start, run_stop in runs:
+            blocks[run_start:run_stop] = self._read_block_range(start_block_number + run_start,
+                                                                start_block_number + run_stop)
+            for i in xrange(run_start, run_stop):
+                self.block_cache.put(start_block_number + i, blocks[i:i + 1].copy())
+        return blocks
+
+    def _read_block_range(self, start_block_number, stop_block_number):
+        """
+        Reads a range of blocks from the file with a single read.
+
+        :return: Numpy structured array of the blocks.
         """
-        # TODO this is a slow implementation ~9s to run on lab pc. Make it faster.
+        n_blocks = stop_block_number - start_block_number
+
+        # the file position is shared with the other readers of the file
+        with self._lock:
+            # skip to the first block, from the start of the binary data
+            self.datafile.seek(self.per_file_header_length + start_block_number * self.total_bytes_per_block)
+            buf = self.datafile.read(n_blocks * self.total_bytes_per_block)
+        return np.frombuffer(buf, dtype=self._layout.block_dtype)
+
+    def iter_chunks(self, size=None):
+        """
+        Iterates over the selected data in consecutive chunks of samples.
+
+        :param size: (Optional) Maximum number of samples in each chunk. Default is the number of points per block.
+        :return: Generator of numpy arrays of the selected data, in order. For multichannel data, each chunk has shape
+                (channel, sample).
+        """
+        if size is None:
+            size = self._chunk_size
+        if size < 1:
+            raise ValueError("Chunk size must be positive, was {0}.".format(size))
+
         # get the number of elements to return
         indices = self._slice.indices(self._get_total_dimension_length())
         n_elements = get_slice_length(self._get_total_dimension_length(), self._slice)
 
-        # setup the starts/stops/steps
+        # setup the starts/steps
         start = indices[0]
         step = indices[2]
 
-        for i in xrange(n_elements):
-            # get the chunk of data
-            chunk = self.get_data_from_selection(slice(start + i * step, start + i * step + 1, step))
-            yield chunk
+        for i in xrange(0, n_elements, size):
+            chunk_start = start + i * step
+            chunk_stop = start + min(i + size, n_elements) * step
+            # a negative stop would wrap around to the end of the data
+            if chunk_stop < 0:
+                chunk_stop = None
+            yield self.get_data_from_selection(slice(chunk_start, chunk_stop, step), self._channel_selected)
 
     def __init__(self, filename, *args, **kwargs):
         """
         Implementation of :py:func:`prepare_data_file` for Heka ".hkd" files.
+
+        :param filename: Filename of the Heka file to open.
+        :param memmap: (Optional) Whether to memory map the data. Default is True.
+        :param cache: (Optional) Whether to use the on-disk metadata cache, see :py:mod:`pypore.i_o.metadata_cache`.
+                      Default is True.
+        :param block_cache_size: (Optional) Memory limit of the cache of blocks read when not memory mapping, in
+                                 bytes. 0 disables the cache. Default is
+                                 :py:data:`pypore.i_o.block_cache.DEFAULT_BLOCK_CACHE_BYTES`.
+        :param raw: (Optional) Whether to return the raw data, big endian int16 as stored in the file, instead of
+                    current. The current is the raw data times :py:attr:`scales` of its block and channel. Selections
+                    within a single block of the memory map are returned as read-only views of it, without copying;
+                    the samples of a channel are only contiguous in the file within a block, so other selections are
+                    copied. Default is False.
+        :param dtype: (Optional) Floating point type of the current. Default is float64.
         """
         self.filename = filename
-        self.datafile = open(filename, 'rb')
 
+        if '_parent' in kwargs:
+            # a view of part of the parent's data, sharing its layout, file handle, memory map, and block cache
+            parent = kwargs['_parent']
+            self.use_memmap = parent.use_memmap
+            self.use_cache = parent.use_cache
+            self.block_cache = parent.block_cache
+            self.datafile = parent.datafile
+            self._blocks = parent._blocks
+            self._lock = parent._lock
+            self._owns_file = False
+            self._set_layout(parent._layout)
+            self._set_output_dtype(parent.raw, None if parent.raw else parent.dtype, HEKA_DATATYPE, np.float64)
+        else:
+            self._set_output_dtype(kwargs.get('raw', False), kwargs.get('dtype'), HEKA_DATATYPE, np.float64)
+            self.use_memmap = kwargs.get('memmap', True)
+            self.use_cache = kwargs.get('cache', True)
+            self.block_cache = BlockCache(kwargs.get('block_cache_size', DEFAULT_BLOCK_CACHE_BYTES))
+            self.datafile = open(filename, 'rb')
+            self._lock = threading.Lock()
+            self._owns_file = True
+            try:
+                self._set_layout(self._read_layout())
+            except IOError:
+                self.datafile.close()
+                raise
+
+            # Create a memmap of the remaining data
+            if self.use_memmap:
+                if self.num_blocks_in_file > 0:
+                    self._blocks = np.memmap(filename, dtype=self._layout.block_dtype, mode='r',
+                                             offset=self.per_file_header_length, shape=(self.num_blocks_in_file,))
+                else:
+                    self._blocks = np.zeros(0, dtype=self._layout.block_dtype)
+
+        if not '_sample_rate' in kwargs:
+            self.sample_rate = 1.0 / self.per_file_params['Sampling interval']
+        else:
+            self.sample_rate = kwargs['_sample_rate']
+
+        # only a reader of the whole file, of current of the default type, keeps its statistics in the cache
+        if self.use_cache and not '_slice' in kwargs and not '_channel_selected' in kwargs and \
+                self.dtype == np.float64:
+            self._cache_filename = filename
+
+        if not '_slice' in kwargs:
+            self._slice = slice(0, None, 1)
+        else:
+            self._slice = kwargs['_slice']
+
+        if not '_channel_selected' in kwargs:
+            if self.channel_list_number > 1:
+                self._channel_selected = None
+            else:
+                self._channel_selected = 0
+        else:
+            self._channel_selected = kwargs['_channel_selected']
+
+    def _read_layout(self):
+        """
+        Reads the file's header, from the metadata cache if possible.
+
+        :return: The file's :py:class:`HekaLayout`.
+        """
+        header = None
+        if self.use_cache:
+            header = read_cache(self.filename).get('heka_header')
+        if header is None:
+            self._read_heka_header()
+            if self.use_cache:
+                update_cache(self.filename, heka_header={
+                    'per_file_param_list': _encode_param_list(self.per_file_param_list),
+                    'per_block_param_list': _encode_param_list(self.per_block_param_list),
+                    'per_channel_param_list': _encode_param_list(self.per_channel_param_list),
+                    'channel_list': _encode_param_list(self.channel_list),
+                    'per_file_params': self.per_file_params,
+                    'per_file_header_length': self.per_file_header_length})
+            return HekaLayout(self.per_file_param_list, self.per_block_param_list, self.per_channel_param_list,
+                              self.channel_list, self.per_file_params, self.per_file_header_length,
+                              os.path.getsize(self.filename))
+        return HekaLayout(_decode_param_list(header['per_file_param_list']),
+                          _decode_param_list(header['per_block_param_list']),
+                          _decode_param_list(header['per_channel_param_list']),
+                          _decode_param_list(header['channel_list']), header['per_file_params'],
+                          header['per_file_header_length'], os.path.getsize(self.filename))
+
+    def _set_layout(self, layout):
+        """
+        Sets the reader's layout attributes from a :py:class:`HekaLayout`.
+        """
+        self._layout = layout
+        self.per_file_param_list = layout.per_file_param_list
+        self.per_block_param_list = layout.per_block_param_list
+        self.per_channel_param_list = layout.per_channel_param_list
+        self.channel_list = layout.channel_list
+        self.per_file_params = layout.per_file_params
+        self.per_file_header_length = layout.per_file_header_length
+        self.per_channel_per_block_length = layout.per_channel_per_block_length
+        self.per_block_length = layout.per_block_length
+        self.channel_list_number = layout.channel_list_number
+        self.header_bytes_per_block = layout.header_bytes_per_block
+        self.data_bytes_per_block = layout.data_bytes_per_block
+        self.total_bytes_per_block = layout.total_bytes_per_block
+        self.file_size = layout.file_size
+        self.num_blocks_in_file = layout.num_blocks_in_file
+        self._chunk_size = layout.points_per_block
+        self.points_per_channel_total = layout.points_per_channel_total
+
+    def _read_heka_header(self):
+        """
+        Reads the text header and the binary parameter lists at the start of the file, leaving the file at the start of
+        the first block.
+        """
         try:
             # Check that the first line is as expected
             line = self.datafile.readline().decode()
@@ -167,6 +487,9 @@ class HekaReader(AbstractReader):
             # Just skip over the file header text, should be always the same.
             while True:
                 line = self.datafile.readline().decode()
+                if not line:
+                    self.datafile.close()
+                    raise IOError('Heka file header is incomplete.')
                 if 'End of file format' in line:
                     break
         except UnicodeDecodeError:
@@ -188,77 +511,18 @@ class HekaReader(AbstractReader):
         # # Calculate sizes of blocks, channels, etc
         self.per_file_header_length = self.datafile.tell()
 
-        # Calculate the block lengths
-        self.per_channel_per_block_length = _get_param_list_byte_length(self.per_channel_param_list)
-        self.per_block_length = _get_param_list_byte_length(self.per_block_param_list)
-
-        self.channel_list_number = len(self.channel_list)
-
-        self.header_bytes_per_block = self.per_channel_per_block_length * self.channel_list_number
-        self.data_bytes_per_block = self.per_file_params['Points per block'] * 2 * self.channel_list_number
-        self.total_bytes_per_block = self.header_bytes_per_block + self.data_bytes_per_block + self.per_block_length
-
-        # Calculate number of points per channel
-        self.file_size = os.path.getsize(filename)
-        self.num_blocks_in_file = int((self.file_size - self.per_file_header_length) / self.total_bytes_per_block)
-        remainder = (self.file_size - self.per_file_header_length) % self.total_bytes_per_block
-        if not remainder == 0:
-            self.datafile.close()
-            raise IOError('Heka file ends with incomplete block')
-        self._chunk_size = self.per_file_params['Points per block']
-        self.points_per_channel_total = self._chunk_size * self.num_blocks_in_file
-
-        if not '_sample_rate' in kwargs:
-            self.sample_rate = 1.0 / self.per_file_params['Sampling interval']
-        else:
-            self.sample_rate = kwargs['_sample_rate']
-
-        if not '_slice' in kwargs:
-            self._slice = slice(0, None, 1)
-        else:
-            self._slice = kwargs['_slice']
-
-        if not '_channel_selected' in kwargs:
-            if self.channel_list_number > 1:
-                self._channel_selected = None
-            else:
-                self._channel_selected = 0
-        else:
-            self._channel_selected = kwargs['_channel_selected']
-
-        # Create a memmap of the remaining data
-        # self.datafile.seek(self.per_file_header_length + start_block_number * self.total_bytes_per_block)
-
     def _read_heka_next_block(self):
         """
-        Reads the next block of heka data.
-        Returns a dictionary with 'data', 'per_block_params', and 'per_channel_params'.
+        Reads the next block of heka data with a single read.
+
+        :return: List of numpy arrays of the scaled data of each channel, or a list of one empty array at the end of
+                 the file.
         """
-        # Read block header
-        per_block_params = self._read_heka_header_params(self.per_block_param_list)
-        if per_block_params is None:
+        buf = self.datafile.read(self.total_bytes_per_block)
+        if len(buf) < self.total_bytes_per_block:
             return [np.empty(0)]
-
-        # Read per channel header
-        per_channel_block_params = []
-        for _ in self.channel_list:  # underscore used for discarded parameters
-            channel_params = {}
-            # i[0] = name, i[1] = datatype
-            for i in self.per_channel_param_list:
-                channel_params[i[0]] = np.fromfile(self.datafile, i[1], 1)[0]
-            per_channel_block_params.append(channel_params)
-
-        # Read data
-        data = []
-        for i in xrange(0, len(self.channel_list)):
-            values = np.fromfile(self.datafile, dt, count=self._chunk_size) * \
-                     per_channel_block_params[i][
-                         'Scale']
-            # get rid of nan's
-            # values[np.isnan(values)] = 0
-            data.append(values)
-
-        return data
+        block = np.frombuffer(buf, dtype=self._layout.block_dtype)[0]
+        return list(block['data'] * block['channel_params']['Scale'][:, np.newaxis])
 
     def _read_heka_header_param_list(self, datatype):
         """
@@ -271,71 +535,101 @@ class HekaReader(AbstractReader):
             item[0] = name
             item[1] = numpy datatype
         """
-        param_list = []
-        self.datafile.read(3)  # read null characters?
-        dt = np.dtype('>u1')
-        num_params = np.fromfile(self.datafile, dt, 1)[0]
-        for _ in xrange(0, num_params):
-            type_code = np.fromfile(self.datafile, dt, 1)[0]
-            # read the name this way, because numpy and python 3 together
-            # don't naturally decode strings.
-            name = self.datafile.read(datatype.itemsize).decode('utf-8').strip()
-            param_list.append([name, HEKA_ENCODINGS[type_code]])
-        return param_list
+        # 3 null characters, then the number of parameters
+        buf = self.datafile.read(4)
+        if len(buf) < 4:
+            raise IOError('Heka file ends in its header.')
+        # a python int, so the byte count below does not overflow uint8
+        num_params = int(np.frombuffer(buf, np.dtype('>u1'))[3])
+
+        param_dtype = np.dtype([('code', '>u1'), ('name', datatype)])
+        buf = self.datafile.read(num_params * param_dtype.itemsize)
+        if len(buf) < num_params * param_dtype.itemsize:
+            raise IOError('Heka file ends in its header.')
+        params = np.frombuffer(buf, param_dtype)
+        if np.any(params['code'] >= len(HEKA_ENCODINGS)):
+            raise IOError('Heka file header has an unknown data type code.')
+        # decode the names this way, because numpy and python 3 together
+        # don't naturally decode strings.
+        return [[name.decode('utf-8').strip(), HEKA_ENCODINGS[code]]
+                for code, name in zip(params['code'], params['name'])]
 
     def _read_heka_header_params(self, param_list):
-        params = {}
-        # pair[0] = name, pair[1] = np.datatype
-        for pair in param_list:
-            array = np.fromfile(self.datafile, pair[1], 1)
-            if array.size > 0:
-                params[pair[0]] = array[0]
-            else:
-                return None
-        return params
+        """
+        Reads the values of a list of parameters with a single read.
 
-    def close(self):
-        self.datafile.close()
+        :return: Dictionary of the value of each parameter, or None at the end of the file.
+        """
+        param_dtype = _get_param_list_dtype(param_list)
+        buf = self.datafile.read(param_dtype.itemsize)
+        if len(buf) < param_dtype.itemsize:
+            return None
+        values = np.frombuffer(buf, param_dtype)[0]
+        return dict((name, values[i]) for i, (name, _) in enumerate(param_list))
 
     @property
-    def ndim(self):
-        if self._ndim is None:
-            self._ndim = len(self.shape)
-        return self._ndim
+    def scales(self):
+        """
+        Numpy array of shape (n_blocks, n_channels) of the scale of every block and channel of the file. The current
+        of a raw data point is the point times the scale of its block and channel.
 
-    @property
-    def shape(self):
-        if self._shape is None:
-            # TODO fix for multidimensional
-            x = get_slice_length(self._get_total_dimension_length(), self._slice)
-            self._shape = (x,)
-        return self._shape
+        The scales are read once per file and shared by the readers sliced from this one. Since they rarely change
+        between blocks, they are stored in the metadata cache as runs of blocks with the same scales.
+        """
+        layout = self._layout
+        if layout.scales is None:
+            cached = None
+            if self.use_cache:
+                cached = read_cache(self.filename).get('heka_scales')
+            if cached is None:
+                scales = self.read_block_headers()['channel_params']['Scale'].astype(np.float64)
+                if self.use_cache:
+                    # the first block of each run of blocks with the same scales, and the run's scales
+                    run_starts = np.concatenate(([0], np.flatnonzero(np.any(scales[1:] != scales[:-1], axis=1)) + 1))
+                    run_starts = run_starts[run_starts < scales.shape[0]]
+                    update_cache(self.filename, heka_scales={'run_starts': run_starts, 'scales': scales[run_starts]})
+            else:
+                run_starts = np.asarray(cached['run_starts'], dtype=np.int64)
+                run_lengths = np.diff(np.append(run_starts, self.num_blocks_in_file))
+                scales = np.repeat(np.asarray(cached['scales'], dtype=np.float64).reshape(-1, self.channel_list_number),
+                                   run_lengths, axis=0)
+            layout.scales = scales
+        return layout.scales
+
+    def read_block_headers(self):
+        """
+        Reads the per block and per channel parameters of every block of the file into one array, for example so the
+        scale of every block and channel is ``reader.read_block_headers()['channel_params']['Scale']``.
 
-    @property
-    def size(self):
-        if self._size is None:
-            self._size = 1
-            for i in self.shape:
-                self._size *= i
-        return self._size
-
-    def max(self):
-        if self._max is None:
-            # Loop through the data without affecting the position
-            self._max = self.__array__().max()
-        return self._max
-
-    def mean(self):
-        if self._mean is None:
-            self._mean = self.__array__().mean()
-        return self._mean
-
-    def min(self):
-        if self._min is None:
-            self._min = self.__array__().min()
-        return self._min
-
-    def std(self):
-        if self._std is None:
-            self._std = self.__array__().std()
-        return self._std
+        :return: Numpy structured array with one record per block of the file, with the fields 'block_params' and
+                 'channel_params', as in :py:func:`_get_block_dtype`.
+        """
+        layout = self._layout
+        header_dtype = _get_block_header_dtype(self.per_block_param_list, self.per_channel_param_list,
+                                               self.channel_list_number)
+        headers = np.empty(self.num_blocks_in_file, dtype=header_dtype)
+        if self._blocks is not None:
+            headers['block_params'] = self._blocks['block_params']
+            headers['channel_params'] = self._blocks['channel_params']
+            return headers
+
+        # read a bounded number of whole blocks at a time, and keep their headers
+        blocks_per_read = max(1, HEADER_READ_BYTES // self.total_bytes_per_block)
+        with self._lock:
+            self.datafile.seek(self.per_file_header_length)
+            for i in xrange(0, self.num_blocks_in_file, blocks_per_read):
+                n_blocks = min(blocks_per_read, self.num_blocks_in_file - i)
+                blocks = np.frombuffer(self.datafile.read(n_blocks * self.total_bytes_per_block),
+                                       dtype=layout.block_dtype)
+                headers['block_params'][i:i + n_blocks] = blocks['block_params']
+                headers['channel_params'][i:i + n_blocks] = blocks['channel_params']
+        return headers
+
+    def close(self):
+        """
+        Closes the reader. Only the reader that opened the file closes it, readers sliced from it are views that stop
+        working once it is closed.
+        """
+        if self._owns_file:
+            self.datafile.close()
+        self._blocks = None
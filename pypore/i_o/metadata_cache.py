@@ -0,0 +1,124 @@
+"""
+Persistent on-disk cache of the metadata and statistics of data files.
+
+Readers store the parsed header of a file, and its statistics once they are computed, in a small JSON file in the cache
+directory. Entries are keyed by the data file's absolute path, and are ignored once the data file's size or
+modification time changes, so reopening a file that has already been seen skips parsing its header and recomputing
+its statistics.
+
+The cache directory is ~/.pypore/cache, or the directory in the PYPORE_CACHE_DIR environment variable. Use
+:py:func:`set_cache_directory` to change it, or to disable the cache.
+"""
+import hashlib
+import json
+import os
+import tempfile
+
+import numpy as np
+
+CACHE_DIRECTORY_ENVIRONMENT_VARIABLE = 'PYPORE_CACHE_DIR'
+
+# os.replace overwrites the destination on every platform, but is not in python 2.
+_replace = getattr(os, 'replace', os.rename)
+
+_cache_directory = os.environ.get(CACHE_DIRECTORY_ENVIRONMENT_VARIABLE,
+                                  os.path.join(os.path.expanduser('~'), '.pypore', 'cache'))
+
+
+def get_cache_directory():
+    """
+    :return: The cache directory, or None if the cache is disabled.
+    """
+    return _cache_directory
+
+
+def set_cache_directory(directory):
+    """
+    Sets the cache directory.
+
+    :param directory: The new cache directory, or None to disable the cache.
+    """
+    global _cache_directory
+    _cache_directory = directory
+
+
+def _get_entry_filename(filename):
+    """
+    :return: Filename of the cache entry of a data file.
+    """
+    key = hashlib.sha1(os.path.abspath(filename).encode('utf-8')).hexdigest()
+    return os.path.join(_cache_directory, key + '.json')
+
+
+def _get_file_key(filename):
+    """
+    :return: Dictionary identifying the current version of a data file.
+    """
+    return {'path': os.path.abspath(filename), 'size': os.path.getsize(filename),
+            'mtime': os.path.getmtime(filename)}
+
+
+def _to_json(value):
+    """
+    Converts numpy types that json cannot serialize.
+    """
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, bytes):
+        # header strings are not always valid UTF-8
+        return value.decode('utf-8', 'replace')
+    raise TypeError("{0} is not JSON serializable.".format(value))
+
+
+def read_cache(filename):
+    """
+    Reads the cached entries of a data file.
+
+    :param filename: Filename of the data file.
+    :return: Dictionary of the cached entries. It is empty if the cache is disabled, there is no entry for the file, or
+             the file has changed since the entry was written.
+    """
+    if _cache_directory is None:
+        return {}
+    try:
+        with open(_get_entry_filename(filename), 'r') as f:
+            entry = json.load(f)
+        if entry.get('file') != _get_file_key(filename):
+            return {}
+        return entry.get('data', {})
+    except (IOError, OSError, ValueError):
+        return {}
+
+
+def update_cache(filename, **entries):
+    """
+    Adds entries to the cache of a data file. Errors writing the cache, including entries that cannot be serialized,
+    are ignored, since the cache is optional.
+
+    :param filename: Filename of the data file.
+    :param entries: The entries to cache. Values must be JSON serializable, or numpy scalars or arrays.
+    """
+    if _cache_directory is None:
+        return
+    data = read_cache(filename)
+    data.update(entries)
+    temp_filename = None
+    try:
+        if not os.path.isdir(_cache_directory):
+            os.makedirs(_cache_directory)
+        fd, temp_filename = tempfile.mkstemp(suffix='.tmp', dir=_cache_directory)
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'file': _get_file_key(filename), 'data': data}, f, default=_to_json)
+        # renaming is atomic, so readers never see a partly written entry
+        _replace(temp_filename, _get_entry_filename(filename))
+        temp_filename = None
+    except (IOError, OSError, TypeError, ValueError):
+        pass
+    finally:
+        if temp_filename is not None:
+            try:
+                os.remove(temp_filename)
+            except OSError:
+                pass
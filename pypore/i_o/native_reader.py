@@ -0,0 +1,298 @@
+"""
+Reader of pypore's native chunked, compressed data format (.ppd files). Files are written with
+:py:class:`pypore.i_o.native_writer.NativeWriter`.
+
+File layout:
+
+    #. :py:data:`NATIVE_MAGIC`.
+    #. The data, as a series of chunks. Each chunk holds a run of consecutive samples of every channel, and each channel
+       of a chunk is stored as a separate, optionally zlib compressed, blob of raw integers, so single channels can be
+       read without decompressing the others. Before compression the bytes are shuffled (all first bytes of the
+       integers, then all second bytes, ...), which makes the slowly varying data compress much better.
+    #. A UTF-8 JSON footer with the metadata and the index of the chunks, including each chunk's per channel scale and
+       offset: value = raw * scale + offset.
+    #. The length of the footer, as a little endian uint64, followed by :py:data:`NATIVE_MAGIC` again.
+"""
+import json
+import os
+import struct
+import threading
+import zlib
+
+import numpy as np
+
+from pypore.i_o.abstract_reader import MultichannelReader
+from pypore.util import slice_combine, get_slice_length, is_index
+
+NATIVE_MAGIC = b'PYPORE\x00\x01'
+NATIVE_EXTENSION = '.ppd'
+NATIVE_VERSION = 1
+
+# The footer length and closing magic at the end of the file.
+_TRAILER_FORMAT = '<Q8s'
+_TRAILER_LENGTH = struct.calcsize(_TRAILER_FORMAT)
+
+# Stupid python 3, dropping xrange....
+try:
+    xrange
+except NameError:
+    xrange = range
+
+
+def _decode_chunk(buffer, raw_dtype, compressed, shuffled):
+    """
+    Decodes the raw integers of one channel of a chunk.
+
+    :param buffer: Bytes of the channel of the chunk, as stored in the file.
+    :return: 1D numpy array of raw_dtype.
+    """
+    if compressed:
+        buffer = zlib.decompress(buffer)
+    raw = np.frombuffer(buffer, dtype=np.uint8)
+    if shuffled and raw_dtype.itemsize > 1:
+        raw = raw.reshape(raw_dtype.itemsize, -1).T.copy()
+    return raw.view(raw_dtype).ravel()
+
+
+def read_footer(datafile):
+    """
+    Reads the footer of a native file.
+
+    :param datafile: The native file, open in binary mode.
+    :return: Dictionary of the footer.
+    :raises: IOError if the file is not a complete native file.
+    """
+    datafile.seek(0)
+    if datafile.read(len(NATIVE_MAGIC)) != NATIVE_MAGIC:
+        raise IOError('Data file not recognized as a pypore native file.')
+    datafile.seek(0, os.SEEK_END)
+    file_size = datafile.tell()
+    if file_size < len(NATIVE_MAGIC) + _TRAILER_LENGTH:
+        raise IOError('Native file is incomplete.')
+    datafile.seek(file_size - _TRAILER_LENGTH)
+    footer_length, magic = struct.unpack(_TRAILER_FORMAT, datafile.read(_TRAILER_LENGTH))
+    if magic != NATIVE_MAGIC or footer_length > file_size - len(NATIVE_MAGIC) - _TRAILER_LENGTH:
+        raise IOError('Native file is incomplete, it was not closed after writing.')
+    datafile.seek(file_size - _TRAILER_LENGTH - footer_length)
+    try:
+        footer = json.loads(datafile.read(footer_length).decode('utf-8'))
+    except ValueError:
+        raise IOError('Native file footer is corrupt.')
+    if footer.get('version', 0) > NATIVE_VERSION:
+        raise IOError('Native file version {0} is newer than this reader.'.format(footer['version']))
+    return footer
+
+
+class NativeReader(MultichannelReader):
+    """
+    Reader class that reads pypore's native .ppd files.
+
+    Data is selected by (channel, sample) like :py:class:`pypore.i_o.heka_reader.HekaReader`. Only the chunks and
+    channels that contain selected points are read and decompressed.
+
+    Raw readers return the stored integers, with value = raw * :py:attr:`scales` + :py:attr:`offsets` of the chunk and
+    channel, where chunk i holds samples [:py:attr:`chunk_starts` [i], :py:attr:`chunk_starts` [i + 1]).
+    """
+    def __init__(self, filename, *args, **kwargs):
+        """
+        :param filename: Filename of the .ppd file.
+        :param cache: (Optional) Whether to use the on-disk metadata cache, see :py:mod:`pypore.i_o.metadata_cache`.
+                      Default is True.
+        :param raw: (Optional) Whether to return the stored integers instead of scaled values. Default is False.
+        :param dtype: (Optional) Floating point type of the scaled values. Default is the type the file was written
+                      with.
+        """
+        self.filename = filename
+
+        if '_parent' in kwargs:
+            # a view of part of the parent's data, sharing its parsed footer and file handle
+            parent = kwargs['_parent']
+            self.use_cache = parent.use_cache
+            self.datafile = parent.datafile
+            self._lock = parent._lock
+            self._owns_file = False
+            self.footer = parent.footer
+            self._chunk_starts = parent._chunk_starts
+            self._positions = parent._positions
+            self._sizes = parent._sizes
+            self._scales = parent._scales
+            self._offsets = parent._offsets
+        else:
+            self.use_cache = kwargs.get('cache', True)
+            self.datafile = open(filename, 'rb')
+            self._lock = threading.Lock()
+            self._owns_file = True
+            try:
+                self.footer = read_footer(self.datafile)
+            except IOError:
+                self.datafile.close()
+                raise
+            n_channels = self.footer['n_channels']
+            # chunk i holds samples [_chunk_starts[i], _chunk_starts[i + 1])
+            self._chunk_starts = np.concatenate(([0], np.cumsum(self.footer['chunk_lengths'], dtype=np.int64)))
+            self._positions = np.array(self.footer['positions'], dtype=np.int64).reshape(-1, n_channels)
+            self._sizes = np.array(self.footer['sizes'], dtype=np.int64).reshape(-1, n_channels)
+            self._scales = np.array(self.footer['scales'], dtype=np.float64).reshape(-1, n_channels)
+            self._offsets = np.array(self.footer['offsets'], dtype=np.float64).reshape(-1, n_channels)
+        footer = self.footer
+
+        self.channel_list_number = footer['n_channels']
+        self.channel_names = footer.get('channel_names')
+        self.metadata = footer.get('metadata', {})
+        self._set_output_dtype(kwargs.get('raw', False), kwargs.get('dtype'), str(footer['raw_dtype']),
+                               str(footer['dtype']))
+        # the type of the values the file was written with
+        self.file_dtype = np.dtype(str(footer['dtype']))
+        self.compressed = footer['compression'] == 'zlib'
+        self.shuffled = footer['shuffle']
+
+        self.points_per_channel_total = int(self._chunk_starts[-1])
+        if len(footer['chunk_lengths']) > 0:
+            self._chunk_size = int(footer['chunk_lengths'][0])
+
+        # the last decoded chunk of each channel, so reading consecutive selections decodes each chunk once
+        self._decoded = {}
+
+        self.sample_rate = kwargs.get('_sample_rate', footer['sample_rate'])
+
+        # statistics of the file are of its values, in the type it was written with
+        self._whole_file = not '_slice' in kwargs and not '_channel_selected' in kwargs and \
+            self.dtype == self.file_dtype
+        if self.use_cache and self._whole_file:
+            self._cache_filename = filename
+
+        self._slice = kwargs.get('_slice', slice(0, None, 1))
+
+        if '_channel_selected' in kwargs:
+            self._channel_selected = kwargs['_channel_selected']
+        elif self.channel_list_number == 1:
+            self._channel_selected = 0
+
+    def _get_view(self, s, sample_rate, channels):
+        return NativeReader(self.filename, _slice=s, _sample_rate=sample_rate, _channel_selected=channels,
+                            _parent=self, raw=self.raw, dtype=None if self.raw else self.dtype)
+
+    def _read_chunk(self, chunk_number, channel):
+        """
+        :return: 1D numpy array of the raw integers of one channel of a chunk.
+        """
+        key = (chunk_number, channel)
+        decoded = self._decoded.get(channel)
+        if decoded is not None and decoded[0] == key:
+            return decoded[1]
+        # the file position is shared with the other readers of the file
+        with self._lock:
+            self.datafile.seek(self._positions[chunk_number, channel])
+            buffer = self.datafile.read(self._sizes[chunk_number, channel])
+        raw = _decode_chunk(buffer, self.raw_dtype, self.compressed, self.shuffled)
+        self._decoded[channel] = (key, raw)
+        return raw
+
+    def get_data_from_selection(self, s, channels=0):
+        """
+        Returns the requested data, decoding only the chunks and channels that contain selected points.
+
+        :param s: Slice of the samples to return.
+        :param channels: (Optional) Index of a single channel, or a slice of channels, or None for all channels.
+                        Default is channel 0.
+        :return: Numpy array of the selected data. The array is 1D if a single channel index was passed, otherwise it
+                has shape (channel, sample).
+        """
+        channel_indices = self._get_channel_indices(channels)
+        single_channel = is_index(channels)
+
+        indices = s.indices(self._get_total_dimension_length())
+        n_points = get_slice_length(self._get_total_dimension_length(), s)
+
+        values = np.empty((channel_indices.size, n_points), dtype=self.dtype)
+        if n_points > 0 and channel_indices.size > 0:
+            start = indices[0]
+            step = indices[2]
+            # if the step size is < 0, we need to figure out what the first point actually is
+            negative_step = step < 0
+            if negative_step:
+                start += (n_points - 1) * step
+            step_size = abs(step)
+            stop = start + (n_points - 1) * step_size + 1
+
+            first_chunk = np.searchsorted(self._chunk_starts, start, side='right') - 1
+            last_chunk = np.searchsorted(self._chunk_starts, stop - 1, side='right') - 1
+            for chunk_number in xrange(first_chunk, last_chunk + 1):
+                chunk_start = self._chunk_starts[chunk_number]
+                chunk_stop = self._chunk_starts[chunk_number + 1]
+                # the selected points in this chunk
+                first_point = max(0, -(-(chunk_start - start) // step_size))
+                stop_point = min(n_points, -(-(chunk_stop - start) // step_size))
+                if first_point >= stop_point:
+                    continue
+                offset = start + first_point * step_size - chunk_start
+                for j, channel in enumerate(channel_indices):
+                    raw = self._read_chunk(chunk_number, channel)
+                    raw = raw[offset:offset + (stop_point - first_point - 1) * step_size + 1:step_size]
+                    if self.raw:
+                        values[j, first_point:stop_point] = raw
+                    else:
+                        values[j, first_point:stop_point] = raw * self._scales[chunk_number, channel] + \
+                                                            self._offsets[chunk_number, channel]
+
+            if negative_step:
+                values = values[:, ::-1]
+
+        if single_channel:
+            return values[0]
+        return values
+
+    @property
+    def scales(self):
+        """
+        Numpy array of shape (n_chunks, n_channels) of the scale of every chunk and channel of the file.
+        """
+        return self._scales
+
+    @property
+    def offsets(self):
+        """
+        Numpy array of shape (n_chunks, n_channels) of the offset of every chunk and channel of the file.
+        """
+        return self._offsets
+
+    @property
+    def chunk_starts(self):
+        """
+        Numpy array of the first sample of every chunk of the file, followed by the number of samples per channel.
+        """
+        return self._chunk_starts
+
+    def _compute_statistics(self):
+        statistics = self.footer.get('statistics')
+        if self._whole_file and self.channel_list_number == 1 and statistics is not None:
+            # statistics written with the file save a pass over the data
+            self._max, self._mean, self._min, self._std = statistics
+            return
+        super(NativeReader, self)._compute_statistics()
+
+    def iter_chunks(self, size=None):
+        """
+        Iterates over the selected data in consecutive chunks of samples.
+
+        :param size: (Optional) Maximum number of samples in each chunk. Default is the length of the stored chunks.
+        :return: Generator of numpy arrays of the selected data, in order. For multichannel data, each chunk has shape
+                (channel, sample).
+        """
+        if size is None:
+            size = self._chunk_size
+        if size < 1:
+            raise ValueError("Chunk size must be positive, was {0}.".format(size))
+        n_samples = self.shape[-1]
+        for i in xrange(0, n_samples, size):
+            s = slice_combine(self._get_total_dimension_length(), self._slice, slice(i, i + size))
+            yield self.get_data_from_selection(s, self._channel_selected)
+
+    def close(self):
+        """
+        Closes the reader. Only the reader that opened the file closes it, readers sliced from it are views that stop
+        working once it is closed.
+        """
+        if self._owns_file:
+            self.datafile.close()
+        self._decoded = {}
@@ -0,0 +1,215 @@
+"""
+Writer of pypore's native chunked, compressed data format (.ppd files). See :py:mod:`pypore.i_o.native_reader` for
+the file layout.
+
+Example usage:
+
+>>> import os, tempfile
+>>> import numpy as np
+>>> import pypore
+>>> from pypore.i_o.native_writer import NativeWriter
+>>> filename = os.path.join(tempfile.mkdtemp(), 'data.ppd')
+>>> with NativeWriter(filename, sample_rate=50000.) as writer:
+...     writer.write_chunk(np.arange(1000, dtype=np.int16), scale=1e-12)
+>>> reader = pypore.open_file(filename)
+>>> len(reader)
+1000
+"""
+import json
+import struct
+import zlib
+
+import numpy as np
+
+from pypore.i_o.native_reader import NATIVE_MAGIC, NATIVE_VERSION, _TRAILER_FORMAT
+
+# Default number of samples per chunk, for writers that split data into chunks.
+DEFAULT_CHUNK_LENGTH = 2 ** 16
+
+
+def _encode_chunk(raw, compression_level, shuffle):
+    """
+    Encodes the raw integers of one channel of a chunk.
+
+    :return: The bytes to store in the file.
+    """
+    buffer = np.ascontiguousarray(raw).view(np.uint8)
+    if shuffle and raw.dtype.itemsize > 1:
+        buffer = buffer.reshape(-1, raw.dtype.itemsize).T
+    buffer = buffer.tobytes()
+    if compression_level > 0:
+        buffer = zlib.compress(buffer, compression_level)
+    return buffer
+
+
+def quantize(values, raw_dtype):
+    """
+    Quantizes values to integers of raw_dtype. Each channel gets a scale and offset that spread its values over the
+    whole integer range, so the rounding error is at most half of (max - min) / (2 ** bits - 1) of the channel.
+
+    :param values: 2D numpy array of values, of shape (channel, sample).
+    :param raw_dtype: Integer type to quantize to.
+    :return: Tuple of the raw integers, and arrays of the scale and offset of each channel.
+    """
+    info = np.iinfo(raw_dtype)
+    minimum = values.min(axis=1)
+    maximum = values.max(axis=1)
+    scale = (maximum - minimum) / (float(info.max) - info.min)
+    # constant channels still need a non-zero scale
+    scale[scale == 0] = 1.
+    offset = minimum - info.min * scale
+    raw = np.rint((values - offset[:, np.newaxis]) / scale[:, np.newaxis])
+    np.clip(raw, info.min, info.max, out=raw)
+    return raw.astype(raw_dtype), scale, offset
+
+
+class NativeWriter(object):
+    """
+    Writes a native .ppd file one chunk at a time, so data of any length can be written in bounded memory.
+
+    Each chunk holds raw integers of every channel, with a per channel scale and offset that convert them to values.
+    The file can only be read after :py:meth:`close` writes the footer.
+    """
+
+    def __init__(self, filename, sample_rate, n_channels=1, raw_dtype=np.int16, dtype=np.float64,
+                 compression_level=6, shuffle=True, channel_names=None, metadata=None, executor=None):
+        """
+        :param filename: Filename to write to. It should end in .ppd.
+        :param sample_rate: Sampling rate of the data, in Hz.
+        :param n_channels: (Optional) Number of channels. Default is 1.
+        :param raw_dtype: (Optional) Integer type of the stored raw data. Default is int16.
+        :param dtype: (Optional) Type of the values returned when reading the file. Default is float64.
+        :param compression_level: (Optional) zlib compression level, from 0 (no compression) to 9. Default is 6.
+        :param shuffle: (Optional) Whether to shuffle the bytes of the raw integers before compressing. Default is True.
+        :param channel_names: (Optional) List of the names of the channels.
+        :param metadata: (Optional) Dictionary of extra metadata to store. It must be JSON serializable.
+        :param executor: (Optional) A concurrent.futures ThreadPoolExecutor to compress the channels of each chunk on
+                         in parallel. zlib releases the GIL while compressing. By default channels are compressed one
+                         after another.
+        """
+        if not 0 <= compression_level <= 9:
+            raise ValueError("compression_level must be between 0 and 9, was {0}.".format(compression_level))
+        self.filename = filename
+        self.sample_rate = sample_rate
+        self.n_channels = n_channels
+        self.raw_dtype = np.dtype(raw_dtype)
+        self.dtype = np.dtype(dtype)
+        self.compression_level = compression_level
+        self.shuffle = shuffle
+        self.channel_names = channel_names
+        self.metadata = metadata if metadata is not None else {}
+        self.executor = executor
+        # [max, mean, min, std] of single channel data, if known when the file is closed
+        self.statistics = None
+
+        self._chunk_lengths = []
+        self._positions = []
+        self._sizes = []
+        self._scales = []
+        self._offsets = []
+
+        self._file = open(filename, 'wb')
+        self._file.write(NATIVE_MAGIC)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @property
+    def length(self):
+        """
+        :return: Number of samples per channel written so far.
+        """
+        return sum(self._chunk_lengths)
+
+    def write_chunk(self, raw, scale=1.0, offset=0.0):
+        """
+        Writes the next chunk.
+
+        :param raw: Numpy array of raw integers, 1D for single channel files, otherwise of shape (channel, sample).
+        :param scale: Number, or one number per channel, that the raw data is multiplied by to get the values.
+        :param offset: Number, or one number per channel, added to the scaled raw data to get the values.
+        :raises: ValueError if raw holds values that the raw integer type can't store exactly.
+        """
+        raw = np.asarray(raw)
+        if raw.ndim == 1:
+            raw = raw[np.newaxis, :]
+        if raw.ndim != 2 or raw.shape[0] != self.n_channels:
+            raise ValueError("Chunk has shape {0}, should be ({1}, samples).".format(raw.shape, self.n_channels))
+        if raw.shape[1] == 0:
+            return
+        if not np.can_cast(raw.dtype, self.raw_dtype):
+            # check the values instead, so e.g. int64 chunks of small integers can still be stored
+            info = np.iinfo(self.raw_dtype)
+            if raw.dtype.kind not in 'biuf' or np.any((raw < info.min) | (raw > info.max) | (raw != np.round(raw))):
+                raise ValueError("Chunk has values that can't be stored as {0}. Use write_values to quantize "
+                                 "them.".format(self.raw_dtype))
+        raw = raw.astype(self.raw_dtype, copy=False)
+        scales = np.broadcast_to(np.asarray(scale, dtype=np.float64), (self.n_channels,))
+        offsets = np.broadcast_to(np.asarray(offset, dtype=np.float64), (self.n_channels,))
+
+        if self.executor is not None and self.n_channels > 1:
+            futures = [self.executor.submit(_encode_chunk, raw[channel], self.compression_level, self.shuffle)
+                       for channel in range(self.n_channels)]
+            buffers = [future.result() for future in futures]
+        else:
+            buffers = [_encode_chunk(raw[channel], self.compression_level, self.shuffle)
+                       for channel in range(self.n_channels)]
+
+        positions = []
+        sizes = []
+        for buffer in buffers:
+            positions.append(self._file.tell())
+            sizes.append(len(buffer))
+            self._file.write(buffer)
+
+        self._chunk_lengths.append(int(raw.shape[1]))
+        self._positions.append(positions)
+        self._sizes.append(sizes)
+        self._scales.append(scales.tolist())
+        self._offsets.append(offsets.tolist())
+
+    def write_values(self, values, chunk_length=DEFAULT_CHUNK_LENGTH):
+        """
+        Quantizes values to the raw integer type with :py:func:`quantize` and writes them, in chunks of chunk_length
+        samples. Each chunk is quantized separately.
+
+        Use :py:meth:`write_chunk` instead when the raw integers of the data are known, to store them losslessly.
+
+        :param values: Numpy array of values, 1D for single channel files, otherwise of shape (channel, sample).
+        :param chunk_length: (Optional) Maximum number of samples per chunk. Default is :py:data:`DEFAULT_CHUNK_LENGTH`.
+        """
+        values = np.asarray(values, dtype=np.float64)
+        if values.ndim == 1:
+            values = values[np.newaxis, :]
+        for i in range(0, values.shape[1], chunk_length):
+            self.write_chunk(*quantize(values[:, i:i + chunk_length], self.raw_dtype))
+
+    def close(self):
+        """
+        Writes the footer and closes the file.
+        """
+        if self._file is None:
+            return
+        footer = {'version': NATIVE_VERSION,
+                  'n_channels': self.n_channels,
+                  'sample_rate': float(self.sample_rate),
+                  'raw_dtype': self.raw_dtype.str,
+                  'dtype': self.dtype.str,
+                  'compression': 'zlib' if self.compression_level > 0 else 'none',
+                  'shuffle': bool(self.shuffle),
+                  'channel_names': self.channel_names,
+                  'metadata': self.metadata,
+                  'statistics': self.statistics,
+                  'chunk_lengths': self._chunk_lengths,
+                  'positions': self._positions,
+                  'sizes': self._sizes,
+                  'scales': self._scales,
+                  'offsets': self._offsets}
+        footer = json.dumps(footer).encode('utf-8')
+        self._file.write(footer)
+        self._file.write(struct.pack(_TRAILER_FORMAT, len(footer), NATIVE_MAGIC))
+        self._file.close()
+        self._file = None
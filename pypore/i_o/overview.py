@@ -0,0 +1,302 @@
+"""
+Multi-resolution min/max/mean overviews of long traces, for fast plotting.
+
+A :py:class:`MinMaxPyramid` holds the min, max, and mean of bins of the data at several resolutions. Any window of the
+data can be summarized for any number of pixels from the pyramid, without reading the data itself, and unlike
+decimating with reader[::step], no spikes are lost.
+
+Example usage:
+
+>>> import pypore
+>>> from pypore.i_o.overview import open_pyramid
+>>> import pypore.sampledata.testing_files as tf
+>>> reader = pypore.open_file(tf.get_abs_path('spheres_20140114_154938_beginning.log'))
+>>> pyramid = open_pyramid(reader)  # builds and saves the sidecar file the first time
+>>> mins, maxs, means = pyramid.query(0, len(reader), 800, reader)
+"""
+import os
+
+import numpy as np
+
+from pypore.util import iter_segment_chunks
+
+# Appended to a data file's name to get the name of its pyramid sidecar file.
+PYRAMID_EXTENSION = '.pyramid.npz'
+
+
+def get_pyramid_filename(filename):
+    """
+    :param filename: Filename of a data file.
+    :return: Filename of the data file's pyramid sidecar file.
+    """
+    return filename + PYRAMID_EXTENSION
+
+
+def _reduce_bins(mins, maxs, means, counts, edges):
+    """
+    Combines consecutive bins into larger bins starting at the indices in edges.
+
+    :return: Tuple of mins, maxs, means, counts of the combined bins.
+    """
+    new_counts = np.add.reduceat(counts, edges)
+    new_means = np.add.reduceat(means * counts, edges) / new_counts
+    return (np.minimum.reduceat(mins, edges), np.maximum.reduceat(maxs, edges), new_means.astype(means.dtype),
+            new_counts)
+
+
+class PyramidBuilder(object):
+    """
+    Builds the finest level of a :py:class:`MinMaxPyramid` from data passed in one chunk at a time.
+    """
+
+    def __init__(self, base_bin_size):
+        self.base_bin_size = base_bin_size
+        self.length = 0
+        self._mins = []
+        self._maxs = []
+        self._means = []
+        # points left over from the previous chunk that do not fill a complete bin
+        self._leftover = None
+
+    def update(self, chunk):
+        """
+        Adds the next chunk of 1D data.
+        """
+        chunk = np.asarray(chunk)
+        self.length += chunk.size
+        if self._leftover is not None:
+            chunk = np.concatenate((self._leftover, chunk))
+            self._leftover = None
+        n_bins = chunk.size // self.base_bin_size
+        if chunk.size > n_bins * self.base_bin_size:
+            self._leftover = chunk[n_bins * self.base_bin_size:]
+        if n_bins > 0:
+            bins = chunk[:n_bins * self.base_bin_size].reshape(n_bins, self.base_bin_size)
+            self._append(bins.min(axis=1), bins.max(axis=1), bins.mean(axis=1, dtype=np.float64))
+
+    def _append(self, mins, maxs, means):
+        self._mins.append(mins)
+        self._maxs.append(maxs)
+        self._means.append(means)
+
+    def finish(self, factor, sample_rate=0.0):
+        """
+        :param factor: Number of bins of each level combined into one bin of the next level.
+        :param sample_rate: Sampling rate of the data.
+        :return: The complete :py:class:`MinMaxPyramid`.
+        """
+        if self._leftover is not None:
+            leftover = self._leftover
+            self._append(leftover.min(keepdims=True), leftover.max(keepdims=True),
+                         leftover.mean(keepdims=True, dtype=np.float64))
+            self._leftover = None
+        if self._mins:
+            level = [np.concatenate(x) for x in (self._mins, self._maxs, self._means)]
+        else:
+            level = [np.zeros(0), np.zeros(0), np.zeros(0)]
+        return MinMaxPyramid.from_base_level(level[0], level[1], level[2], self.length, self.base_bin_size, factor,
+                                             sample_rate)
+
+
+class MinMaxPyramid(object):
+    """
+    Min, max, and mean of bins of 1D data at several resolutions.
+
+    Level 0 has bins of base_bin_size points, and each following level has bins factor times larger, up to a single
+    bin covering all of the data.
+    """
+
+    def __init__(self, mins, maxs, means, length, base_bin_size, factor, sample_rate=0.0):
+        """
+        :param mins: List of arrays of the bin minimums of each level.
+        :param maxs: List of arrays of the bin maximums of each level.
+        :param means: List of arrays of the bin means of each level.
+        :param length: Number of points in the data.
+        :param base_bin_size: Number of points in each bin of level 0.
+        :param factor: Number of bins of each level combined into one bin of the next level.
+        :param sample_rate: Sampling rate of the data.
+        """
+        self.mins = mins
+        self.maxs = maxs
+        self.means = means
+        self.length = length
+        self.base_bin_size = base_bin_size
+        self.factor = factor
+        self.sample_rate = sample_rate
+
+    @classmethod
+    def from_base_level(cls, mins, maxs, means, length, base_bin_size, factor, sample_rate=0.0):
+        """
+        Creates a pyramid by repeatedly combining the bins of the finest level.
+        """
+        if factor < 2:
+            raise ValueError("factor must be at least 2, was {0}.".format(factor))
+        levels = [(mins, maxs, means)]
+        bin_size = base_bin_size
+        while mins.size > 1:
+            counts = cls._get_counts(length, bin_size, mins.size)
+            mins, maxs, means, counts = _reduce_bins(mins, maxs, means, counts, np.arange(0, mins.size, factor))
+            levels.append((mins, maxs, means))
+            bin_size *= factor
+        return cls([l[0] for l in levels], [l[1] for l in levels], [l[2] for l in levels], length, base_bin_size,
+                   factor, sample_rate)
+
+    @classmethod
+    def build(cls, segment, base_bin_size=256, factor=4, chunk_size=None):
+        """
+        Builds the pyramid of a segment in a single pass over its data.
+
+        :param segment: 1D :py:class:`pypore.core.Segment`, reader, or array.
+        :param base_bin_size: (Optional) Number of points in each bin of the finest level. Default is 256.
+        :param factor: (Optional) Number of bins of each level combined into one bin of the next level. Default is 4.
+        :param chunk_size: (Optional) Number of points read at a time. Defaults to the segment's chunk_size.
+        """
+        if np.ndim(segment) != 1:
+            raise ValueError("Pyramids can only be built for 1D data.")
+        builder = PyramidBuilder(base_bin_size)
+        for chunk in iter_segment_chunks(segment, chunk_size):
+            builder.update(chunk)
+        return builder.finish(factor, getattr(segment, 'sample_rate', 0.0))
+
+    @staticmethod
+    def _get_counts(length, bin_size, n_bins):
+        """
+        :return: Array of the number of data points in each bin of a level.
+        """
+        counts = np.empty(n_bins, dtype=np.int64)
+        counts.fill(bin_size)
+        if n_bins > 0:
+            counts[-1] = length - (n_bins - 1) * bin_size
+        return counts
+
+    @property
+    def n_levels(self):
+        return len(self.mins)
+
+    def get_bin_size(self, level):
+        """
+        :return: Number of data points in each bin of the level.
+        """
+        return self.base_bin_size * self.factor ** level
+
+    def save(self, filename, source_filename=None, dtype=None):
+        """
+        Saves the pyramid to a .npz file.
+
+        :param filename: Filename to save to.
+        :param source_filename: (Optional) Filename of the data file. Its size and modification time are saved, so
+                                :py:func:`open_pyramid` can tell when the pyramid is out of date.
+        :param dtype: (Optional) Type of the data the pyramid was built from, for example raw integers or current, so
+                      :py:func:`open_pyramid` can tell the pyramids of differently read data apart.
+        """
+        arrays = {}
+        for i in range(self.n_levels):
+            arrays['min_{0}'.format(i)] = self.mins[i]
+            arrays['max_{0}'.format(i)] = self.maxs[i]
+            arrays['mean_{0}'.format(i)] = self.means[i]
+        source = [-1, -1]
+        if source_filename is not None:
+            source = [os.path.getsize(source_filename), os.path.getmtime(source_filename)]
+        with open(filename, 'wb') as f:
+            np.savez(f, n_levels=self.n_levels, length=self.length, base_bin_size=self.base_bin_size,
+                     factor=self.factor, sample_rate=self.sample_rate, source=np.array(source, dtype=np.float64),
+                     dtype='' if dtype is None else np.dtype(dtype).str, **arrays)
+
+    @classmethod
+    def load(cls, filename, source_filename=None, dtype=None):
+        """
+        Loads a pyramid saved with :py:meth:`save`.
+
+        :param filename: Filename of the saved pyramid.
+        :param source_filename: (Optional) Filename of the data file. If given, and the data file has changed since
+                                the pyramid was saved, an IOError is raised.
+        :param dtype: (Optional) Type of the data. If given, and the pyramid was saved from data of another type, an
+                      IOError is raised.
+        """
+        with np.load(filename) as f:
+            if source_filename is not None:
+                source = [os.path.getsize(source_filename), os.path.getmtime(source_filename)]
+                if not np.array_equal(f['source'], source):
+                    raise IOError("Pyramid {0} is out of date with {1}.".format(filename, source_filename))
+            if dtype is not None and ('dtype' not in f or str(f['dtype']) != np.dtype(dtype).str):
+                raise IOError("Pyramid {0} is not of {1} data.".format(filename, np.dtype(dtype)))
+            n_levels = int(f['n_levels'])
+            return cls([f['min_{0}'.format(i)] for i in range(n_levels)],
+                       [f['max_{0}'.format(i)] for i in range(n_levels)],
+                       [f['mean_{0}'.format(i)] for i in range(n_levels)],
+                       int(f['length']), int(f['base_bin_size']), int(f['factor']), float(f['sample_rate']))
+
+    def query(self, start, stop, n_pixels, segment=None):
+        """
+        Summarizes the window [start, stop) of the data for display on n_pixels pixels.
+
+        The coarsest level whose bins are no larger than a pixel is used. Pixel edges are rounded to the edges of that
+        level's bins, so the envelope never misses a point in the window. If segment is given and a pixel covers fewer
+        points than a bin of level 0, the data is read from segment instead.
+
+        :param start: First point of the window.
+        :param stop: Point to stop at, exclusive.
+        :param n_pixels: Maximum number of pixels to summarize the window in.
+        :param segment: (Optional) The data the pyramid was built from, for windows too small for the pyramid.
+        :return: Tuple of numpy arrays of the min, max, and mean of each pixel.
+        """
+        start, stop, _ = slice(start, stop).indices(self.length)
+        n_points = stop - start
+        if n_points <= 0 or n_pixels < 1:
+            empty = np.zeros(0)
+            return empty, empty, empty
+
+        points_per_pixel = n_points / float(n_pixels)
+
+        if points_per_pixel < self.base_bin_size and segment is not None:
+            data = np.asarray(segment[start:stop])
+            if n_points <= n_pixels:
+                return data, data, data
+            edges = np.arange(n_pixels) * n_points // n_pixels
+            counts = np.diff(np.append(edges, n_points))
+            sums = np.add.reduceat(data, edges, dtype=np.float64)
+            return np.minimum.reduceat(data, edges), np.maximum.reduceat(data, edges), sums / counts
+
+        level = 0
+        while level + 1 < self.n_levels and self.get_bin_size(level + 1) <= points_per_pixel:
+            level += 1
+        bin_size = self.get_bin_size(level)
+
+        bin_start = start // bin_size
+        bin_stop = -(-stop // bin_size)
+        n_bins = bin_stop - bin_start
+        counts = self._get_counts(self.length, bin_size, self.mins[level].size)[bin_start:bin_stop]
+        edges = np.unique(np.arange(min(n_pixels, n_bins)) * n_bins // min(n_pixels, n_bins))
+        mins, maxs, means, _ = _reduce_bins(self.mins[level][bin_start:bin_stop], self.maxs[level][bin_start:bin_stop],
+                                            self.means[level][bin_start:bin_stop], counts, edges)
+        return mins, maxs, means
+
+
+def open_pyramid(reader, base_bin_size=256, factor=4):
+    """
+    Loads the pyramid sidecar file of a reader's file, building and saving it first if it is missing or out of date.
+
+    The sidecar file only holds the pyramid of the whole file, so the pyramid of a reader of part of a file is built
+    without being saved. It is of the data as the reader returns it, so it is rebuilt when a reader of raw integers,
+    or of another dtype, opens it. If the sidecar file cannot be written, the pyramid is returned without being saved.
+
+    :param reader: A 1D reader with a filename.
+    :param base_bin_size: (Optional) Number of points in each bin of the finest level, if the pyramid is built.
+    :param factor: (Optional) Number of bins combined into one bin of the next level, if the pyramid is built.
+    :return: The :py:class:`MinMaxPyramid` of the reader's data.
+    """
+    if not reader._reads_whole_file():
+        return MinMaxPyramid.build(reader, base_bin_size, factor)
+    pyramid_filename = get_pyramid_filename(reader.filename)
+    try:
+        return MinMaxPyramid.load(pyramid_filename, reader.filename, reader.dtype)
+    except (IOError, ValueError, KeyError):
+        # missing, out of date, or unreadable
+        pass
+    pyramid = MinMaxPyramid.build(reader, base_bin_size, factor)
+    try:
+        pyramid.save(pyramid_filename, reader.filename, reader.dtype)
+    except (IOError, OSError):
+        # for example a read only directory, the pyramid is still usable
+        pass
+    return pyramid
@@ -35,4 +35,55 @@ class ReaderTests(SegmentTests):
         Tests that subclasses of AbstractReader have implemented close.
         """
         reader = self.SEGMENT_CLASS(self.default_test_data[0].data)
-        reader.close()
\ No newline at end of file
+        reader.close()
+
+    def test_statistics_cached_together(self):
+        """
+        Tests that computing one statistic caches all of them, so the file is only read once.
+        """
+        for test_data in self.default_test_data:
+            reader = self.SEGMENT_CLASS(test_data.data)
+
+            reader.mean()
+            for attribute in ['_max', '_mean', '_min', '_std']:
+                self.assertFalse(getattr(reader, attribute) is None,
+                                 "Reader {0} should be cached after a single statistic is computed.".format(attribute))
+
+            self.assertAlmostEqual(test_data.max, reader._max)
+            self.assertAlmostEqual(test_data.min, reader._min)
+            self.assertAlmostEqual(test_data.std, reader._std)
+            reader.close()
+
+    def test_iter_chunks(self):
+        """
+        Tests that iter_chunks returns all of the data in chunks no larger than the requested size.
+        """
+        for test_data in self.default_test_data:
+            reader = self.SEGMENT_CLASS(test_data.data)
+            data = np.array(reader)
+
+            for size in [1, 7, reader.chunk_size]:
+                chunks = list(reader.iter_chunks(size))
+                self.assertTrue(all(chunk.shape[-1] <= size for chunk in chunks))
+                np.testing.assert_array_equal(data, np.concatenate(chunks, axis=-1))
+            reader.close()
+
+    def test_read_into(self):
+        """
+        Tests that read_into fills a preallocated array with the same data as np.array, for whole readers and slices.
+        """
+        for test_data in self.default_test_data:
+            reader = self.SEGMENT_CLASS(test_data.data)
+            data = np.array(reader)
+
+            out = np.zeros_like(data)
+            self.assertIs(reader.read_into(out), out)
+            np.testing.assert_array_equal(out, data)
+
+            part = reader[3:-2:2]
+            out = np.zeros_like(data[3:-2:2])
+            part.read_into(out)
+            np.testing.assert_array_equal(out, np.array(part))
+
+            self.assertRaises(ValueError, reader.read_into, np.zeros(data.shape[-1] + 1))
+            reader.close()
@@ -0,0 +1,87 @@
+import asyncio
+import unittest
+
+import numpy as np
+
+import pypore
+from pypore.i_o.async_reader import AsyncReader
+import pypore.sampledata.testing_files as tf
+
+
+def _run(coroutine):
+    return asyncio.run(coroutine)
+
+
+class TestAsyncReader(unittest.TestCase):
+    def setUp(self):
+        self.reader = pypore.open_file(tf.get_abs_path('heka_1.5s_mean5.32p_std2.76p.hkd'))
+        self.data = np.array(self.reader)
+
+    def tearDown(self):
+        self.reader.close()
+
+    def test_read(self):
+        async def read():
+            async with AsyncReader(self.reader, max_workers=2) as async_reader:
+                return await asyncio.gather(async_reader.read(slice(100, 20000)), async_reader.read(slice(None, None, 7)),
+                                            async_reader.read(12345), async_reader.read(slice(10, 10)))
+
+        contiguous, strided, point, empty = _run(read())
+        np.testing.assert_array_equal(contiguous, self.data[100:20000])
+        np.testing.assert_array_equal(strided, self.data[::7])
+        self.assertEqual(point, self.data[12345])
+        self.assertEqual(empty.size, 0)
+
+    def test_overlapping_requests_coalesced(self):
+        """
+        Tests that overlapping requests, and requests inside a range being read, share a single read.
+        """
+        async def read(async_reader):
+            first = asyncio.ensure_future(async_reader.read(slice(0, 10000)))
+            second = asyncio.ensure_future(async_reader.read(slice(5000, 15000)))
+            # let the first two requests start reading
+            await asyncio.sleep(0)
+            await asyncio.sleep(0)
+            inside = asyncio.ensure_future(async_reader.read(slice(2000, 3000)))
+            separate = asyncio.ensure_future(async_reader.read(slice(15000, 16000)))
+            return await asyncio.gather(first, second, inside, separate)
+
+        async_reader = AsyncReader(self.reader)
+        results = _run(read(async_reader))
+        async_reader.close()
+
+        for result, (start, stop) in zip(results, [(0, 10000), (5000, 15000), (2000, 3000), (15000, 16000)]):
+            np.testing.assert_array_equal(result, self.data[start:stop])
+        self.assertEqual(async_reader.n_requests, 4)
+        self.assertEqual(async_reader.n_reads, 2)
+
+    def test_iter_chunks(self):
+        async def read_all(async_reader):
+            return [chunk async for chunk in async_reader.iter_chunks(7000, prefetch=3)]
+
+        with AsyncReader(self.reader) as async_reader:
+            chunks = _run(read_all(async_reader))
+        self.assertEqual(len(chunks), 11)
+        np.testing.assert_array_equal(np.concatenate(chunks), self.data)
+
+    def test_two_channels(self):
+        reader = pypore.open_file(tf.get_abs_path('heka_2channel_1.3s_ch0_mean-24.84fA_rms2.09pA_ch1_mean.hkd'))
+
+        async def read(async_reader):
+            return await asyncio.gather(async_reader.read(slice(100, 200)), async_reader.read(slice(150, 300)),
+                                        async_reader.read(slice(0, 50, 2)))
+
+        with AsyncReader(reader) as async_reader:
+            first, second, strided = _run(read(async_reader))
+        data = np.array(reader)
+        np.testing.assert_array_equal(first, data[:, 100:200])
+        np.testing.assert_array_equal(second, data[:, 150:300])
+        np.testing.assert_array_equal(strided, data[:, 0:50:2])
+        reader.close()
+
+    def test_errors_propagate(self):
+        async def read(async_reader):
+            return await async_reader.read(10 ** 9)
+
+        with AsyncReader(self.reader) as async_reader:
+            self.assertRaises(IndexError, _run, read(async_reader))
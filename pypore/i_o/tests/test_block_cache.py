@@ -0,0 +1,56 @@
+import threading
+import unittest
+
+import numpy as np
+
+from pypore.i_o.block_cache import BlockCache
+
+
+class TestBlockCache(unittest.TestCase):
+    def test_lru_eviction(self):
+        cache = BlockCache(max_bytes=3 * 80)
+        for i in range(3):
+            cache.put(i, np.zeros(10) + i)
+        self.assertEqual(cache.get(0)[0], 0.)
+        cache.put(3, np.zeros(10))
+        # block 1 was the least recently used
+        self.assertFalse(1 in cache)
+        self.assertEqual(sorted(cache._blocks), [0, 2, 3])
+        self.assertEqual(cache.nbytes, 240)
+        self.assertEqual((cache.hits, cache.misses), (1, 0))
+
+    def test_replace_and_too_large(self):
+        cache = BlockCache(max_bytes=100)
+        cache.put(0, np.zeros(10))
+        cache.put(0, np.zeros(5))
+        self.assertEqual(cache.nbytes, 40)
+        cache.put(1, np.zeros(20))
+        self.assertFalse(1 in cache)
+        self.assertTrue(cache.get(1) is None)
+        self.assertEqual(cache.misses, 1)
+        cache.clear()
+        self.assertEqual((len(cache), cache.nbytes, cache.misses), (0, 0, 0))
+
+    def test_disabled(self):
+        cache = BlockCache(max_bytes=0)
+        cache.put(0, np.zeros(1))
+        self.assertEqual(len(cache), 0)
+        self.assertRaises(ValueError, BlockCache, -1)
+
+    def test_threads(self):
+        cache = BlockCache(max_bytes=50 * 8)
+
+        def use_cache(offset):
+            for i in range(1000):
+                key = (i + offset) % 100
+                if cache.get(key) is None:
+                    cache.put(key, np.zeros(1))
+
+        threads = [threading.Thread(target=use_cache, args=(i,)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(cache.hits + cache.misses, 4000)
+        self.assertEqual(cache.nbytes, 8 * len(cache))
+        self.assertTrue(len(cache) <= 50)
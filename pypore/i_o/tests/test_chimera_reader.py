@@ -2,7 +2,10 @@
 """
 import unittest
 
+import numpy as np
+
 from pypore.tests.segment_tests import SegmentTestData
+from pypore.i_o import chimera_reader
 from pypore.i_o.chimera_reader import ChimeraReader
 from pypore.i_o.tests.reader_tests import ReaderTests
 import pypore.sampledata.testing_files as tf
@@ -25,3 +28,73 @@ class TestChimeraReader(unittest.TestCase, ReaderTests):
         test_no_mat_chimera_files = tf.get_abs_path('chimera_empty.log')
         for filename in test_no_mat_chimera_files:
             self.assertRaises(IOError, ChimeraReader, filename)
+
+    def test_scale_kernels(self):
+        """
+        Tests that the numpy and compiled scaling kernels match scaling one step at a time.
+        """
+        reader = ChimeraReader(self.default_test_data[1].data)
+        raw = np.array(reader._data[::3])
+        expected = (raw & reader.bit_mask).astype(np.float32)
+        expected *= reader.scale_multiplication
+        expected += reader.scale_addition
+
+        kernels = [chimera_reader._scale_numpy]
+        if chimera_reader._scale_compiled is not None:
+            kernels.append(chimera_reader._scale_compiled)
+        for kernel in kernels:
+            out = np.empty(raw.size, dtype=np.float32)
+            kernel(reader._data[::3], reader.bit_mask, reader.scale_multiplication, reader.scale_addition, out)
+            np.testing.assert_allclose(out, expected, rtol=1e-6)
+        reader.close()
+
+    def test_read_into_threads(self):
+        old_min_points = chimera_reader.THREADED_MIN_POINTS
+        chimera_reader.THREADED_MIN_POINTS = 1000
+        try:
+            reader = ChimeraReader(self.default_test_data[1].data)
+            expected = np.array(reader)
+
+            out = np.empty_like(expected)
+            reader.read_into(out, n_threads=4)
+            np.testing.assert_array_equal(out, expected)
+            reader.close()
+        finally:
+            chimera_reader.THREADED_MIN_POINTS = old_min_points
+
+    def test_raw(self):
+        """
+        Tests that raw readers return the masked uint16 values, which scale to the current.
+        """
+        filename = self.default_test_data[1].data
+        reader = ChimeraReader(filename)
+        raw_reader = ChimeraReader(filename, raw=True)
+        expected = np.array(reader)
+
+        raw = np.array(raw_reader)
+        self.assertEqual(raw.dtype, np.uint16)
+        self.assertEqual(raw_reader.dtype, np.uint16)
+        np.testing.assert_allclose(raw * raw_reader.scale_multiplication + raw_reader.scale_addition, expected,
+                                   rtol=1e-6)
+
+        np.testing.assert_array_equal(np.array(raw_reader[100:5000:3]), raw[100:5000:3])
+        self.assertEqual(raw_reader[7], raw[7])
+        np.testing.assert_array_equal(np.concatenate(list(raw_reader.iter_chunks(1000))), raw)
+        self.assertEqual(raw_reader.max(), raw.max())
+
+        self.assertRaises(ValueError, ChimeraReader, filename, raw=True, dtype=np.float64)
+        reader.close()
+        raw_reader.close()
+
+    def test_dtype(self):
+        """
+        Tests that the current can be read as float64.
+        """
+        reader = ChimeraReader(self.default_test_data[1].data, dtype=np.float64)
+        values = np.array(reader)
+        self.assertEqual(values.dtype, np.float64)
+        self.assertEqual(reader[10:20][3].dtype, np.float64)
+        np.testing.assert_allclose(values, np.array(ChimeraReader(self.default_test_data[1].data)), rtol=1e-6)
+
+        self.assertRaises(ValueError, ChimeraReader, self.default_test_data[1].data, dtype=np.int32)
+        reader.close()
@@ -0,0 +1,115 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+import pypore
+from pypore.i_o.convert import convert_file, convert_files, convert_reader, main
+from pypore.i_o.native_reader import NativeReader
+from pypore.i_o.overview import MinMaxPyramid, get_pyramid_filename
+from pypore.tests.test_batch import _CountingExecutor
+import pypore.sampledata.testing_files as tf
+
+
+class TestConvert(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _check_conversion(self, filename, **kwargs):
+        output_filename = convert_file(tf.get_abs_path(filename), os.path.join(self.directory, 'out.ppd'), **kwargs)
+        original = pypore.open_file(tf.get_abs_path(filename))
+        converted = NativeReader(output_filename, cache=False)
+        self.assertEqual(converted.shape, original.shape)
+        self.assertAlmostEqual(converted.sample_rate, original.sample_rate)
+        np.testing.assert_allclose(np.array(converted), np.array(original), rtol=1e-6, atol=0)
+        self.assertEqual(converted.metadata['source_filename'], filename)
+        return original, converted
+
+    def test_convert_heka(self):
+        """
+        Tests that Heka files are converted losslessly, with their statistics and pyramid.
+        """
+        original, converted = self._check_conversion('heka_1.5s_mean5.32p_std2.76p.hkd', chunk_length=20000)
+        np.testing.assert_array_equal(np.array(converted), np.array(original))
+        # 4 blocks of 5000 points per chunk
+        self.assertEqual(converted._chunk_size, 20000)
+
+        stored = converted.footer['statistics']
+        np.testing.assert_allclose(stored, [original.max(), original.mean(), original.min(), original.std()],
+                                   rtol=1e-10)
+
+        pyramid = MinMaxPyramid.load(get_pyramid_filename(converted.filename), converted.filename)
+        self.assertEqual(pyramid.length, original.size)
+        self.assertEqual(pyramid.maxs[-1][0], original.max())
+
+    def test_convert_two_channel_heka(self):
+        original, converted = self._check_conversion('heka_2channel_1.3s_ch0_mean-24.84fA_rms2.09pA_ch1_mean.hkd',
+                                                     n_threads=2)
+        np.testing.assert_array_equal(np.array(converted), np.array(original))
+        self.assertEqual(len(converted.channel_names), 4)
+        self.assertEqual(converted.footer['statistics'], None)
+        self.assertFalse(os.path.exists(get_pyramid_filename(converted.filename)))
+
+    def test_convert_heka_raw_blocks(self):
+        """
+        Tests that Heka readers without a memory map, and single channels of multichannel files, are converted
+        losslessly from their raw blocks.
+        """
+        filename = tf.get_abs_path('heka_2channel_1.3s_ch0_mean-24.84fA_rms2.09pA_ch1_mean.hkd')
+        reader = pypore.open_file(filename, memmap=False)
+        for original in [reader, reader[1], reader[0][:]]:
+            output_filename = os.path.join(self.directory, 'raw.ppd')
+            convert_reader(original, output_filename, chunk_length=20000)
+            converted = NativeReader(output_filename, cache=False)
+            self.assertEqual(converted.raw_dtype, np.int16)
+            self.assertEqual(converted.shape, original.shape)
+            np.testing.assert_array_equal(np.array(converted), np.array(original))
+            converted.close()
+        reader.close()
+
+    def test_convert_chimera(self):
+        self._check_conversion('spheres_20140114_154938_beginning.log', chunk_length=100000, compression_level=1)
+
+    def test_convert_slice_quantized(self):
+        """
+        Tests that readers without raw integers are quantized finely.
+        """
+        reader = pypore.open_file(tf.get_abs_path('heka_1.5s_mean5.32p_std2.76p.hkd'))[::3]
+        output_filename = os.path.join(self.directory, 'slice.ppd')
+        convert_reader(reader, output_filename, chunk_length=10000, pyramid=False)
+        converted = NativeReader(output_filename)
+        self.assertAlmostEqual(converted.sample_rate, reader.sample_rate)
+        np.testing.assert_allclose(np.array(converted), np.array(reader), rtol=0, atol=1e-20)
+        self.assertFalse(os.path.exists(get_pyramid_filename(output_filename)))
+
+    def test_convert_onto_itself_raises(self):
+        filename = tf.get_abs_path('native_1.5s_mean5.32p_std2.76p.ppd')
+        self.assertRaises(ValueError, convert_file, filename, filename)
+
+    def test_convert_files(self):
+        """
+        Tests converting directories, with the errors of bad files returned, without more than max_open_files
+        conversions in flight at once.
+        """
+        executor = _CountingExecutor(max_workers=2)
+        results = list(convert_files(os.path.join(tf.TEST_DATA_FOLDER_PATH, 'heka_*.hkd'), self.directory,
+                                     max_open_files=1, executor=executor))
+        executor.shutdown()
+        self.assertEqual(executor.max_in_flight, 1)
+        results = dict((os.path.basename(r.filename), r) for r in results)
+        self.assertEqual(len(results), 3)
+        self.assertTrue(results['heka_incomplete.hkd'].error is not None)
+        output_filename = results['heka_1.5s_mean5.32p_std2.76p.hkd'].output_filename
+        self.assertEqual(os.path.dirname(output_filename), self.directory)
+        self.assertTrue(os.path.exists(output_filename))
+
+    def test_main(self):
+        output_directory = os.path.join(self.directory, 'converted')
+        status = main([tf.get_abs_path('chimera_1event.log'), '-o', output_directory, '-j', '1', '--no-pyramid'])
+        self.assertEqual(status, 0)
+        self.assertEqual(os.listdir(output_directory), ['chimera_1event.ppd'])
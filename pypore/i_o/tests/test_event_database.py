@@ -0,0 +1,109 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+import pypore
+from pypore.extractors.threshold_detector import EVENT_DTYPE, ThresholdDetector
+from pypore.extractors.level_segmentation import LEVEL_DTYPE
+from pypore.i_o.event_database import EventDatabase
+from pypore.i_o.heka_reader import HekaReader
+import pypore.sampledata.testing_files as tf
+
+
+def _make_events(n_events, sample_rate=1000.):
+    events = np.zeros(n_events, dtype=EVENT_DTYPE).view(np.recarray)
+    events.start = np.arange(n_events) * 100
+    events.stop = events.start + np.arange(n_events) % 10 + 1
+    events.baseline = 1.
+    events.mean_current = 1. - np.arange(n_events) / float(n_events)
+    events.dwell_time = (events.stop - events.start) / sample_rate
+    return events
+
+
+class TestEventDatabase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.database = EventDatabase(os.path.join(self.directory, 'events.db'))
+
+    def tearDown(self):
+        self.database.close()
+        shutil.rmtree(self.directory)
+
+    def test_add_and_query(self):
+        events = _make_events(1000)
+        ids = self.database.add_events('a.log', events, 1000.)
+        self.database.add_events('b.log', _make_events(10), 1000.)
+        self.assertEqual(len(ids), 1000)
+        self.assertEqual(len(self.database), 1010)
+        self.assertEqual([f for _, f in self.database.get_files()], [os.path.abspath('a.log'),
+                                                                     os.path.abspath('b.log')])
+
+        result = self.database.query(filename='a.log', min_dwell_time=0.005, max_blockade_depth=0.5)
+        expected = (events.dwell_time >= 0.005) & (events.baseline - events.mean_current <= 0.5)
+        np.testing.assert_array_equal(result.id, ids[expected])
+        np.testing.assert_array_equal(result.start, events.start[expected])
+        self.assertEqual(self.database.count(filename='a.log', min_dwell_time=0.005, max_blockade_depth=0.5),
+                         expected.sum())
+        self.assertEqual(len(self.database.query(limit=5)), 5)
+        self.assertEqual(self.database.count(min_blockade_depth=2.), 0)
+        self.assertEqual(len(self.database.query(min_blockade_depth=2.)), 0)
+
+    def test_indexes_used(self):
+        """
+        Tests that filtering on dwell time, blockade depth, and file uses the indexes.
+        """
+        for where in ['dwell_time > 1', 'blockade_depth < 1', 'file_id = 1']:
+            plan = self.database._connection.execute('EXPLAIN QUERY PLAN SELECT * FROM events WHERE ' +
+                                                     where).fetchall()
+            self.assertTrue('USING INDEX' in ' '.join(str(row[-1]) for row in plan), where)
+
+    def test_persisted(self):
+        self.database.add_events('a.log', _make_events(3), 1000., levels=[np.zeros(0, dtype=LEVEL_DTYPE),
+                                                                          [(100, 101, 0.5), (101, 102, 0.25)],
+                                                                          np.zeros(0, dtype=LEVEL_DTYPE)])
+        self.database.close()
+        self.database = EventDatabase(os.path.join(self.directory, 'events.db'))
+        self.assertEqual(len(self.database), 3)
+        event = self.database.get_event(2)
+        self.assertEqual(event.n_levels, 2)
+        levels = self.database.get_levels(2)
+        np.testing.assert_array_equal(levels.mean_current, [0.5, 0.25])
+        self.assertRaises(KeyError, self.database.get_event, 4)
+        self.assertRaises(ValueError, self.database.add_events, 'a.log', _make_events(3), levels=[[]])
+
+    def test_get_event_data(self):
+        """
+        Tests that the samples around an event are read through a slice of the file's reader.
+        """
+        filename = tf.get_abs_path('chimera_1event.log')
+        reader = pypore.open_file(filename)
+        events = ThresholdDetector(threshold=5.).find_events(reader)
+        event_id = self.database.add_events(filename, events, reader.sample_rate)[0]
+
+        data = self.database.get_event_data(event_id, padding=10)
+        np.testing.assert_array_equal(np.array(data), np.array(reader[events.start[0] - 10:events.stop[0] + 10]))
+        self.assertEqual(len(self.database.get_event_data(event_id)), events.stop[0] - events.start[0])
+        reader.close()
+
+    def test_reader_class(self):
+        filename = tf.get_abs_path('heka_1.5s_mean5.32p_std2.76p.hkd')
+        events = _make_events(2)
+        event_ids = self.database.add_events(filename, events, reader_class=HekaReader)
+        data = self.database.get_event_data(event_ids[1], padding=5)
+        self.assertTrue(isinstance(data, HekaReader))
+        self.assertEqual(len(data), events.stop[1] - events.start[1] + 10)
+
+    def test_add_results(self):
+        from pypore.batch import batch_analyze
+        from concurrent.futures import ThreadPoolExecutor
+
+        filenames = [tf.get_abs_path('chimera_1event.log'), tf.get_abs_path('chimera_nonoise_2events_1levels.log')]
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            n_events = self.database.add_results(batch_analyze(filenames, ThresholdDetector(min_noise=1e-10),
+                                                               executor=executor))
+        self.assertEqual(n_events, 3)
+        self.assertEqual(len(self.database), 3)
+        self.assertEqual(self.database.count(filename=filenames[1]), 2)
@@ -1,7 +1,13 @@
+import os
+import shutil
+import tempfile
 import unittest
 
+import numpy as np
+
 from pypore.tests.segment_tests import SegmentTestData
-from pypore.i_o.heka_reader import HekaReader
+from pypore.i_o.heka_reader import HekaLayout, HekaReader
+from pypore.i_o.metadata_cache import get_cache_directory, set_cache_directory, read_cache
 from pypore.i_o.tests.reader_tests import ReaderTests
 import pypore.sampledata.testing_files as tf
 
@@ -27,6 +33,236 @@ class TestHekaReader(unittest.TestCase, ReaderTests):
 
         self.assertRaises(AttributeError, set_chunk, 100)
 
+    def test_memmap_matches_block_reading(self):
+        """
+        Tests that reading through the memory map gives the same data as reading block by block.
+        """
+        filename = tf.get_abs_path('heka_1.5s_mean5.32p_std2.76p.hkd')
+        reader = self.SEGMENT_CLASS(filename)
+        block_reader = self.SEGMENT_CLASS(filename, memmap=False)
+
+        self.assertTrue(reader._blocks is not None)
+        self.assertTrue(block_reader._blocks is None)
+
+        for s in [slice(None), slice(None, None, -1), slice(3, 70000, 7), slice(-5000, None, -3), slice(4999, 5001),
+                  slice(None, None, 5001)]:
+            np.testing.assert_array_equal(reader.get_data_from_selection(s), block_reader.get_data_from_selection(s))
+
+        reader.close()
+        block_reader.close()
+
+    def test_read_block_headers(self):
+        """
+        Tests that the headers of every block are read into one array, with or without the memory map.
+        """
+        filename = tf.get_abs_path('heka_1.5s_mean5.32p_std2.76p.hkd')
+        reader = self.SEGMENT_CLASS(filename)
+        block_reader = self.SEGMENT_CLASS(filename, memmap=False)
+
+        headers = reader.read_block_headers()
+        self.assertEqual(headers.shape, (reader.num_blocks_in_file,))
+        self.assertEqual(headers['channel_params']['Scale'].shape, (reader.num_blocks_in_file, 1))
+        np.testing.assert_array_equal(headers, block_reader.read_block_headers())
+
+        # the first block's header, read field by field
+        block_reader.datafile.seek(block_reader.per_file_header_length)
+        for name, datatype in block_reader.per_block_param_list:
+            self.assertEqual(headers['block_params'][name][0], np.fromfile(block_reader.datafile, datatype, 1)[0])
+        for name, datatype in block_reader.per_channel_param_list:
+            self.assertEqual(headers['channel_params'][name][0, 0], np.fromfile(block_reader.datafile, datatype, 1)[0])
+
+        reader.close()
+        block_reader.close()
+
+    def test_scales(self):
+        """
+        Tests that the scales of every block are read once, shared with sliced readers, and kept in the metadata cache.
+        """
+        filename = tf.get_abs_path('heka_2channel_1.3s_ch0_mean-24.84fA_rms2.09pA_ch1_mean.hkd')
+        uncached = self.SEGMENT_CLASS(filename, cache=False)
+        expected = uncached.read_block_headers()['channel_params']['Scale']
+        np.testing.assert_array_equal(uncached.scales, expected)
+        self.assertEqual(uncached.scales.shape, (uncached.num_blocks_in_file, uncached.channel_list_number))
+        self.assertTrue(uncached[:, 10:][0].scales is uncached.scales)
+
+        directory = tempfile.mkdtemp()
+        old_directory = get_cache_directory()
+        set_cache_directory(directory)
+        try:
+            reader = self.SEGMENT_CLASS(filename)
+            np.testing.assert_array_equal(reader.scales, expected)
+            self.assertTrue('heka_scales' in read_cache(filename))
+            reader.close()
+
+            # a new reader gets the scales from the cache, without reading the block headers
+            reader = self.SEGMENT_CLASS(filename)
+            reader.read_block_headers = None
+            np.testing.assert_array_equal(reader.scales, expected)
+            np.testing.assert_array_equal(np.array(reader), np.array(uncached))
+            reader.close()
+        finally:
+            set_cache_directory(old_directory)
+            shutil.rmtree(directory)
+        uncached.close()
+
+    def test_raw(self):
+        """
+        Tests that raw readers return the int16 data as stored in the file, which scales to the current with the scales
+        of the blocks, with or without the memory map.
+        """
+        filename = tf.get_abs_path('heka_2channel_1.3s_ch0_mean-24.84fA_rms2.09pA_ch1_mean.hkd')
+        reader = self.SEGMENT_CLASS(filename)
+        expected = np.array(reader)
+        for memmap in [True, False]:
+            raw_reader = self.SEGMENT_CLASS(filename, memmap=memmap, raw=True)
+            raw = np.array(raw_reader)
+            self.assertEqual(raw.dtype, np.dtype('>i2'))
+
+            scales = np.repeat(raw_reader.scales, raw_reader.chunk_size, axis=0).T
+            np.testing.assert_array_equal(raw * scales, expected)
+            np.testing.assert_array_equal(np.array(raw_reader[::-1, 3:60000:7]), raw[::-1, 3:60000:7])
+            np.testing.assert_array_equal(np.array(raw_reader[2][100:200]), raw[2, 100:200])
+            self.assertEqual(raw_reader[1, 5], raw[1, 5])
+            raw_reader.close()
+
+        self.assertRaises(ValueError, self.SEGMENT_CLASS, filename, raw=True, dtype=np.float32)
+        reader.close()
+
+    def test_raw_views(self):
+        """
+        Tests that raw selections within a block of the memory map are views of it, and other selections are copies.
+        """
+        filename = tf.get_abs_path('heka_2channel_1.3s_ch0_mean-24.84fA_rms2.09pA_ch1_mean.hkd')
+        reader = self.SEGMENT_CLASS(filename, raw=True)
+        block_length = reader.chunk_size
+
+        for channels in [0, 1, slice(None), slice(1, 3)]:
+            data = reader.get_data_from_selection(slice(100, block_length), channels)
+            self.assertTrue(np.shares_memory(data, reader._blocks))
+            self.assertFalse(data.flags.writeable)
+        for s, channels in [(slice(100, block_length + 1), 0), (slice(100, 200), slice(None, None, 2)),
+                            (slice(100, 200, 2), 0)]:
+            data = reader.get_data_from_selection(s, channels)
+            self.assertFalse(np.shares_memory(data, reader._blocks))
+        for chunk in reader[1].iter_chunks():
+            self.assertTrue(np.shares_memory(chunk, reader._blocks))
+        reader.close()
+
+    def test_dtype(self):
+        """
+        Tests that the current can be read as float32, with or without the memory map.
+        """
+        filename = tf.get_abs_path('heka_1.5s_mean5.32p_std2.76p.hkd')
+        expected = np.array(self.SEGMENT_CLASS(filename))
+        for memmap in [True, False]:
+            reader = self.SEGMENT_CLASS(filename, memmap=memmap, dtype=np.float32)
+            values = np.array(reader)
+            self.assertEqual(values.dtype, np.float32)
+            np.testing.assert_allclose(values, expected, rtol=1e-6)
+            self.assertEqual(reader[10:20:2].dtype, np.float32)
+            reader.close()
+
+    def test_block_cache(self):
+        """
+        Tests that repeated selections of a reader without memory map are served from the block cache shared with
+        sliced readers.
+        """
+        filename = tf.get_abs_path('heka_1.5s_mean5.32p_std2.76p.hkd')
+        data_reader = self.SEGMENT_CLASS(filename, block_cache_size=0)
+        data = np.array(data_reader)
+        block_bytes = data_reader.total_bytes_per_block
+        reader = self.SEGMENT_CLASS(filename, memmap=False, block_cache_size=3 * block_bytes)
+        cache = reader.block_cache
+
+        self.assertEqual(reader[100], data[100])
+        self.assertEqual((cache.hits, cache.misses), (0, 1))
+        self.assertEqual(reader[4999], data[4999])
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+        window = reader[4000:11000]
+        self.assertTrue(window.block_cache is cache)
+        np.testing.assert_array_equal(np.array(window), data[4000:11000])
+        self.assertEqual((cache.hits, cache.misses), (2, 3))
+        self.assertEqual(len(cache), 3)
+
+        # a fourth block evicts the least recently used one, block 0
+        self.assertEqual(window[-1], data[10999])
+        self.assertEqual(reader[15000], data[15000])
+        self.assertEqual(len(cache), 3)
+        self.assertEqual(cache.nbytes, 3 * block_bytes)
+        self.assertFalse(0 in cache)
+        self.assertTrue(2 in cache)
+
+        # reads larger than the cache bypass it
+        misses = cache.misses
+        np.testing.assert_array_equal(np.array(reader), data)
+        self.assertEqual(cache.misses, misses)
+        reader.close()
+        data_reader.close()
+
+    def test_slices_share_file(self):
+        """
+        Tests that sliced readers are views sharing the parent's layout, file handle, and memory map.
+        """
+        filename = tf.get_abs_path('heka_2channel_1.3s_ch0_mean-24.84fA_rms2.09pA_ch1_mean.hkd')
+        for memmap in [True, False]:
+            reader = self.SEGMENT_CLASS(filename, memmap=memmap)
+            data = np.array(reader)
+            view = reader
+            for i in range(100):
+                view = view[:, 1:]
+            view = view[1][::3]
+            self.assertTrue(view._layout is reader._layout)
+            self.assertTrue(view.datafile is reader.datafile)
+            self.assertTrue(view._blocks is reader._blocks)
+            np.testing.assert_array_equal(np.array(view), data[1, 100::3])
+
+            # closing a view leaves the file open for the parent
+            view.close()
+            self.assertFalse(reader.datafile.closed)
+            np.testing.assert_array_equal(np.array(reader[0, :10]), data[0, :10])
+            reader.close()
+            self.assertTrue(reader.datafile.closed)
+
+    def test_large_file_offsets(self):
+        """
+        Tests that the byte offsets of blocks far into a large file don't overflow when the header values are numpy
+        scalars.
+        """
+        reader = self.SEGMENT_CLASS(tf.get_abs_path('heka_2channel_1.3s_ch0_mean-24.84fA_rms2.09pA_ch1_mean.hkd'))
+        layout = reader._layout
+        n_blocks = 1000000
+        header_length = np.uint32(layout.per_file_header_length)
+        params = dict(layout.per_file_params)
+        params['Points per block'] = np.uint32(params['Points per block'])
+        large = HekaLayout(layout.per_file_param_list, layout.per_block_param_list, layout.per_channel_param_list,
+                           layout.channel_list, params, header_length,
+                           int(header_length) + n_blocks * layout.total_bytes_per_block)
+        reader.close()
+
+        self.assertEqual(large.num_blocks_in_file, n_blocks)
+        self.assertEqual(large.points_per_channel_total, n_blocks * layout.points_per_block)
+        offset = large.per_file_header_length + (n_blocks - 1) * large.total_bytes_per_block
+        self.assertEqual(offset, layout.per_file_header_length + (n_blocks - 1) * layout.total_bytes_per_block)
+        self.assertTrue(offset > 2 ** 32)
+
+    def test_iter_chunks(self):
+        """
+        Tests that iter_chunks returns all of the selected data in chunks of the requested size.
+        """
+        filename = tf.get_abs_path('heka_1.5s_mean5.32p_std2.76p.hkd')
+        reader = self.SEGMENT_CLASS(filename)
+
+        for segment in [reader, reader[::-3], reader[-7000:100:-1], reader[10:20]]:
+            data = np.array(segment)
+            for size in [1, 999, 5000, 100000]:
+                chunks = list(segment.iter_chunks(size))
+                self.assertTrue(all(chunk.size == size for chunk in chunks[:-1]))
+                np.testing.assert_array_equal(data, np.concatenate(chunks))
+
+        self.assertRaises(ValueError, next, reader.iter_chunks(0))
+        reader.close()
+
     def test_heka_format_error_raises_binary_file(self):
         """
         Tests that trying to open a completely binary file that doesn't fit the Heka specs raises an IOError.
@@ -50,6 +286,23 @@ class TestHekaReader(unittest.TestCase, ReaderTests):
 
         self.assertRaises(IOError, self.SEGMENT_CLASS, filename)
 
+    def test_truncated_heka_header_raises(self):
+        """
+        Tests that opening a Heka file that ends in its header raises an IOError.
+        """
+        with open(tf.get_abs_path('heka_1.5s_mean5.32p_std2.76p.hkd'), 'rb') as f:
+            header = f.read(8192)
+        directory = tempfile.mkdtemp()
+        try:
+            for length in [header.index(b'\n') + 1, header.index(b'End of file format') - 1,
+                           header.index(b'End of file format') + 100]:
+                filename = os.path.join(directory, 'truncated_{0}.hkd'.format(length))
+                with open(filename, 'wb') as f:
+                    f.write(header[:length])
+                self.assertRaises(IOError, self.SEGMENT_CLASS, filename, cache=False)
+        finally:
+            shutil.rmtree(directory)
+
     def test_read_next_block_ends(self):
         """
         Tests that the _read_heka_next_block function eventually returns an empty array.
@@ -65,15 +318,15 @@ class TestHekaReader(unittest.TestCase, ReaderTests):
 
     def test_two_channel_channel_number(self):
         """
+        Tests that multichannel data has one row per channel in the file's channel list.
         """
-        # TODO finish
-
         f = tf.get_abs_path('heka_2channel_1.3s_ch0_mean-24.84fA_rms2.09pA_ch1_mean.hkd')
 
         segment = self.SEGMENT_CLASS(f)
 
-        # make sure there are 2 channels
-        self.assertEqual(len(segment), 2)
+        # make sure there is a row for each channel. The 2 probes each record a current and a voltage channel.
+        self.assertEqual(len(segment), 4)
+        self.assertEqual(len(segment), segment.channel_list_number)
 
         # make sure each channel has data
         self.assertGreater(len(segment[0]), 1)
@@ -90,3 +343,47 @@ class TestHekaReader(unittest.TestCase, ReaderTests):
         segment = self.SEGMENT_CLASS(tf.get_abs_path('heka_2channel_1.3s_ch0_mean-24.84fA_rms2.09pA_ch1_mean.hkd'))
 
         self.assertAlmostEqual(segment[0].mean(), 24.84e-12)
+
+    def test_two_channel_channel_stats(self):
+        """
+        Tests that the statistics of multichannel selections are per channel, and are not cached for the file.
+        """
+        filename = tf.get_abs_path('heka_2channel_1.3s_ch0_mean-24.84fA_rms2.09pA_ch1_mean.hkd')
+        segment = self.SEGMENT_CLASS(filename)
+        data = np.array(segment)
+
+        for stat, function in [(segment.max, np.max), (segment.mean, np.mean), (segment.min, np.min),
+                               (segment.std, np.std)]:
+            self.assertEqual(stat().shape, (segment.shape[0],))
+            np.testing.assert_allclose(stat(), function(data, axis=1), rtol=1e-10)
+        self.assertNotIn('statistics', read_cache(filename))
+        self.assertAlmostEqual(segment[1].mean(), data[1].mean())
+        segment.close()
+
+    def test_two_channel_slicing(self):
+        """
+        Tests that multichannel data can be sliced by (channel, sample).
+        """
+        f = tf.get_abs_path('heka_2channel_1.3s_ch0_mean-24.84fA_rms2.09pA_ch1_mean.hkd')
+
+        for memmap in [True, False]:
+            segment = self.SEGMENT_CLASS(f, memmap=memmap)
+            data = np.array(segment)
+
+            self.assertEqual(data.shape, segment.shape)
+            self.assertEqual(data.shape, (4, 65000))
+
+            np.testing.assert_array_equal(data[0], segment[0])
+            np.testing.assert_array_equal(data[:, 1000:2000], segment[:, 1000:2000])
+            np.testing.assert_array_equal(data[1::2, ::-7], segment[1::2, ::-7])
+            np.testing.assert_array_equal(data[-1, 5::3], segment[-1, 5::3])
+            np.testing.assert_array_equal(data[::-1, -3000:100:-2], segment[::-1, -3000:100:-2])
+            np.testing.assert_array_equal(data[1:3][1][::-2], segment[1:3][1][::-2])
+            np.testing.assert_array_equal(data[:, 5], segment[:, 5])
+            self.assertEqual(data[2, 7], segment[2, 7])
+
+            self.assertRaises(IndexError, segment.__getitem__, (4, 0))
+            self.assertRaises(IndexError, segment.__getitem__, (0, 0, 0))
+            self.assertRaises(IndexError, segment[0].__getitem__, (0, 0))
+
+            segment.close()
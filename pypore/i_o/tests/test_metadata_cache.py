@@ -0,0 +1,159 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import scipy.io as sio
+
+from pypore.i_o import metadata_cache
+from pypore.i_o.chimera_reader import ChimeraReader
+from pypore.i_o.heka_reader import HekaReader
+import pypore.sampledata.testing_files as tf
+
+
+class TestMetadataCache(unittest.TestCase):
+    def setUp(self):
+        self.old_cache_directory = metadata_cache.get_cache_directory()
+        self.directory = tempfile.mkdtemp()
+        metadata_cache.set_cache_directory(os.path.join(self.directory, 'cache'))
+
+        self.data_filename = os.path.join(self.directory, 'data.bin')
+        with open(self.data_filename, 'wb') as f:
+            f.write(b'0123456789')
+
+    def tearDown(self):
+        metadata_cache.set_cache_directory(self.old_cache_directory)
+        shutil.rmtree(self.directory)
+
+    def test_round_trip(self):
+        self.assertEqual(metadata_cache.read_cache(self.data_filename), {})
+
+        metadata_cache.update_cache(self.data_filename, a=1, b=np.array([1.5, 2.5]))
+        metadata_cache.update_cache(self.data_filename, c=np.float32(3.))
+
+        self.assertEqual(metadata_cache.read_cache(self.data_filename), {'a': 1, 'b': [1.5, 2.5], 'c': 3.})
+
+    def test_stale_entry_ignored(self):
+        """
+        Tests that entries are ignored once the data file changes.
+        """
+        metadata_cache.update_cache(self.data_filename, a=1)
+
+        with open(self.data_filename, 'ab') as f:
+            f.write(b'more')
+
+        self.assertEqual(metadata_cache.read_cache(self.data_filename), {})
+
+    def test_disabled(self):
+        metadata_cache.set_cache_directory(None)
+        metadata_cache.update_cache(self.data_filename, a=1)
+
+        self.assertEqual(metadata_cache.read_cache(self.data_filename), {})
+        self.assertFalse(os.path.exists(os.path.join(self.directory, 'cache')))
+
+    def test_bad_entries_ignored(self):
+        """
+        Tests that entries that cannot be written are ignored, without leaving temporary files behind.
+        """
+        metadata_cache.update_cache(self.data_filename, name=b'\xff\xfeHeka')
+        self.assertEqual(metadata_cache.read_cache(self.data_filename), {'name': u'\ufffd\ufffdHeka'})
+
+        metadata_cache.update_cache(self.data_filename, a=object())
+        self.assertEqual(metadata_cache.read_cache(self.data_filename), {'name': u'\ufffd\ufffdHeka'})
+        self.assertEqual([f for f in os.listdir(metadata_cache.get_cache_directory()) if f.endswith('.tmp')], [])
+
+    def test_statistics_reused(self):
+        """
+        Tests that a reopened file gets its statistics from the cache.
+        """
+        filename = os.path.join(self.directory, 'chimera_small.log')
+        shutil.copy(tf.get_abs_path('chimera_small.log'), filename)
+        shutil.copy(tf.get_abs_path('chimera_small.mat'), filename[:-len('log')] + 'mat')
+
+        reader = ChimeraReader(filename)
+        statistics = [reader.max(), reader.mean(), reader.min(), reader.std()]
+        reader.close()
+
+        self.assertEqual(metadata_cache.read_cache(filename)['statistics'], statistics)
+
+        metadata_cache.update_cache(filename, statistics=[1., 2., 3., 4.])
+        reader = ChimeraReader(filename)
+        self.assertIsNone(reader.specs_file, "Specs should have come from the cache.")
+        self.assertEqual([reader.max(), reader.mean(), reader.min(), reader.std()], [1., 2., 3., 4.])
+        reader.close()
+
+        reader = ChimeraReader(filename, cache=False)
+        self.assertEqual([reader.max(), reader.mean(), reader.min(), reader.std()], statistics)
+        reader.close()
+
+    def test_statistics_dropped_with_stale_specs(self):
+        """
+        Tests that cached statistics are not reused once the .mat file, and so the scaling, changes.
+        """
+        filename = os.path.join(self.directory, 'chimera_small.log')
+        specs_filename = filename[:-len('log')] + 'mat'
+        shutil.copy(tf.get_abs_path('chimera_small.log'), filename)
+        shutil.copy(tf.get_abs_path('chimera_small.mat'), specs_filename)
+
+        reader = ChimeraReader(filename)
+        old_max = reader.max()
+        reader.close()
+
+        specs = sio.loadmat(specs_filename)
+        specs['SETUP_TIAgain'] = specs['SETUP_TIAgain'] * 2
+        sio.savemat(specs_filename, specs)
+
+        reader = ChimeraReader(filename)
+        self.assertIsNotNone(reader.specs_file, "Stale specs should have been reloaded.")
+        uncached = ChimeraReader(filename, cache=False)
+        self.assertNotEqual(reader.max(), old_max)
+        self.assertEqual([reader.max(), reader.mean(), reader.min(), reader.std()],
+                         [uncached.max(), uncached.mean(), uncached.min(), uncached.std()])
+        reader.close()
+        uncached.close()
+
+    def test_heka_header_reused(self):
+        filename = tf.get_abs_path('heka_1.5s_mean5.32p_std2.76p.hkd')
+
+        reader = HekaReader(filename)
+        self.assertIn('heka_header', metadata_cache.read_cache(filename))
+        expected = reader[:]
+        reader.close()
+
+        reader = HekaReader(filename)
+        np.testing.assert_array_equal(reader[:], expected)
+        self.assertAlmostEqual(reader.sample_rate, 50000.)
+        reader.close()
+
+    def test_heka_header_types(self):
+        """
+        Tests that the header parameters have the same types whether they were parsed or read from the cache.
+        """
+        filename = tf.get_abs_path('heka_1.5s_mean5.32p_std2.76p.hkd')
+
+        parsed = HekaReader(filename)
+        cached = HekaReader(filename)
+        uncached = HekaReader(filename, cache=False)
+        for reader in [cached, uncached]:
+            self.assertEqual(reader.per_file_params, parsed.per_file_params)
+            for name, value in parsed.per_file_params.items():
+                self.assertEqual(type(reader.per_file_params[name]), type(value))
+        self.assertEqual(type(uncached.per_file_params['Points per block']), int)
+        for reader in [parsed, cached, uncached]:
+            reader.close()
+
+    def test_partial_reader_not_cached(self):
+        """
+        Tests that the statistics of a slice of a file don't replace those of the whole file.
+        """
+        filename = tf.get_abs_path('heka_1.5s_mean5.32p_std2.76p.hkd')
+
+        reader = HekaReader(filename)
+        part = reader[100:200]
+        part.max()
+        self.assertNotIn('statistics', metadata_cache.read_cache(filename))
+
+        self.assertAlmostEqual(reader.mean(), 5.32e-12, delta=0.01e-12)
+        self.assertIn('statistics', metadata_cache.read_cache(filename))
+        reader.close()
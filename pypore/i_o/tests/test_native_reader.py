@@ -0,0 +1,174 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from pypore.tests.segment_tests import SegmentTestData
+from pypore.i_o.heka_reader import HekaReader
+from pypore.i_o.native_reader import NativeReader
+from pypore.i_o.native_writer import NativeWriter
+from pypore.i_o.tests.reader_tests import ReaderTests
+import pypore.sampledata.testing_files as tf
+
+
+class TestNativeReader(unittest.TestCase, ReaderTests):
+    SEGMENT_CLASS = NativeReader
+    # converted losslessly from heka_1.5s_mean5.32p_std2.76p.hkd, one chunk per Heka block
+    default_test_data = [
+        SegmentTestData(tf.get_abs_path('native_1.5s_mean5.32p_std2.76p.ppd'), maximum=2.2500000000000003e-11,
+                        mean=5.3176916666664804e-12, minimum=-1.5937500000000003e-11, shape=(75000,), size=75000,
+                        std=2.7618361051293422e-12, sample_rate=50000.)]
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_matches_heka(self):
+        """
+        Tests that selections of the converted files match the same selections of the original Heka files.
+        """
+        for native_name, heka_name in [('native_1.5s_mean5.32p_std2.76p.ppd', 'heka_1.5s_mean5.32p_std2.76p.hkd'),
+                                       ('native_2channel_1.3s.ppd',
+                                        'heka_2channel_1.3s_ch0_mean-24.84fA_rms2.09pA_ch1_mean.hkd')]:
+            native = NativeReader(tf.get_abs_path(native_name))
+            heka = HekaReader(tf.get_abs_path(heka_name))
+
+            self.assertEqual(native.shape, heka.shape)
+            self.assertAlmostEqual(native.sample_rate, heka.sample_rate)
+            np.testing.assert_array_equal(np.array(native), np.array(heka))
+            for item in [slice(3, 70000, 7), slice(None, None, -1), slice(-5000, None, -3), slice(4999, 5001),
+                         slice(None, None, 5001), slice(100, 10)]:
+                if native.ndim > 1:
+                    item = (slice(None, None, 2), item)
+                np.testing.assert_array_equal(np.array(native[item]), np.array(heka[item]))
+            point = (1, 12345) if native.ndim > 1 else 12345
+            self.assertEqual(native[point], heka[point])
+            native.close()
+            heka.close()
+
+    def test_write_values(self):
+        """
+        Tests that quantized values are within half a quantization step of the original values.
+        """
+        filename = os.path.join(self.directory, 'values.ppd')
+        values = np.random.RandomState(0).normal(size=(2, 10000)) * [[1.], [1e-9]]
+        values[1, 5000:] = 3.
+
+        with NativeWriter(filename, 1000., n_channels=2, metadata={'source': 'test'}) as writer:
+            writer.write_values(values, chunk_length=3000)
+
+        reader = NativeReader(filename)
+        self.assertEqual(reader.shape, (2, 10000))
+        self.assertEqual(reader.metadata, {'source': 'test'})
+        data = np.array(reader)
+        for channel in range(2):
+            for i in range(0, 10000, 3000):
+                chunk = values[channel, i:i + 3000]
+                tolerance = max((chunk.max() - chunk.min()) / 65535. / 2., 1e-15) * 1.0001
+                np.testing.assert_allclose(data[channel, i:i + 3000], chunk, rtol=0, atol=tolerance)
+        reader.close()
+
+    def test_uncompressed(self):
+        filename = os.path.join(self.directory, 'raw.ppd')
+        raw = np.arange(-5000, 5000, dtype=np.int16)
+        with NativeWriter(filename, 1000., compression_level=0, shuffle=False) as writer:
+            writer.write_chunk(raw[:1234], scale=2., offset=1.)
+            writer.write_chunk(raw[1234:], scale=2., offset=1.)
+
+        self.assertEqual(os.path.getsize(filename) > raw.nbytes, True)
+        reader = NativeReader(filename)
+        np.testing.assert_array_equal(np.array(reader[::-1]), raw[::-1] * 2. + 1.)
+        reader.close()
+
+    def test_write_out_of_range_raises(self):
+        """
+        Tests that chunks that the raw integer type can't store exactly raise ValueErrors instead of wrapping around.
+        """
+        filename = os.path.join(self.directory, 'range.ppd')
+        with NativeWriter(filename, 1000.) as writer:
+            self.assertRaises(ValueError, writer.write_chunk, np.array([0, 40000]))
+            self.assertRaises(ValueError, writer.write_chunk, np.array([-40000., 0.]))
+            self.assertRaises(ValueError, writer.write_chunk, np.array([0.5, 1.]))
+            self.assertRaises(ValueError, writer.write_chunk, np.array([np.nan]))
+            writer.write_chunk(np.array([-32768, 32767], dtype=np.int64))
+            writer.write_chunk(np.array([1., 2.]))
+
+        reader = NativeReader(filename, raw=True)
+        np.testing.assert_array_equal(np.array(reader), [-32768, 32767, 1, 2])
+        reader.close()
+
+    def test_stored_statistics(self):
+        filename = os.path.join(self.directory, 'statistics.ppd')
+        with NativeWriter(filename, 1000.) as writer:
+            writer.write_chunk(np.arange(10, dtype=np.int16))
+            writer.statistics = [1., 2., 3., 4.]
+
+        reader = NativeReader(filename, cache=False)
+        self.assertEqual([reader.max(), reader.mean(), reader.min(), reader.std()], [1., 2., 3., 4.])
+        self.assertEqual(reader[2:].max(), 9.)
+        reader.close()
+
+    def test_raw(self):
+        """
+        Tests that raw readers return the stored integers, which scale to the values with the chunks' scales and
+        offsets.
+        """
+        filename = self.default_test_data[0].data
+        reader = NativeReader(filename)
+        raw_reader = NativeReader(filename, raw=True)
+        expected = np.array(reader)
+
+        raw = np.array(raw_reader)
+        self.assertEqual(raw.dtype, raw_reader.raw_dtype)
+        lengths = np.diff(raw_reader.chunk_starts)
+        values = raw * np.repeat(raw_reader.scales[:, 0], lengths) + np.repeat(raw_reader.offsets[:, 0], lengths)
+        np.testing.assert_array_equal(values, expected)
+        np.testing.assert_array_equal(np.array(raw_reader[5:70000:9]), raw[5:70000:9])
+        self.assertEqual(raw_reader.max(), raw.max())
+
+        float32_reader = NativeReader(filename, dtype=np.float32)
+        self.assertEqual(np.array(float32_reader[10:20]).dtype, np.float32)
+        np.testing.assert_allclose(np.array(float32_reader), expected, rtol=1e-6)
+
+        for r in [reader, raw_reader, float32_reader]:
+            r.close()
+
+    def test_slices_share_file(self):
+        """
+        Tests that sliced readers are views sharing the parent's parsed footer and file handle.
+        """
+        reader = NativeReader(tf.get_abs_path('native_2channel_1.3s.ppd'))
+        data = np.array(reader)
+        view = reader
+        for i in range(100):
+            view = view[:, 1:]
+        view = view[1][::3]
+        self.assertTrue(view.footer is reader.footer)
+        self.assertTrue(view.scales is reader.scales)
+        self.assertTrue(view.datafile is reader.datafile)
+        np.testing.assert_array_equal(np.array(view), data[1, 100::3])
+
+        # closing a view leaves the file open for the parent
+        view.close()
+        self.assertFalse(reader.datafile.closed)
+        np.testing.assert_array_equal(np.array(reader[0, :10]), data[0, :10])
+        reader.close()
+        self.assertTrue(reader.datafile.closed)
+
+    def test_incomplete_file_raises(self):
+        """
+        Tests that files that were not closed, or are not native files, raise IOErrors.
+        """
+        filename = os.path.join(self.directory, 'incomplete.ppd')
+        writer = NativeWriter(filename, 1000.)
+        writer.write_chunk(np.arange(10, dtype=np.int16))
+        writer._file.flush()
+        self.assertRaises(IOError, NativeReader, filename)
+        writer.close()
+
+        self.assertRaises(IOError, NativeReader, tf.get_abs_path('chimera_small.log'))
+        self.assertRaises(ValueError, NativeWriter, filename, 1000., compression_level=10)
@@ -0,0 +1,176 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+import pypore
+from pypore.i_o.overview import MinMaxPyramid, open_pyramid, get_pyramid_filename
+import pypore.sampledata.testing_files as tf
+
+
+class TestMinMaxPyramid(unittest.TestCase):
+    def setUp(self):
+        self.data = np.random.RandomState(0).normal(size=10000)
+        # add some single point spikes that decimating would miss
+        self.data[1234] = 50.
+        self.data[7777] = -50.
+        self.pyramid = MinMaxPyramid.build(self.data, base_bin_size=16, factor=4, chunk_size=1000)
+
+    def test_levels(self):
+        """
+        Tests that every level summarizes all of the data, down to a single bin.
+        """
+        self.assertEqual(self.pyramid.length, self.data.size)
+        self.assertEqual(self.pyramid.mins[0].size, 625)
+        self.assertEqual(self.pyramid.mins[-1].size, 1)
+        for level in range(self.pyramid.n_levels):
+            self.assertEqual(self.pyramid.mins[level].min(), self.data.min())
+            self.assertEqual(self.pyramid.maxs[level].max(), self.data.max())
+        self.assertAlmostEqual(self.pyramid.means[-1][0], self.data.mean())
+
+    def test_partial_bins(self):
+        """
+        Tests that data that does not fill the last bin is still summarized.
+        """
+        data = np.arange(100.)
+        pyramid = MinMaxPyramid.build(data, base_bin_size=16, factor=2, chunk_size=7)
+
+        self.assertEqual(pyramid.mins[0].size, 7)
+        self.assertEqual(pyramid.mins[0][-1], 96.)
+        self.assertEqual(pyramid.maxs[-1][0], 99.)
+        self.assertAlmostEqual(pyramid.means[-1][0], data.mean())
+
+    def test_query_envelopes(self):
+        """
+        Tests that the envelopes of a query contain every point of the window. Pixel edges are rounded to bin edges,
+        so the envelopes can include a few points outside of the window.
+        """
+        for start, stop, n_pixels in [(0, 10000, 800), (1000, 8000, 100), (1200, 1300, 7), (-500, None, 3)]:
+            data = self.data[start:stop]
+            for segment in [None, self.data]:
+                mins, maxs, means = self.pyramid.query(start, stop, n_pixels, segment)
+
+                self.assertTrue(0 < mins.size <= n_pixels)
+                self.assertTrue(mins.min() <= data.min())
+                self.assertTrue(maxs.max() >= data.max())
+                self.assertTrue(np.all(mins <= means) and np.all(means <= maxs))
+
+    def test_query_keeps_spikes(self):
+        """
+        Tests that single point spikes show up at any resolution.
+        """
+        for n_pixels in [1, 10, 100, 1000]:
+            mins, maxs, means = self.pyramid.query(0, 10000, n_pixels)
+            self.assertEqual(maxs.max(), 50.)
+            self.assertEqual(mins.min(), -50.)
+
+    def test_query_from_segment(self):
+        """
+        Tests that small windows are read from the segment.
+        """
+        mins, maxs, means = self.pyramid.query(100, 110, 100, self.data)
+        np.testing.assert_array_equal(mins, self.data[100:110])
+
+        mins, maxs, means = self.pyramid.query(100, 130, 10, self.data)
+        np.testing.assert_array_equal(mins, self.data[100:130].reshape(10, 3).min(axis=1))
+        np.testing.assert_array_almost_equal(means, self.data[100:130].reshape(10, 3).mean(axis=1))
+
+        self.assertEqual(self.pyramid.query(100, 100, 10)[0].size, 0)
+
+
+class TestOpenPyramid(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        for name in ['spheres_20140114_154938_beginning.log', 'spheres_20140114_154938_beginning.mat']:
+            shutil.copy(tf.get_abs_path(name), self.directory)
+        self.filename = os.path.join(self.directory, 'spheres_20140114_154938_beginning.log')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_sidecar(self):
+        """
+        Tests that the pyramid is saved next to the file, loaded from there, and rebuilt when the file changes.
+        """
+        reader = pypore.open_file(self.filename)
+        pyramid = open_pyramid(reader, base_bin_size=64)
+        sidecar = get_pyramid_filename(self.filename)
+
+        self.assertTrue(os.path.exists(sidecar))
+        self.assertAlmostEqual(pyramid.sample_rate, reader.sample_rate)
+
+        loaded = open_pyramid(reader)
+        self.assertEqual(loaded.base_bin_size, 64)
+        self.assertEqual(loaded.n_levels, pyramid.n_levels)
+        for level in range(pyramid.n_levels):
+            np.testing.assert_array_equal(loaded.mins[level], pyramid.mins[level])
+            np.testing.assert_array_equal(loaded.maxs[level], pyramid.maxs[level])
+
+        mins, maxs, means = loaded.query(0, len(reader), 800, reader)
+        self.assertEqual(mins.min(), reader.min())
+        self.assertEqual(maxs.max(), reader.max())
+        reader.close()
+
+        # change the file, so the pyramid is out of date
+        stat = os.stat(self.filename)
+        os.utime(self.filename, (stat.st_atime, stat.st_mtime + 10))
+        self.assertRaises(IOError, MinMaxPyramid.load, sidecar, self.filename)
+
+    def test_partial_reader_not_saved(self):
+        """
+        Tests that the pyramid of a slice of the file is not saved as, or loaded from, the file's sidecar file.
+        """
+        reader = pypore.open_file(self.filename)
+        sidecar = get_pyramid_filename(self.filename)
+
+        pyramid = open_pyramid(reader[0:1000])
+        self.assertEqual(pyramid.length, 1000)
+        self.assertFalse(os.path.exists(sidecar))
+
+        pyramid = open_pyramid(reader)
+        self.assertEqual(pyramid.length, len(reader))
+        self.assertTrue(os.path.exists(sidecar))
+
+        pyramid = open_pyramid(reader[0:1000])
+        self.assertEqual(pyramid.length, 1000)
+        self.assertEqual(open_pyramid(reader[:]).length, len(reader))
+        reader.close()
+
+    def test_dtype_not_shared(self):
+        """
+        Tests that readers of raw integers, or of another dtype, do not get each other's pyramids.
+        """
+        sidecar = get_pyramid_filename(self.filename)
+        raw_reader = pypore.open_file(self.filename, raw=True)
+        reader = pypore.open_file(self.filename)
+        float64_reader = pypore.open_file(self.filename, dtype=np.float64)
+
+        self.assertEqual(open_pyramid(raw_reader).maxs[-1][0], raw_reader.max())
+        pyramid = open_pyramid(reader)
+        self.assertEqual(pyramid.maxs[-1][0], reader.max())
+        self.assertEqual(pyramid.mins[0].dtype, reader.dtype)
+        self.assertEqual(MinMaxPyramid.load(sidecar, self.filename, reader.dtype).maxs[-1][0], reader.max())
+        self.assertRaises(IOError, MinMaxPyramid.load, sidecar, self.filename, raw_reader.dtype)
+
+        pyramid = open_pyramid(float64_reader)
+        self.assertEqual(pyramid.mins[0].dtype, np.float64)
+        self.assertAlmostEqual(pyramid.maxs[-1][0], float64_reader.max())
+
+        for r in [raw_reader, reader, float64_reader]:
+            r.close()
+
+    def test_unwritable_sidecar(self):
+        """
+        Tests that the pyramid is still returned when its sidecar file cannot be written.
+        """
+        # a directory in the way of the sidecar file makes writing it fail, even for root
+        os.mkdir(get_pyramid_filename(self.filename))
+        reader = pypore.open_file(self.filename)
+
+        pyramid = open_pyramid(reader)
+
+        self.assertEqual(pyramid.length, len(reader))
+        self.assertEqual(pyramid.maxs[-1][0], reader.max())
+        reader.close()
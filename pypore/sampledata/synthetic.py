@@ -0,0 +1,236 @@
+"""
+Generators of synthetic data files of any size, for load testing and benchmarks on machines without real data.
+
+Files are written in streaming fashion, one chunk at a time, so memory use does not depend on the file size. The noise
+is seeded, so the same arguments always write the same file. Events with known positions can be injected, to check
+event detection against.
+
+Example usage:
+
+>>> import os, tempfile
+>>> import pypore
+>>> from pypore.sampledata.synthetic import make_events, write_chimera_file
+>>> filename = os.path.join(tempfile.mkdtemp(), 'synthetic.log')
+>>> events = make_events(10 ** 6, n_events=20, amplitude=-2e-9)
+>>> events = write_chimera_file(filename, 10 ** 6, events=events)
+>>> reader = pypore.open_file(filename)
+>>> len(reader)
+1000000
+"""
+import os
+
+import numpy as np
+
+# Record format of injected events.
+#   start - index of the first point of the event
+#   stop - index of the first point after the event
+#   amplitude - change of the current from the baseline during the event
+SYNTHETIC_EVENT_DTYPE = np.dtype([('start', np.int64), ('stop', np.int64), ('amplitude', np.float64)])
+
+# Number of points generated at a time.
+DEFAULT_CHUNK_SIZE = 2 ** 20
+
+# Heka parameter lists, as (name, type code) pairs. See :py:data:`pypore.i_o.heka_reader.HEKA_ENCODINGS`.
+HEKA_PER_FILE_PARAMS = [('Start time', 2), ('Sampling interval', 7), ('Points per block', 2)]
+HEKA_PER_BLOCK_PARAMS = [('Delta t from last block', 7), ('Enclosure open', 0), ('Comment', 9)]
+HEKA_PER_CHANNEL_PARAMS = [('Voltage', 7), ('Gain', 7), ('Scale', 7), ('Filter used', 0), ('Filter bandwidth', 2)]
+
+
+def make_events(n_points, n_events, min_length=100, max_length=1000, amplitude=-1e-9, seed=0):
+    """
+    Makes non-overlapping events at random positions.
+
+    :param n_points: Number of points in the data.
+    :param n_events: Number of events.
+    :param min_length: (Optional) Minimum number of points in an event. Default is 100.
+    :param max_length: (Optional) Maximum number of points in an event. Default is 1000.
+    :param amplitude: (Optional) Change of the current during the events. Default is -1 nA.
+    :param seed: (Optional) Seed of the random positions and lengths. Default is 0.
+    :return: Numpy record array of :py:data:`SYNTHETIC_EVENT_DTYPE`, sorted by start.
+    """
+    if n_events == 0:
+        return np.zeros(0, dtype=SYNTHETIC_EVENT_DTYPE).view(np.recarray)
+    slot_length = n_points // n_events
+    # leave at least min_length of baseline between events
+    if slot_length < 2 * min_length or max_length < min_length:
+        raise ValueError("{0} events of at least {1} points do not fit in {2} points.".format(n_events, min_length,
+                                                                                              n_points))
+    max_length = min(max_length, slot_length - min_length)
+
+    random = np.random.RandomState(seed)
+    events = np.zeros(n_events, dtype=SYNTHETIC_EVENT_DTYPE).view(np.recarray)
+    lengths = random.randint(min_length, max_length + 1, n_events)
+    events.start = np.arange(n_events) * slot_length + min_length + random.randint(0, slot_length - lengths -
+                                                                                   min_length + 1)
+    events.stop = events.start + lengths
+    events.amplitude = amplitude
+    return events
+
+
+def _iter_current(n_points, baseline, noise, events, chunk_size, random):
+    """
+    Generates the current one chunk at a time.
+
+    :return: Generator of 1D float64 arrays.
+    """
+    for i in range(0, n_points, chunk_size):
+        j = min(i + chunk_size, n_points)
+        chunk = random.normal(baseline, noise, j - i) if noise > 0 else np.empty(j - i)
+        if noise <= 0:
+            chunk.fill(baseline)
+        if events is not None and len(events) > 0:
+            first = np.searchsorted(events['stop'], i, side='right')
+            last = np.searchsorted(events['start'], j)
+            for event in events[first:last]:
+                chunk[max(event['start'], i) - i:min(event['stop'], j) - i] += event['amplitude']
+        yield chunk
+
+
+def write_chimera_file(filename, n_points, sample_rate=6250000., baseline=7.5e-9, noise=1e-10, events=None,
+                       adc_bits=14, adc_v_ref=2.5, current_offset=2.34123e-10, tia_gain=1e8, pre_adc_gain=0.626,
+                       chunk_size=DEFAULT_CHUNK_SIZE, seed=0):
+    """
+    Writes a Chimera .log file, and its .mat specs file next to it.
+
+    :param filename: Filename of the .log file.
+    :param n_points: Number of points.
+    :param sample_rate: (Optional) Sampling rate, in Hz. Default is 6.25 MHz.
+    :param baseline: (Optional) Baseline current, in A. Default is 7.5 nA.
+    :param noise: (Optional) Standard deviation of the white noise, in A. Default is 100 pA.
+    :param events: (Optional) Events to inject, see :py:func:`make_events`.
+    :param adc_bits: (Optional) ADC parameters saved in the .mat file. The current is quantized accordingly.
+    :param chunk_size: (Optional) Number of points generated at a time. Default is :py:data:`DEFAULT_CHUNK_SIZE`.
+    :param seed: (Optional) Seed of the noise. Default is 0.
+    :return: The injected events, or an empty record array.
+    """
+    import scipy.io as sio
+    from pypore.i_o.chimera_reader import CHIMERA_DATA_TYPE, get_bit_mask, get_scaling
+
+    if not filename.endswith('.log'):
+        raise ValueError("Chimera filenames must end in .log, was {0}.".format(filename))
+    sio.savemat(filename[:-len('log')] + 'mat',
+                {'SETUP_ADCBITS': np.uint8(adc_bits), 'SETUP_ADCVREF': float(adc_v_ref),
+                 'SETUP_pAoffset': float(current_offset), 'SETUP_TIAgain': np.int32(tia_gain),
+                 'SETUP_preADCgain': float(pre_adc_gain), 'SETUP_ADCSAMPLERATE': np.int32(sample_rate)})
+
+    bit_mask = get_bit_mask(adc_bits)
+    scale_multiplication, scale_addition = get_scaling(adc_v_ref, current_offset, tia_gain, pre_adc_gain)
+    if events is None:
+        events = make_events(n_points, 0)
+
+    with open(filename, 'wb') as f:
+        for current in _iter_current(n_points, baseline, noise, events, chunk_size, np.random.RandomState(seed)):
+            raw = np.rint((current - scale_addition) / scale_multiplication)
+            np.clip(raw, 0, 2 ** 16 - 1, out=raw)
+            (raw.astype(CHIMERA_DATA_TYPE) & bit_mask).tofile(f)
+    return events
+
+
+def _write_heka_param_list(f, param_list, name_length):
+    """
+    Writes a Heka parameter list header: the number of parameters, then the type code and name of each.
+    """
+    np.array([len(param_list)], dtype='>u4').tofile(f)
+    for name, code in param_list:
+        np.array([code], dtype='>u1').tofile(f)
+        f.write(name.encode('utf-8').ljust(name_length))
+
+
+def write_heka_file(filename, n_points, n_channels=1, points_per_block=5000, sample_rate=50000., baseline=5.3e-12,
+                    noise=2.8e-12, events=None, scale=None, chunk_size=DEFAULT_CHUNK_SIZE, seed=0):
+    """
+    Writes a Heka .hkd file.
+
+    Heka files only hold whole blocks, so n_points is rounded up to a multiple of points_per_block.
+
+    :param filename: Filename of the .hkd file.
+    :param n_points: Number of points per channel.
+    :param n_channels: (Optional) Number of channels. Default is 1.
+    :param points_per_block: (Optional) Number of points per channel in each block. Default is 5000.
+    :param sample_rate: (Optional) Sampling rate, in Hz. Default is 50 kHz.
+    :param baseline: (Optional) Baseline current of every channel, in A. Default is 5.3 pA.
+    :param noise: (Optional) Standard deviation of the white noise, in A. Default is 2.8 pA.
+    :param events: (Optional) Events to inject into every channel, see :py:func:`make_events`.
+    :param scale: (Optional) Current per raw unit. Default fits the baseline, 8 noise standard deviations, and the
+                  events in the int16 range.
+    :param chunk_size: (Optional) Approximate number of points per channel generated at a time. Default is
+                       :py:data:`DEFAULT_CHUNK_SIZE`.
+    :param seed: (Optional) Seed of the noise. Default is 0.
+    :return: The injected events, or an empty record array.
+    """
+    from pypore.i_o.heka_reader import HEKA_DATATYPE, HEKA_ENCODINGS, _get_block_dtype
+
+    if events is None:
+        events = make_events(n_points, 0)
+    if scale is None:
+        largest_amplitude = np.abs(events['amplitude']).max() if len(events) > 0 else 0.
+        scale = (abs(baseline) + 8 * noise + largest_amplitude) / (2 ** 15 - 1)
+
+    def to_param_list(params):
+        return [[name, HEKA_ENCODINGS[code]] for name, code in params]
+
+    block_dtype = _get_block_dtype(to_param_list(HEKA_PER_BLOCK_PARAMS), to_param_list(HEKA_PER_CHANNEL_PARAMS),
+                                   n_channels, points_per_block)
+    n_blocks = -(-n_points // points_per_block)
+    chunk_blocks = max(1, chunk_size // points_per_block)
+    info = np.iinfo(HEKA_DATATYPE)
+
+    with open(filename, 'wb') as f:
+        f.write(b'Nanopore Experiment Data File V2.0\r\n')
+        f.write(b'Synthetic data written by pypore.sampledata.synthetic.\r\n')
+        f.write(b'End of file format\r\n')
+        _write_heka_param_list(f, HEKA_PER_FILE_PARAMS, 64)
+        _write_heka_param_list(f, HEKA_PER_BLOCK_PARAMS, 64)
+        _write_heka_param_list(f, HEKA_PER_CHANNEL_PARAMS, 64)
+        _write_heka_param_list(f, [('Channel {0} Current'.format(i), 0) for i in range(n_channels)], 512)
+        np.array([0], dtype='>u4').tofile(f)
+        np.array([1. / sample_rate], dtype='>f8').tofile(f)
+        np.array([points_per_block], dtype='>u4').tofile(f)
+
+        # each channel gets its own noise
+        channel_currents = [_iter_current(n_blocks * points_per_block, baseline, noise, events,
+                                          chunk_blocks * points_per_block, np.random.RandomState(seed + channel))
+                            for channel in range(n_channels)]
+        for i in range(0, n_blocks, chunk_blocks):
+            blocks = np.zeros(min(chunk_blocks, n_blocks - i), dtype=block_dtype)
+            blocks['block_params']['Delta t from last block'] = points_per_block / sample_rate
+            blocks['block_params']['Comment'] = b' ' * 512
+            blocks['channel_params']['Gain'] = 1e-9
+            blocks['channel_params']['Scale'] = scale
+            for channel, currents in enumerate(channel_currents):
+                raw = np.rint(next(currents) / scale)
+                np.clip(raw, info.min, info.max, out=raw)
+                blocks['data'][:, channel, :] = raw.reshape(len(blocks), points_per_block)
+            blocks.tofile(f)
+    return events
+
+
+def get_n_points(size_bytes, file_format='chimera', n_channels=1):
+    """
+    :param size_bytes: Approximate file size, in bytes.
+    :param file_format: (Optional) 'chimera' (default) or 'heka'.
+    :param n_channels: (Optional) Number of channels of a Heka file. Default is 1.
+    :return: Number of points per channel of a file of about size_bytes.
+    """
+    if file_format == 'chimera':
+        return max(1, size_bytes // 2)
+    elif file_format == 'heka':
+        return max(1, size_bytes // (2 * n_channels))
+    raise ValueError("Unknown file format {0}.".format(file_format))
+
+
+def write_file(filename, n_points, **kwargs):
+    """
+    Writes a Chimera or Heka file, chosen by the filename's extension.
+
+    :param filename: Filename ending in .log or .hkd.
+    :param n_points: Number of points per channel.
+    :param kwargs: Passed to :py:func:`write_chimera_file` or :py:func:`write_heka_file`.
+    :return: The injected events.
+    """
+    extension = os.path.splitext(filename)[1]
+    if extension == '.log':
+        return write_chimera_file(filename, n_points, **kwargs)
+    elif extension == '.hkd':
+        return write_heka_file(filename, n_points, **kwargs)
+    raise ValueError("No synthetic writer for the file extension '{0}'.".format(extension))
@@ -0,0 +1,88 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from pypore.i_o.chimera_reader import ChimeraReader
+from pypore.i_o.heka_reader import HekaReader
+from pypore.extractors.threshold_detector import ThresholdDetector
+from pypore.sampledata.synthetic import make_events, write_chimera_file, write_file, write_heka_file
+
+
+class TestSynthetic(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_make_events(self):
+        events = make_events(100000, 50, min_length=10, max_length=500, amplitude=-2.)
+
+        self.assertEqual(len(events), 50)
+        self.assertTrue(np.all(events.stop - events.start >= 10))
+        self.assertTrue(np.all(events.stop - events.start <= 500))
+        self.assertTrue(np.all(events.start[1:] - events.stop[:-1] >= 10), "Events should not overlap.")
+        self.assertTrue(events.start[0] >= 10 and events.stop[-1] <= 100000)
+        np.testing.assert_array_equal(events, make_events(100000, 50, min_length=10, max_length=500, amplitude=-2.))
+
+        self.assertRaises(ValueError, make_events, 100, 10, min_length=10)
+
+    def test_chimera_file(self):
+        filename = os.path.join(self.directory, 'synthetic.log')
+        events = make_events(200000, 10, amplitude=-2e-9)
+        write_chimera_file(filename, 200000, events=events, chunk_size=7777)
+
+        reader = ChimeraReader(filename, cache=False)
+        self.assertEqual(len(reader), 200000)
+        self.assertEqual(reader.sample_rate, 6250000.)
+
+        data = np.array(reader)
+        in_event = np.zeros(data.size, dtype=bool)
+        for event in events:
+            in_event[event.start:event.stop] = True
+        self.assertAlmostEqual(data[~in_event].mean(), 7.5e-9, delta=0.01e-9)
+        self.assertAlmostEqual(data[~in_event].std(), 1e-10, delta=0.05e-10)
+        self.assertAlmostEqual(data[in_event].mean(), 5.5e-9, delta=0.01e-9)
+        reader.close()
+
+    def test_heka_file(self):
+        """
+        Tests that multi-channel Heka files hold whole blocks with independent noise in each channel.
+        """
+        filename = os.path.join(self.directory, 'synthetic.hkd')
+        write_heka_file(filename, 12345, n_channels=3, points_per_block=1000, chunk_size=2500)
+
+        reader = HekaReader(filename, cache=False)
+        self.assertEqual(reader.shape, (3, 13000))
+        self.assertAlmostEqual(reader.sample_rate, 50000.)
+
+        data = np.array(reader)
+        np.testing.assert_allclose(data.mean(axis=1), 5.3e-12, atol=0.1e-12)
+        np.testing.assert_allclose(data.std(axis=1), 2.8e-12, rtol=0.05)
+        self.assertFalse(np.array_equal(data[0], data[1]))
+        reader.close()
+
+    def test_reproducible(self):
+        filenames = [os.path.join(self.directory, name) for name in ['a.hkd', 'b.hkd']]
+        for filename in filenames:
+            write_file(filename, 5000, seed=3)
+        with open(filenames[0], 'rb') as a, open(filenames[1], 'rb') as b:
+            self.assertEqual(a.read(), b.read())
+
+        self.assertRaises(ValueError, write_file, os.path.join(self.directory, 'c.txt'), 10)
+
+    def test_injected_events_detected(self):
+        filename = os.path.join(self.directory, 'events.log')
+        events = make_events(500000, 25, min_length=200, max_length=2000, amplitude=-2e-9)
+        write_chimera_file(filename, 500000, events=events)
+
+        reader = ChimeraReader(filename, cache=False)
+        found = ThresholdDetector(threshold=6.).find_events(reader)
+        reader.close()
+
+        self.assertEqual(len(found), len(events))
+        np.testing.assert_allclose(found.start, events.start, atol=3)
+        np.testing.assert_allclose(found.stop, events.stop, atol=3)
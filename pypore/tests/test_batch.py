@@ -0,0 +1,89 @@
+import os
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from pypore.batch import batch_analyze, find_files, analyze_file, DEFAULT_EXTENSIONS
+from pypore.core import MetaSegment
+from pypore.extractors.threshold_detector import ThresholdDetector
+import pypore.sampledata.testing_files as tf
+
+
+class _CountingExecutor(ThreadPoolExecutor):
+    """
+    Executor that records the largest number of tasks submitted but not yet finished.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(_CountingExecutor, self).__init__(*args, **kwargs)
+        self.futures = []
+        self.max_in_flight = 0
+
+    def submit(self, *args, **kwargs):
+        in_flight = sum(1 for f in self.futures if not f.done()) + 1
+        self.max_in_flight = max(self.max_in_flight, in_flight)
+        future = super(_CountingExecutor, self).submit(*args, **kwargs)
+        self.futures.append(future)
+        return future
+
+
+class TestBatch(unittest.TestCase):
+    def test_find_files(self):
+        """
+        Tests that directories, glob patterns, and lists of paths are expanded to the supported data files.
+        """
+        data_files = [f for f in tf.get_all_file_names() if os.path.splitext(f)[1] in DEFAULT_EXTENSIONS]
+
+        self.assertEqual(data_files, find_files(tf.TEST_DATA_FOLDER_PATH))
+        self.assertEqual([f for f in data_files if f.endswith('.hkd')],
+                         find_files(os.path.join(tf.TEST_DATA_FOLDER_PATH, '*.hkd')))
+
+        filename = tf.get_abs_path('chimera_1event.log')
+        self.assertEqual([filename], find_files([filename, filename, tf.get_abs_path('chimera_1event.mat')]))
+
+    def test_analyze_file(self):
+        """
+        Tests that analyzing a file gives its statistics and events.
+        """
+        result = analyze_file(tf.get_abs_path('chimera_1event.log'), ThresholdDetector())
+
+        self.assertTrue(result.error is None)
+        self.assertTrue(isinstance(result.metadata, MetaSegment))
+        self.assertEqual(result.metadata.size, 5000)
+        self.assertEqual([(2000, 3000)], result.events[['start', 'stop']].tolist())
+
+    def test_analyze_file_error(self):
+        """
+        Tests that errors opening a file are returned in the result instead of raised.
+        """
+        result = analyze_file(tf.get_abs_path('heka_incomplete.hkd'))
+
+        self.assertTrue(result.metadata is None)
+        self.assertTrue('incomplete' in result.error)
+
+    def test_batch_analyze(self):
+        """
+        Tests that every file is analyzed, without more than max_open_files analyses in flight at once.
+        """
+        data_files = find_files(tf.TEST_DATA_FOLDER_PATH)
+
+        executor = _CountingExecutor(max_workers=4)
+        results = list(batch_analyze(tf.TEST_DATA_FOLDER_PATH, ThresholdDetector(), max_open_files=2,
+                                     executor=executor))
+        executor.shutdown()
+
+        self.assertEqual(sorted(data_files), sorted(r.filename for r in results))
+        self.assertTrue(executor.max_in_flight <= 2)
+
+        errors = sorted(os.path.basename(r.filename) for r in results if r.error is not None)
+        self.assertEqual(['chimera_empty.log', 'heka_incomplete.hkd'], errors)
+
+    def test_batch_analyze_process_pool(self):
+        """
+        Tests batch analysis with the default process pool.
+        """
+        filename = tf.get_abs_path('chimera_1event.log')
+        results = list(batch_analyze(filename, n_workers=2))
+
+        self.assertEqual(1, len(results))
+        self.assertEqual(filename, results[0].filename)
+        self.assertTrue(results[0].events is None)
@@ -2,6 +2,7 @@ import unittest
 
 from pypore.core import Segment
 from pypore.core import MetaSegment
+from pypore.core import ScaledSegment
 from pypore.tests.segment_tests import *
 
 
@@ -150,3 +151,87 @@ class TestSegment(unittest.TestCase, SegmentTests):
 
         self.assertEqual(sample_rate, s2.sample_rate, "Segment's sample_rate incorrect. Should be {0}. Was {"
                                                       "1}".format(sample_rate, s2.sample_rate))
+
+
+class TestLazySegments(unittest.TestCase):
+    """
+    Tests for the lazy transforms of :py:class:`pypore.core.Segment`.
+    """
+
+    def setUp(self):
+        random = np.random.RandomState(0)
+        self.data = random.normal(size=10000) + np.linspace(3., 5., 10000)
+        self.segment = Segment(self.data, sample_rate=1000.)
+
+    def test_scale(self):
+        scaled = self.segment.scale(2., 1.)
+
+        self.assertEqual(scaled.shape, self.data.shape)
+        np.testing.assert_allclose(np.array(scaled), self.data * 2. + 1.)
+        np.testing.assert_allclose(np.array(scaled[10:500:3]), self.data[10:500:3] * 2. + 1.)
+        self.assertAlmostEqual(scaled[7], self.data[7] * 2. + 1.)
+        self.assertAlmostEqual(scaled.mean(), (self.data * 2. + 1.).mean())
+        self.assertAlmostEqual(scaled.std(), (self.data * 2. + 1.).std())
+
+    def test_scales_fused(self):
+        """
+        Tests that chained scales are combined into one over the original data.
+        """
+        scaled = self.segment.scale(2., 1.)[100:].scale(3., -4.)
+
+        self.assertIsInstance(scaled, ScaledSegment)
+        self.assertNotIsInstance(scaled.segment, ScaledSegment)
+        np.testing.assert_allclose(np.array(scaled), (self.data[100:] * 2. + 1.) * 3. - 4.)
+
+    def test_detrend(self):
+        detrended = self.segment.detrend()
+        fit = np.polyfit(np.arange(self.data.size), self.data, 1)
+        expected = self.data - np.polyval(fit, np.arange(self.data.size))
+
+        np.testing.assert_allclose(np.array(detrended), expected, atol=1e-10)
+        np.testing.assert_allclose(np.array(detrended[50:5000:7]), expected[50:5000:7], atol=1e-10)
+        np.testing.assert_allclose(np.array(detrended[50:5000][::7][3:]), expected[50:5000][::7][3:], atol=1e-10)
+        self.assertAlmostEqual(detrended[-3], expected[-3])
+        self.assertAlmostEqual(detrended.mean(), 0.)
+
+        constant = self.segment.detrend('constant')
+        np.testing.assert_allclose(np.array(constant), self.data - self.data.mean())
+        self.assertRaises(ValueError, self.segment.detrend, 'quadratic')
+
+    def test_decimate(self):
+        decimated = self.segment.decimate(4)
+
+        np.testing.assert_array_equal(np.array(decimated), self.data[::4])
+        self.assertEqual(decimated.sample_rate, 250.)
+        self.assertRaises(ValueError, self.segment.decimate, 0)
+
+    def test_filter_sample_rate(self):
+        """
+        Tests that the sample rate passed to filter is kept by slices of the filtered segment.
+        """
+        filtered = Segment(self.data).filter(50., sample_rate=1000.)
+
+        self.assertEqual(filtered.sample_rate, 1000.)
+        self.assertEqual(filtered[10:].sample_rate, 1000.)
+        self.assertEqual(filtered[::4].sample_rate, 250.)
+        self.assertEqual(filtered[::2][::2].sample_rate, 250.)
+        self.assertEqual(filtered.decimate(5).sample_rate, 200.)
+
+    def test_pipeline(self):
+        """
+        Tests that a chain of transforms evaluated chunk by chunk matches applying them to the whole array.
+        """
+        import scipy.signal
+        from pypore.filters import design_filter
+
+        pipeline = self.segment.scale(1e-9).filter(50., zero_phase=True).decimate(5).detrend('constant')
+
+        sos = design_filter('bessel', 4, 50., 1000.)
+        expected = scipy.signal.sosfiltfilt(sos, self.data * 1e-9)[::5]
+        expected -= expected.mean()
+
+        self.assertEqual(len(pipeline), expected.size)
+        self.assertEqual(pipeline.sample_rate, 200.)
+        np.testing.assert_allclose(np.array(pipeline), expected, atol=1e-18)
+        np.testing.assert_allclose(np.concatenate(list(pipeline.iter_chunks(333))), expected, atol=1e-18)
+        self.assertAlmostEqual(pipeline.std() * 1e9, expected.std() * 1e9)
@@ -0,0 +1,91 @@
+import unittest
+
+import numpy as np
+import scipy.signal
+
+from pypore.core import Segment
+from pypore.filters import FilteredSegment, bessel_filter, butterworth_filter, design_filter, get_settling_length
+
+
+class TestFilteredSegment(unittest.TestCase):
+    def setUp(self):
+        random = np.random.RandomState(0)
+        self.data = random.normal(size=20000)
+        self.data[5000:6000] -= 10.
+        self.segment = Segment(self.data, sample_rate=100e3)
+        self.sos = design_filter('bessel', 4, 5e3, 100e3)
+
+    def test_causal_matches_whole(self):
+        """
+        Tests that filtering chunk by chunk with carried state matches filtering the whole array at once.
+        """
+        expected, _ = scipy.signal.sosfilt(self.sos, self.data, zi=scipy.signal.sosfilt_zi(self.sos) * self.data[0])
+        filtered = FilteredSegment(self.segment, self.sos)
+
+        for size in [1, 333, 20000]:
+            np.testing.assert_allclose(np.concatenate(list(filtered.iter_chunks(size))), expected)
+        np.testing.assert_allclose(np.array(filtered), expected)
+
+    def test_zero_phase_matches_whole(self):
+        """
+        Tests that filtering overlapping blocks forward and backward matches sosfiltfilt of the whole array.
+        """
+        expected = scipy.signal.sosfiltfilt(self.sos, self.data)
+        filtered = FilteredSegment(self.segment, self.sos, zero_phase=True)
+
+        for size in [1000, 7777]:
+            np.testing.assert_allclose(np.concatenate(list(filtered.iter_chunks(size))), expected, atol=1e-8)
+
+    def test_slicing(self):
+        """
+        Tests that slices and single points are filtered the same as the whole segment.
+        """
+        for zero_phase in [False, True]:
+            filtered = FilteredSegment(self.segment, self.sos, zero_phase)
+            expected = np.array(filtered)
+
+            for item in [slice(None, None, 3), slice(4000, 9000, 7), slice(-100, None), slice(100, 50)]:
+                part = filtered[item]
+                self.assertIsInstance(part, Segment)
+                self.assertEqual(len(part), expected[item].size)
+                np.testing.assert_allclose(np.array(part), expected[item], atol=1e-8)
+            np.testing.assert_allclose(np.array(filtered[1000:9000][::2][10:20]), expected[1000:9000][::2][10:20],
+                                       atol=1e-8)
+
+            self.assertAlmostEqual(filtered[5500], expected[5500])
+            self.assertAlmostEqual(filtered[-1], expected[-1])
+            self.assertRaises(IndexError, filtered.__getitem__, 20000)
+
+        self.assertEqual(filtered[::4].sample_rate, 25e3)
+
+    def test_statistics(self):
+        filtered = bessel_filter(self.segment, 5e3)
+        expected = np.array(filtered)
+
+        self.assertAlmostEqual(filtered.mean(), expected.mean())
+        self.assertAlmostEqual(filtered.std(), expected.std())
+        self.assertEqual(filtered.max(), expected.max())
+        self.assertEqual(filtered.min(), expected.min())
+
+    def test_filters_noise(self):
+        filtered = butterworth_filter(self.segment, 5e3, zero_phase=True)
+
+        self.assertLess(np.array(filtered[:5000]).std(), 0.5)
+        self.assertAlmostEqual(np.array(filtered[5200:5800]).mean(), -10., delta=0.1)
+
+    def test_design_filter_checks(self):
+        self.assertRaises(ValueError, design_filter, 'bessel', 4, 60e3, 100e3)
+        self.assertRaises(ValueError, design_filter, 'bessel', 4, 1e3, 0.0)
+        self.assertRaises(ValueError, design_filter, 'chebyshev', 4, 1e3, 100e3)
+        self.assertRaises(ValueError, FilteredSegment, np.zeros((2, 10)), self.sos)
+
+    def test_settling_length(self):
+        """
+        Tests that the impulse response has decayed after the settling length.
+        """
+        length = get_settling_length(self.sos)
+        impulse = np.zeros(length + 100)
+        impulse[0] = 1.
+        response = scipy.signal.sosfilt(self.sos, impulse)
+
+        self.assertLess(np.abs(response[length:]).max(), 1e-9)
@@ -4,6 +4,7 @@ import pypore.sampledata.testing_files as tf
 import pypore
 from pypore.i_o.chimera_reader import ChimeraReader
 from pypore.i_o.heka_reader import HekaReader
+from pypore.i_o.native_reader import NativeReader
 
 
 class TestInit(unittest.TestCase):
@@ -23,6 +24,12 @@ class TestInit(unittest.TestCase):
         self.assertTrue(isinstance(f, HekaReader))
         f.close()
 
+        # Native file
+        filename = tf.get_abs_path('native_1.5s_mean5.32p_std2.76p.ppd')
+        f = pypore.open_file(filename)
+        self.assertTrue(isinstance(f, NativeReader))
+        f.close()
+
     def test_opening_bad_extension_raises(self):
         """
         Tests that opening a file based on extension when a reader doesn't exist for that extension will result in a
@@ -52,3 +59,14 @@ class TestInit(unittest.TestCase):
         # Heka files should produce an error when being ready by ChimeraReader.
         self.assertRaises(IOError, pypore.open_file, filename, ChimeraReader)
 
+    def test_open_file_raw(self):
+        """
+        Tests that reader arguments, like raw, are passed to the reader.
+        """
+        for name, raw_dtype in [('spheres_20140114_154938_beginning.log', 'uint16'),
+                                ('heka_1.5s_mean5.32p_std2.76p.hkd', '>i2'),
+                                ('native_1.5s_mean5.32p_std2.76p.ppd', 'int16')]:
+            f = pypore.open_file(tf.get_abs_path(name), raw=True)
+            self.assertTrue(f.raw)
+            self.assertEqual(f[0:10].dtype, raw_dtype)
+            f.close()
@@ -305,4 +305,50 @@ class TestGetSliceLength(unittest.TestCase):
 
         s = slice(10, -10, 3)
         l = get_slice_length(len(x), s)
-        self.assertEqual(l, len(x[s]))
\ No newline at end of file
+        self.assertEqual(l, len(x[s]))
+
+
+class TestRunningStatistics(unittest.TestCase):
+    def test_chunked_matches_numpy(self):
+        """
+        Tests that statistics accumulated in chunks match numpy's statistics of the whole array.
+        """
+        data = np.random.random(1000) * 1.e-9 + 5.e-9
+
+        for chunk_size in [1, 3, 100, 1000, 5000]:
+            stats = RunningStatistics()
+            for i in range(0, data.size, chunk_size):
+                stats.update(data[i:i + chunk_size])
+
+            self.assertEqual(stats.count, data.size)
+            self.assertEqual(stats.max(), data.max())
+            self.assertEqual(stats.min(), data.min())
+            self.assertAlmostEqual(stats.mean() / data.mean(), 1.0, places=12)
+            self.assertAlmostEqual(stats.std() / data.std(), 1.0, places=10)
+
+    def test_merge(self):
+        """
+        Tests that merging statistics of two halves gives the statistics of the whole.
+        """
+        data = np.random.random((2, 500))
+        first = RunningStatistics()
+        first.update(data[:, :123])
+        second = RunningStatistics()
+        second.update(data[:, 123:])
+        first.merge(second)
+        first.merge(RunningStatistics())
+
+        self.assertEqual(first.count, data.size)
+        self.assertAlmostEqual(first.mean(), data.mean())
+        self.assertAlmostEqual(first.std(), data.std())
+
+    def test_empty(self):
+        """
+        Tests that statistics of no data are nan.
+        """
+        stats = RunningStatistics()
+        stats.update(np.zeros(0))
+
+        self.assertEqual(stats.count, 0)
+        for value in [stats.max(), stats.mean(), stats.min(), stats.std()]:
+            self.assertTrue(np.isnan(value))
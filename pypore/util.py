@@ -199,6 +199,26 @@ def slice_combine(length, *slices):
     return slice_final
 
 
+def iter_segment_chunks(segment, size=None):
+    """
+    Iterates over the data of a :py:class:`pypore.core.Segment`, reader, or array in consecutive chunks.
+
+    :param segment: Data to iterate over. If it has an iter_chunks method, like
+                    :py:class:`pypore.i_o.abstract_reader.AbstractReader`, that is used.
+    :param size: (Optional) Maximum number of data points in each chunk. Defaults to the segment's chunk_size, or
+                 12500 points.
+    :return: Generator of 1D numpy arrays.
+    """
+    if size is None:
+        size = getattr(segment, 'chunk_size', 12500)
+    if hasattr(segment, 'iter_chunks'):
+        for chunk in segment.iter_chunks(size):
+            yield chunk
+    else:
+        for i in xrange(0, len(segment), size):
+            yield np.asarray(segment[i:i + size])
+
+
 def get_slice_length(length, s):
     """
     Calculates the length of the slice s used on a data set of length.
@@ -216,3 +236,90 @@ def get_slice_length(length, s):
         return 0
 
     return new_length
+
+
+class RunningStatistics(object):
+    """
+    Accumulates the max, mean, min, and standard deviation of data that is passed in one chunk at a time.
+
+    Chunks are combined with Chan et al.'s parallel variance algorithm, so memory use does not depend on the total
+    amount of data, and RunningStatistics from separate pieces of data can be merged.
+
+    >>> import numpy as np
+    >>> from pypore.util import RunningStatistics
+    >>> data = np.random.random(1000)
+    >>> stats = RunningStatistics()
+    >>> for i in range(0, data.size, 300):
+    ...     stats.update(data[i:i + 300])
+    >>> np.testing.assert_almost_equal(stats.std(), data.std())
+
+    """
+
+    def __init__(self):
+        self.count = 0
+        self._max = np.nan
+        self._mean = np.nan
+        self._min = np.nan
+        # sum of squared differences from the mean
+        self._m2 = 0.0
+
+    def update(self, chunk):
+        """
+        Adds a chunk of data to the statistics.
+
+        :param chunk: Array-like chunk of data. Multidimensional chunks are flattened.
+        """
+        chunk = np.asarray(chunk)
+        if chunk.size == 0:
+            return
+        chunk_mean = np.mean(chunk, dtype=np.float64)
+        deviation = chunk - chunk_mean
+        self._merge(chunk.size, np.max(chunk), chunk_mean, np.min(chunk), np.dot(deviation.ravel(), deviation.ravel()))
+
+    def merge(self, other):
+        """
+        Adds the statistics of another RunningStatistics to this one.
+
+        :param other: RunningStatistics of a separate piece of data.
+        """
+        if other.count > 0:
+            self._merge(other.count, other._max, other._mean, other._min, other._m2)
+
+    def _merge(self, count, maximum, mean, minimum, m2):
+        if self.count == 0:
+            self.count = count
+            self._max, self._mean, self._min, self._m2 = maximum, mean, minimum, m2
+            return
+        total = self.count + count
+        delta = mean - self._mean
+        self._mean += delta * count / total
+        self._m2 += m2 + delta * delta * self.count * count / total
+        self._max = max(self._max, maximum)
+        self._min = min(self._min, minimum)
+        self.count = total
+
+    def max(self):
+        """
+        :return: The maximum value of the data, or nan if no data was added.
+        """
+        return self._max
+
+    def mean(self):
+        """
+        :return: The mean of the data, or nan if no data was added.
+        """
+        return self._mean
+
+    def min(self):
+        """
+        :return: The minimum value of the data, or nan if no data was added.
+        """
+        return self._min
+
+    def std(self):
+        """
+        :return: The standard deviation of the data, or nan if no data was added.
+        """
+        if self.count == 0:
+            return np.nan
+        return np.sqrt(self._m2 / self.count)
@@ -238,10 +238,11 @@ def setup_package():
     except ImportError:
         from distutils.core import setup
 
-    packages = list(find_packages('.'))
+    # only the pypore package, not the benchmarks
+    packages = list(find_packages('pypore'))
     metadata['packages'] = packages
 
-    ext_modules = list(find_extensions('.'))
+    ext_modules = list(find_extensions('pypore'))
     metadata['ext_modules'] = ext_modules
 
     setup(**metadata)